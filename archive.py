@@ -0,0 +1,104 @@
+import json
+import sqlite3
+import threading
+import numpy as np
+from history import TrackHistory
+from shape import Shape, ShapeType
+
+
+class TrackArchive:
+    """ 
+        On-disk (SQLite) store of the terminated tracks, so they don't have to be kept in memory by the Tracker.
+        Can be queried from other threads (GUI, export) while the tracker keeps adding tracks.
+
+        Parameters
+        ----------
+        path : str
+            Path to the database file, default ":memory:" keeps the archive in memory.
+
+        Methods
+        -------
+        add(shape) -> None
+            Store the terminated shape.
+
+        get(shape_id) -> Shape | None
+            Load the archived shape (with its whole history) by its ID.
+
+        ids() -> list
+            IDs of all the archived shapes.
+
+        shapes() -> list
+            Load all the archived shapes.
+    """
+    def __init__(self, path: str = ":memory:") -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS tracks (
+                id INTEGER PRIMARY KEY,
+                shape_type TEXT NOT NULL,
+                color TEXT NOT NULL,
+                bounding TEXT NOT NULL,
+                last_frame INTEGER NOT NULL,
+                frames BLOB NOT NULL,
+                centers BLOB NOT NULL
+            )"""
+        )
+        self._connection.commit()
+
+    def add(self, shape: Shape) -> None:
+        frames, centers = shape.history.points()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO tracks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    shape.id,
+                    shape.shape_type.value,
+                    json.dumps([int(c) for c in shape.color]),
+                    json.dumps(shape.bounding, default=int),
+                    shape.history.last_frame,
+                    frames.astype(np.int64).tobytes(),
+                    centers.astype(np.int32).tobytes(),
+                )
+            )
+            self._connection.commit()
+
+    def get(self, shape_id: int) -> Shape | None:
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM tracks WHERE id = ?", (shape_id,)).fetchone()
+        return self._to_shape(row) if row is not None else None
+
+    def ids(self) -> list:
+        with self._lock:
+            return [row[0] for row in self._connection.execute("SELECT id FROM tracks ORDER BY id")]
+
+    def shapes(self) -> list:
+        with self._lock:
+            rows = self._connection.execute("SELECT * FROM tracks ORDER BY id").fetchall()
+        return [self._to_shape(row) for row in rows]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _to_shape(self, row: tuple) -> Shape:
+        shape_id, shape_type, color, bounding, last_frame, frames, centers = row
+        history = TrackHistory.from_arrays(np.frombuffer(frames, dtype=np.int64), np.frombuffer(centers, dtype=np.int32), last_frame)
+        return Shape(
+            shape_id=shape_id,
+            shape_type=ShapeType(shape_type),
+            bounding=_to_tuple(json.loads(bounding)),
+            center=tuple(history.points()[1][-1].tolist()),
+            color=tuple(json.loads(color)),
+            history=history
+        )
+
+
+def _to_tuple(value):
+    """ JSON turns the (nested) tuples of the bounding into lists, convert them back. """
+    return tuple(_to_tuple(v) for v in value) if isinstance(value, list) else value
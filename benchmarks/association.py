@@ -0,0 +1,71 @@
+"""
+    Benchmark of the detection-to-track association for growing number of shapes, with and without the spatial index.
+
+    Usage (from the repository root):
+        python -m benchmarks.association [--counts 10 100 1000] [--frames 50]
+"""
+import argparse
+import time
+import numpy as np
+from tracker import Tracker
+from track_store import empty_detections, CIRCLE, RECTANGLE
+
+
+def generate_scene(count: int, width: int, height: int, rng: np.random.Generator) -> tuple:
+    """ Random positions, velocities, types and colors of count shapes. """
+    positions = rng.uniform((0, 0), (width, height), size=(count, 2))
+    velocities = rng.uniform(-3, 3, size=(count, 2))
+    types = rng.choice([CIRCLE, RECTANGLE], size=count)
+    colors = rng.integers(0, 256, size=(count, 3))
+    return positions, velocities, types, colors
+
+
+def detections_for(positions: np.ndarray, types: np.ndarray, colors: np.ndarray) -> np.ndarray:
+    detections = empty_detections(len(positions))
+    centers = positions.astype(np.int32)
+    detections["shape_type"] = types
+    detections["bbox"] = np.column_stack((centers - 10, centers + 10))
+    detections["center"] = centers
+    detections["color"] = colors
+    return detections
+
+
+def run(count: int, frames: int, use_spatial_index: bool, width: int, height: int, seed: int) -> float:
+    """ Returns the mean association time per frame in seconds. """
+    rng = np.random.default_rng(seed)
+    positions, velocities, types, colors = generate_scene(count, width, height, rng)
+    tracker = Tracker(np.zeros((height, width, 3), dtype=np.uint8), use_spatial_index=use_spatial_index)
+
+    # first frame creates the tracks
+    tracker.new_frame(0, np.zeros((height, width, 3), dtype=np.uint8), detections_for(positions, types, colors))
+
+    elapsed = 0.0
+    for _ in range(frames):
+        positions = np.clip(positions + velocities, 0, (width - 1, height - 1))
+        detections = detections_for(positions, types, colors)
+
+        start = time.perf_counter()
+        tracker._associate(detections)
+        elapsed += time.perf_counter() - start
+
+    return elapsed / frames
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 30, 100, 300, 1000])
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'shapes':>8} {'full [ms]':>10} {'grid [ms]':>10} {'full/shape [us]':>16} {'grid/shape [us]':>16}")
+    for count in args.counts:
+        full = run(count, args.frames, False, args.width, args.height, args.seed)
+        grid = run(count, args.frames, True, args.width, args.height, args.seed)
+        print(f"{count:>8} {full * 1e3:>10.3f} {grid * 1e3:>10.3f} {full / count * 1e6:>16.2f} {grid / count * 1e6:>16.2f}")
+
+
+if __name__ == '__main__':
+    main()
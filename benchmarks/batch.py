@@ -0,0 +1,45 @@
+"""
+    Benchmark of the batched detection (Detector.detect_batch) against the frame by frame detection:
+    detection fps for the batch sizes and thread counts, the detections must be the same as frame by frame.
+
+    Usage (from the repository root):
+        python -m benchmarks.batch [--video task_video.mp4] [--frames 128] [--engine hough] [--sizes 1 4 16] [--workers 1 4]
+"""
+import argparse
+import time
+import numpy as np
+from pipeline import DETECTOR_ENGINES
+from benchmarks.common import read_frames
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default="task_video.mp4")
+    parser.add_argument("--frames", type=int, default=128)
+    parser.add_argument("--engine", choices=sorted(DETECTOR_ENGINES), default="hough")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames, None)
+    if not frames:
+        raise SystemExit(f"no frames could be read from {args.video}")
+    detector = DETECTOR_ENGINES[args.engine]()
+
+    start = time.perf_counter()
+    reference = [detector.detect(frame) for frame in frames]
+    print(f"{len(frames)} frames, frame by frame: {len(frames) / (time.perf_counter() - start):.1f} fps")
+
+    print(f"{'batch':>5} {'workers':>7} {'fps':>8} {'same':>5}")
+    for size in args.sizes:
+        batches = [np.stack(frames[i:i + size]) for i in range(0, len(frames), size)]
+        for workers in args.workers:
+            start = time.perf_counter()
+            results = [detections for batch in batches for detections in detector.detect_batch(batch, workers)]
+            fps = len(frames) / (time.perf_counter() - start)
+            same = all(np.array_equal(expected, detections) for expected, detections in zip(reference, results))
+            print(f"{size:>5} {workers:>7} {fps:>8.1f} {str(same):>5}")
+
+
+if __name__ == '__main__':
+    main()
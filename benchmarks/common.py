@@ -0,0 +1,138 @@
+""" Helpers shared by the benchmarks. """
+import resource
+import cv2
+import numpy as np
+from utils import greedy_assignment
+
+
+def read_frames(video_path: str, count: int, size: tuple | None) -> list:
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, size, interpolation=cv2.INTER_NEAREST) if size else frame)
+    cap.release()
+    return frames
+
+
+def compare(reference: np.ndarray, detections: np.ndarray, tolerance: int) -> tuple:
+    """ (matched, center errors, bbox errors) of the detections matched to the reference ones (same type, center within tolerance). """
+    matched = 0
+    center_errors = []
+    bbox_errors = []
+    used = set()
+    for expected in reference:
+        same_type = np.flatnonzero(detections["shape_type"] == expected["shape_type"])
+        candidates = [i for i in same_type.tolist() if i not in used]
+        if not candidates:
+            continue
+        errors = np.abs(detections["center"][candidates].astype(np.int64) - expected["center"]).max(axis=1)
+        best = int(np.argmin(errors))
+        if errors[best] <= tolerance:
+            used.add(candidates[best])
+            matched += 1
+            center_errors.append(float(errors[best]))
+            bbox_errors.append(float(np.abs(detections["bbox"][candidates[best]].astype(np.int64) - expected["bbox"]).max()))
+    return matched, center_errors, bbox_errors
+
+
+def detection_accuracy(reference: list, results: list, tolerance: int) -> dict:
+    """ Recall, precision and mean errors of the per-frame detections against the per-frame reference detections. """
+    expected_count = sum(len(r) for r in reference)
+    detected_count = sum(len(r) for r in results)
+    matched, center_errors, bbox_errors = 0, [], []
+    for expected, detections in zip(reference, results):
+        frame_matched, frame_center_errors, frame_bbox_errors = compare(expected, detections, tolerance)
+        matched += frame_matched
+        center_errors += frame_center_errors
+        bbox_errors += frame_bbox_errors
+
+    return {
+        "recall": matched / expected_count if expected_count else 1.0,
+        "precision": matched / detected_count if detected_count else 1.0,
+        "center_error": float(np.mean(center_errors or [0])),
+        "bbox_error": float(np.mean(bbox_errors or [0])),
+    }
+
+
+def frame_points(tracks: list) -> dict:
+    """ {frame ID: [(track ID, (x, y)), ...]} of tracks given as Shape objects or dicts ({"id", "history": [[frame, [x, y]], ...]}). """
+    points = {}
+    for track in tracks:
+        if isinstance(track, dict):
+            track_id, history = track["id"], track["history"]
+        else:
+            frames, centers = track.history.points()
+            track_id, history = track.id, zip(frames.tolist(), centers.tolist())
+        for frame_id, center in history:
+            points.setdefault(frame_id, []).append((track_id, center))
+    return points
+
+
+def tracking_metrics(ground_truth: list, tracks: list, max_distance: float = 20.0) -> dict:
+    """ 
+        CLEAR MOT metrics of the tracks against the ground truth tracks (both see frame_points()).
+        A ground truth object is matched to a track whose center is within max_distance, the correspondence of the previous
+        frame is kept while it stays valid, the rest is assigned greedily by distance. A changed correspondence is an ID switch.
+        MOTA = 1 - (misses + false positives + ID switches) / ground truth points, MOTP is the mean distance of the matches.
+    """
+    expected = frame_points(ground_truth)
+    found = frame_points(tracks)
+    last_match = {} # ground truth ID -> track ID
+    misses = false_positives = id_switches = matches = 0
+    distances = []
+    for frame_id in sorted(set(expected) | set(found)):
+        objects = expected.get(frame_id, [])
+        hypotheses = found.get(frame_id, [])
+        object_ids = [object_id for object_id, _ in objects]
+        hypothesis_ids = [track_id for track_id, _ in hypotheses]
+        frame_distances = np.zeros((len(objects), len(hypotheses)))
+        if objects and hypotheses:
+            object_centers = np.array([center for _, center in objects], dtype=np.float64)
+            hypothesis_centers = np.array([center for _, center in hypotheses], dtype=np.float64)
+            frame_distances = np.linalg.norm(object_centers[:, None] - hypothesis_centers[None], axis=2)
+
+        pairs = []
+        for i, object_id in enumerate(object_ids):
+            previous = last_match.get(object_id)
+            if previous in hypothesis_ids and frame_distances[i, hypothesis_ids.index(previous)] <= max_distance:
+                pairs.append((i, hypothesis_ids.index(previous)))
+        used_objects = {i for i, _ in pairs}
+        used_hypotheses = {j for _, j in pairs}
+        rows, columns = np.nonzero(frame_distances <= max_distance)
+        free = [(i, j) for i, j in zip(rows.tolist(), columns.tolist()) if i not in used_objects and j not in used_hypotheses]
+        if free:
+            rows, columns = np.array(free).T
+            pairs += greedy_assignment(rows, columns, frame_distances[rows, columns])
+
+        for i, j in pairs:
+            object_id, track_id = object_ids[i], hypothesis_ids[j]
+            if last_match.get(object_id, track_id) != track_id:
+                id_switches += 1
+            last_match[object_id] = track_id
+            distances.append(frame_distances[i, j])
+        matches += len(pairs)
+        misses += len(objects) - len(pairs)
+        false_positives += len(hypotheses) - len(pairs)
+
+    total = sum(len(objects) for objects in expected.values())
+    return {
+        "mota": 1 - (misses + false_positives + id_switches) / total if total else 1.0,
+        "motp": float(np.mean(distances)) if distances else 0.0,
+        "id_switches": id_switches,
+        "misses": misses,
+        "false_positives": false_positives,
+        "matches": matches,
+        "ground_truth": total,
+    }
+
+
+def rss_mb() -> float:
+    """ Current resident memory of the process in MB (peak resident memory where /proc is not available). """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
@@ -0,0 +1,46 @@
+"""
+    Benchmark of the detection engines: detection fps and accuracy of each engine,
+    with the detections of the HoughCircles engine (Detector) as the reference.
+
+    Usage (from the repository root):
+        python -m benchmarks.engines [--video task_video.mp4] [--frames 200] [--resize 1920 1080]
+"""
+import argparse
+import time
+from pipeline import DETECTOR_ENGINES
+from benchmarks.common import read_frames, detection_accuracy
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", default="task_video.mp4")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--resize", type=int, nargs=2, metavar=("WIDTH", "HEIGHT"),
+                        help="resize the frames first, e.g. 1920 1080 to simulate higher resolution inputs")
+    parser.add_argument("--tolerance", type=int, default=3, help="maximum center error (pixels) of a matched detection")
+    args = parser.parse_args()
+
+    frames = read_frames(args.video, args.frames, tuple(args.resize) if args.resize else None)
+    if not frames:
+        raise SystemExit(f"no frames could be read from {args.video}")
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} frames, {width}x{height}")
+
+    reference = None
+    print(f"{'engine':>8} {'fps':>8} {'recall':>7} {'precision':>9} {'center err':>10} {'bbox err':>8}")
+    for name in ("hough", "contour"):
+        detector = DETECTOR_ENGINES[name]()
+        start = time.perf_counter()
+        results = [detector.detect(frame) for frame in frames]
+        fps = len(frames) / (time.perf_counter() - start)
+
+        if reference is None:
+            reference = results
+
+        accuracy = detection_accuracy(reference, results, args.tolerance)
+        print(f"{name:>8} {fps:>8.1f} {accuracy['recall']:>7.1%} {accuracy['precision']:>9.1%} "
+              f"{accuracy['center_error']:>10.2f} {accuracy['bbox_error']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
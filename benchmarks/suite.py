@@ -0,0 +1,140 @@
+"""
+    Benchmark suite on synthetic videos (benchmarks/synthetic.py): throughput, per-stage latency, memory growth and tracking
+    accuracy (MOTA, ID switches) of the VideoPipeline, scaling the number of objects, the resolution and the video length.
+    The videos are generated once into the cache directory.
+
+    Results can be saved (--json) and compared with a previous run (--baseline), the suite then exits with 1
+    if the fps dropped or MOTA decreased more than the tolerances, to catch regressions locally.
+
+    Usage (from the repository root):
+        python -m benchmarks.suite [--quick] [--objects 4 16 48] [--sizes 640x360 1280x720 1920x1080] [--lengths 150 600]
+                                   [--engine hough] [--json results.json] [--baseline previous.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pipeline import VideoPipeline, DETECTOR_ENGINES
+from profiling import Profiler
+from benchmarks.synthetic import generate_video, load_ground_truth, ground_truth_path
+from benchmarks.common import tracking_metrics, rss_mb
+
+
+def scenarios(args: argparse.Namespace) -> list:
+    """ 
+        (name, width, height, frames, objects) of the scenarios, one parameter changed from the base scenario at a time,
+        the shapes keep their size (like in task_video.mp4), so the smaller frames are more crowded.
+    """
+    width, height = args.base_size
+    result = [(f"objects={objects}", width, height, args.base_length, objects) for objects in args.objects]
+    result += [(f"size={w}x{h}", w, h, args.base_length, args.base_objects) for w, h in args.sizes]
+    result += [(f"frames={frames}", width, height, frames, args.base_objects) for frames in args.lengths]
+
+    # the same parameters are run only once
+    unique = {}
+    for scenario in result:
+        unique.setdefault(scenario[1:], scenario)
+    return list(unique.values())
+
+
+def video_for(cache_dir: str, width: int, height: int, frames: int, objects: int, seed: int) -> str:
+    path = os.path.join(cache_dir, f"synthetic_{width}x{height}_{frames}f_{objects}o_{seed}.mp4")
+    if not (os.path.exists(path) and os.path.exists(ground_truth_path(path))):
+        generate_video(path, width, height, frames, circles=(objects + 1) // 2, rectangles=objects // 2, seed=seed)
+    return path
+
+
+def run(video_path: str, args: argparse.Namespace) -> dict:
+    profiler = Profiler()
+    pipeline = VideoPipeline(video_path, roi_refresh=args.roi_refresh, pyramid_levels=args.pyramid, engine=args.engine, profiler=profiler)
+
+    memory_before = rss_mb()
+    start = time.perf_counter()
+    for _ in pipeline.frames():
+        pass
+    elapsed = time.perf_counter() - start
+    memory_growth = rss_mb() - memory_before
+
+    stages = profiler.stats()
+    result = {
+        "fps": pipeline.frame_count / elapsed if elapsed > 0 else 0.0,
+        "memory_growth_mb": memory_growth,
+        "latency_ms": {name: {"p50": stats["p50_ms"], "p95": stats["p95_ms"]} for name, stats in stages.items()},
+    }
+    result.update(tracking_metrics(load_ground_truth(video_path)["tracks"], pipeline.tracker.all_shapes(), args.max_distance))
+    return result
+
+
+def compare(results: dict, baseline: dict, fps_tolerance: float, mota_tolerance: float) -> list:
+    """ Descriptions of the regressions of the results against the baseline results. """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result["fps"] < (1 - fps_tolerance) * previous["fps"]:
+            regressions.append(f"{name}: fps {previous['fps']:.1f} -> {result['fps']:.1f}")
+        if result["mota"] < previous["mota"] - mota_tolerance:
+            regressions.append(f"{name}: MOTA {previous['mota']:.3f} -> {result['mota']:.3f}")
+    return regressions
+
+
+def parse_size(value: str) -> tuple:
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objects", type=int, nargs="*", default=[4, 16, 48])
+    parser.add_argument("--sizes", type=parse_size, nargs="*", default=[(640, 360), (1280, 720), (1920, 1080)])
+    parser.add_argument("--lengths", type=int, nargs="*", default=[150, 600])
+    parser.add_argument("--base-objects", type=int, default=10)
+    parser.add_argument("--base-size", type=parse_size, default=(1280, 720))
+    parser.add_argument("--base-length", type=int, default=300)
+    parser.add_argument("--quick", action="store_true", help="small scenarios only (4 and 16 objects, 1280x720, 150 frames)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "shape_tracker_benchmarks"))
+    parser.add_argument("--engine", choices=sorted(DETECTOR_ENGINES), default="hough")
+    parser.add_argument("--pyramid", type=int, default=0)
+    parser.add_argument("--roi-refresh", type=int, default=0)
+    parser.add_argument("--max-distance", type=float, default=20.0, help="maximum distance (pixels) of a matched track and ground truth object")
+    parser.add_argument("--json", help="save the results to this file")
+    parser.add_argument("--baseline", help="compare with the results saved by a previous run (--json)")
+    parser.add_argument("--fps-tolerance", type=float, default=0.2, help="allowed relative fps drop (default: 0.2)")
+    parser.add_argument("--mota-tolerance", type=float, default=0.02, help="allowed MOTA decrease (default: 0.02)")
+    args = parser.parse_args()
+    if args.quick:
+        args.objects, args.sizes, args.lengths = [4, 16], [], []
+        args.base_length = 150
+
+    os.makedirs(args.cache_dir, exist_ok=True)
+    results = {}
+    print(f"{'scenario':<18} {'fps':>7} {'detect p95':>10} {'track p95':>9} {'mem [MB]':>8} {'MOTA':>6} {'MOTP':>5} {'IDSW':>5} {'miss':>6} {'FP':>5}")
+    for name, width, height, frames, objects in scenarios(args):
+        result = run(video_for(args.cache_dir, width, height, frames, objects, args.seed), args)
+        results[name] = result
+        latency = result["latency_ms"]
+        print(f"{name:<18} {result['fps']:>7.1f} {latency.get('detect', {}).get('p95', 0):>10.2f} {latency.get('track', {}).get('p95', 0):>9.2f} "
+              f"{result['memory_growth_mb']:>8.1f} {result['mota']:>6.3f} {result['motp']:>5.2f} {result['id_switches']:>5} "
+              f"{result['misses']:>6} {result['false_positives']:>5}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.fps_tolerance, args.mota_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("no regressions against", args.baseline)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
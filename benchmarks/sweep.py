@@ -0,0 +1,227 @@
+"""
+    Parameter sweep of the detection and tracking settings (TrackingConfig, config.py) on videos with ground truth:
+    throughput and tracking accuracy (MOTA, MOTP, ID switches) of every setting, the Pareto-optimal settings (no other setting
+    is both faster and more accurate) are marked and the chosen one can be saved as a config file for the CLI (--config).
+
+    The settings are a grid of the given values or --random N settings sampled from them (values or lo:hi ranges).
+    The settings are grouped by their detection parameters, each group (per video) is one task in the process pool:
+    the video is decoded and detected once and the stored detections are tracked with every tracker setting of the group.
+    The fps of a setting is frames / (decode + detection + tracking time), so it's what the setting would run at alone,
+    but measured while the other processes load the CPU (--processes 1 for undisturbed timings).
+
+    Without --videos the synthetic videos (benchmarks/synthetic.py) are generated once into the cache directory.
+
+    Usage (from the repository root):
+        python -m benchmarks.sweep --param detector.threshold=8,11,16 --param tracker.max_distance=50,100 [--processes 4]
+        python -m benchmarks.sweep --random 20 --param detector.hough_param2=20:40 --param tracker.max_color_distance=0.05:0.3
+        python -m benchmarks.sweep --param engine=hough,contour --param pyramid_levels=0,1 --videos video.mp4 (with video.gt.json)
+                                   [--json sweep.json] [--best-config tuned.json --min-mota 0.9]
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from pipeline import create_detector
+from tracker import Tracker
+from config import TrackingConfig, DEFAULT_CONFIG
+from benchmarks.synthetic import load_ground_truth, ground_truth_path
+from benchmarks.common import tracking_metrics
+from benchmarks.suite import video_for, parse_size
+
+
+def parse_param(text: str, base: dict) -> tuple:
+    """ (name, values) of "name=v1,v2,..." or (name, (lo, hi)) of "name=lo:hi", the values have the type of the base value. """
+    name, separator, values = text.partition("=")
+    if not separator or name not in base:
+        raise argparse.ArgumentTypeError(f"expected name=values with one of: {', '.join(base)}")
+    kind = type(base[name]) if base[name] is not None else int
+    convert = lambda value: None if value.lower() == "none" else kind(float(value)) if kind is int else kind(value)
+    if ":" in values:
+        if kind not in (int, float):
+            raise argparse.ArgumentTypeError(f"{name} can't be a range")
+        low, high = values.split(":")
+        return name, (convert(low), convert(high))
+    return name, [convert(value) for value in values.split(",")]
+
+
+def grid_settings(params: list) -> list:
+    """ Every combination of the values, as {name: value} dicts. """
+    names = [name for name, _ in params]
+    return [dict(zip(names, values)) for values in itertools.product(*[values for _, values in params])]
+
+
+def random_settings(params: list, count: int, seed: int) -> list:
+    """ count different settings, each value drawn from the list or uniformly from the (lo, hi) range (integers for int ranges). """
+    rng = np.random.default_rng(seed)
+    settings = {}
+    for _ in range(count * 20):
+        if len(settings) == count:
+            break
+        setting = {}
+        for name, values in params:
+            if isinstance(values, tuple):
+                low, high = values
+                setting[name] = int(rng.integers(low, high + 1)) if isinstance(low, int) else round(float(rng.uniform(low, high)), 4)
+            else:
+                setting[name] = values[rng.integers(len(values))]
+        settings.setdefault(tuple(setting.items()), setting)
+    return list(settings.values())
+
+
+def evaluate_group(video_path: str, configs: list) -> list:
+    """
+        Runs in the worker process: detects the video once with the detection parameters shared by the configs and tracks
+        the detections with the tracker parameters of each config. Returns the frame count, time and tracking metrics of each config.
+    """
+    detector = create_detector(configs[0])
+    cap = cv2.VideoCapture(video_path)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    detections = []
+    start = time.perf_counter()
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            detections.append(detector.detect(frame))
+    finally:
+        cap.release()
+    detection_time = time.perf_counter() - start
+
+    ground_truth = load_ground_truth(video_path)["tracks"]
+    frame = np.zeros((height, width, 3), dtype=np.uint8) # the boxes are drawn into it, nobody looks at it
+    results = []
+    for config in configs:
+        tracker = Tracker(np.zeros((height, width, 3), dtype=np.uint8), **config.tracker._asdict())
+        start = time.perf_counter()
+        for frame_id, frame_detections in enumerate(detections):
+            tracker.new_frame(frame_id, frame, frame_detections)
+        shapes = tracker.all_shapes()
+        result = {"frames": len(detections), "seconds": detection_time + time.perf_counter() - start}
+        result.update(tracking_metrics(ground_truth, shapes))
+        results.append(result)
+    return results
+
+
+def aggregate(results: list) -> dict:
+    """ Totals of the per-video results of one setting: fps of all the frames, MOTA of all the ground truth points, MOTP weighted by the matches. """
+    frames = sum(result["frames"] for result in results)
+    seconds = sum(result["seconds"] for result in results)
+    counts = {name: sum(result[name] for result in results) for name in ("id_switches", "misses", "false_positives", "matches", "ground_truth")}
+    errors = counts["misses"] + counts["false_positives"] + counts["id_switches"]
+    return {
+        "fps": frames / seconds if seconds > 0 else 0.0,
+        "mota": 1 - errors / counts["ground_truth"] if counts["ground_truth"] else 1.0,
+        "motp": sum(result["motp"] * result["matches"] for result in results) / counts["matches"] if counts["matches"] else 0.0,
+        **counts,
+    }
+
+
+def pareto_front(results: list) -> list:
+    """ Indices of the results not dominated by another one in both fps and MOTA (higher is better). """
+    front = []
+    for i, result in enumerate(results):
+        dominated = any(other["fps"] >= result["fps"] and other["mota"] >= result["mota"]
+                        and (other["fps"] > result["fps"] or other["mota"] > result["mota"]) for other in results)
+        if not dominated:
+            front.append(i)
+    return front
+
+
+def choose(results: list, front: list, min_mota: float | None) -> int | None:
+    """ The fastest Pareto-optimal setting with at least min_mota, the most accurate one without min_mota. """
+    if min_mota is None:
+        return max(front, key=lambda i: (results[i]["mota"], results[i]["fps"]))
+    eligible = [i for i in front if results[i]["mota"] >= min_mota]
+    return max(eligible, key=lambda i: results[i]["fps"]) if eligible else None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", help="base config file, the swept parameters are changed in it (default: the defaults of config.py)")
+    parser.add_argument("--param", action="append", default=[], metavar="NAME=VALUES",
+                        help="swept parameter: comma separated values, or lo:hi range with --random (e.g. detector.threshold=8,11,16)")
+    parser.add_argument("--random", type=int, default=0, help="sample this many random settings instead of the whole grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--videos", nargs="*", default=[], help="videos with ground truth (<video>.gt.json), synthetic videos by default")
+    parser.add_argument("--synthetic", type=int, default=2, help="number of synthetic videos (default: 2)")
+    parser.add_argument("--size", type=parse_size, default=(640, 360), help="synthetic video size (default: 640x360)")
+    parser.add_argument("--frames", type=int, default=150, help="synthetic video length (default: 150)")
+    parser.add_argument("--objects", type=int, default=8, help="shapes in a synthetic video (default: 8)")
+    parser.add_argument("--cache-dir", default=os.path.join(tempfile.gettempdir(), "shape_tracker_benchmarks"))
+    parser.add_argument("--processes", type=int, default=0, help="worker processes (default: 0, number of CPUs)")
+    parser.add_argument("--json", help="save all the settings and their results to this file")
+    parser.add_argument("--best-config", help="save the chosen Pareto-optimal setting (see --min-mota) as a config file")
+    parser.add_argument("--min-mota", type=float, help="choose the fastest Pareto-optimal setting with at least this MOTA (default: the most accurate one)")
+    args = parser.parse_args()
+
+    base = TrackingConfig.load(args.config) if args.config else DEFAULT_CONFIG
+    try:
+        params = [parse_param(text, base.params()) for text in args.param]
+    except argparse.ArgumentTypeError as error:
+        parser.error(str(error))
+    if not args.random and any(isinstance(values, tuple) for _, values in params):
+        parser.error("lo:hi ranges need --random")
+    settings = random_settings(params, args.random, args.seed) if args.random else grid_settings(params)
+    configs = [base.replace(setting) for setting in settings]
+
+    if args.videos:
+        missing = [video for video in args.videos if not os.path.exists(ground_truth_path(video))]
+        if missing:
+            parser.error(f"no ground truth for {', '.join(missing)}")
+        videos = args.videos
+    else:
+        os.makedirs(args.cache_dir, exist_ok=True)
+        width, height = args.size
+        videos = [video_for(args.cache_dir, width, height, args.frames, args.objects, args.seed + i) for i in range(args.synthetic)]
+
+    # settings with the same detection parameters share the detection
+    groups = {}
+    for index, config in enumerate(configs):
+        groups.setdefault((config.engine, config.pyramid_levels, config.detector), []).append(index)
+    print(f"{len(configs)} settings ({len(groups)} detection settings) x {len(videos)} videos")
+
+    per_setting = [[] for _ in configs]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.processes or os.cpu_count() or 1) as executor:
+        futures = [(indices, executor.submit(evaluate_group, video, [configs[i] for i in indices]))
+                   for video in videos for indices in groups.values()]
+        for indices, future in futures:
+            for index, result in zip(indices, future.result()):
+                per_setting[index].append(result)
+    print(f"swept in {time.perf_counter() - start:.1f}s")
+
+    results = [aggregate(setting_results) for setting_results in per_setting]
+    front = pareto_front(results)
+    names = [name for name, _ in params]
+    print(f"{'':<2}{'fps':>8} {'MOTA':>6} {'MOTP':>5} {'IDSW':>5} {'miss':>6} {'FP':>5}  " + "  ".join(names))
+    for index in sorted(range(len(results)), key=lambda i: (i not in front, -results[i]["fps"])):
+        result, setting = results[index], settings[index]
+        print(f"{'*' if index in front else '':<2}{result['fps']:>8.1f} {result['mota']:>6.3f} {result['motp']:>5.2f} {result['id_switches']:>5} "
+              f"{result['misses']:>6} {result['false_positives']:>5}  " + "  ".join(f"{setting[name]!s:<{len(name)}}" for name in names))
+    print("* Pareto-optimal (no other setting is both faster and more accurate)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([{"params": setting, "pareto": index in front, **result} for index, (setting, result) in enumerate(zip(settings, results))],
+                      f, indent=2)
+
+    if args.best_config:
+        best = choose(results, front, args.min_mota)
+        if best is None:
+            print(f"no setting reaches MOTA {args.min_mota}", file=sys.stderr)
+            return 1
+        configs[best].save(args.best_config)
+        print(f"saved {settings[best]} ({results[best]['fps']:.1f} fps, MOTA {results[best]['mota']:.3f}) -> {args.best_config}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+    Generator of synthetic test videos like task_video.mp4 (moving circles and rectangles of random colors on black background)
+    with the ground truth tracks written next to the video (<video>.gt.json).
+
+    The shapes move with constant velocity and bounce off the frame borders. Each shape disappears for one frame with
+    disappear_chance (2.5% like in task_description.md), and shapes crossing each other occlude the ones drawn earlier.
+    The ground truth contains the frames where the shape is drawn and at least min_visible of its area is visible.
+
+    Usage (from the repository root):
+        python -m benchmarks.synthetic out.mp4 [--size 1280 720] [--frames 300] [--circles 5] [--rectangles 5] [--seed 0]
+"""
+import argparse
+import json
+import cv2
+import numpy as np
+
+MIN_RADIUS, MAX_RADIUS = 25, 60 # circle radius range, similar to task_video.mp4
+MIN_SIDE, MAX_SIDE = 40, 110 # rectangle side range
+MIN_SPEED, MAX_SPEED = 1.0, 4.0 # pixels per frame
+
+
+def ground_truth_path(video_path: str) -> str:
+    return video_path.rsplit(".", 1)[0] + ".gt.json"
+
+
+def generate_video(path: str, width: int = 1280, height: int = 720, frames: int = 300, circles: int = 5, rectangles: int = 5,
+                   fps: float = 30.0, disappear_chance: float = 0.025, min_visible: float = 0.5, seed: int = 0) -> dict:
+    """ Render the video to path and its ground truth to ground_truth_path(path), returns the ground truth. """
+    rng = np.random.default_rng(seed)
+    count = circles + rectangles
+    is_circle = np.arange(count) < circles
+    # half sizes: radius of the circles, half of the sides of the rectangles
+    half_sizes = np.where(is_circle[:, None], rng.integers(MIN_RADIUS, MAX_RADIUS + 1, size=(count, 1)),
+                          rng.integers(MIN_SIDE, MAX_SIDE + 1, size=(count, 2)) // 2)
+    half_sizes = np.minimum(half_sizes, [width // 4, height // 4])
+    positions = rng.uniform(half_sizes, [width, height] - half_sizes, size=(count, 2))
+    angles = rng.uniform(0, 2 * np.pi, size=count)
+    speeds = rng.uniform(MIN_SPEED, MAX_SPEED, size=count)
+    velocities = np.column_stack((np.cos(angles), np.sin(angles))) * speeds[:, None]
+    # bright colors, well above the detection threshold of the dark background
+    colors = rng.integers(60, 256, size=(count, 3))
+    order = rng.permutation(count) # drawing order, later shapes occlude the earlier ones
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"can't write video {path}")
+
+    histories = [[] for _ in range(count)]
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    labels = np.zeros((height, width), dtype=np.uint16) # index + 1 of the visible shape of each pixel
+    full_areas = np.zeros(count + 1, dtype=np.int64)
+    try:
+        for frame_id in range(frames):
+            frame[:] = 0
+            labels[:] = 0
+            visible = rng.random(count) >= disappear_chance
+            centers = np.round(positions).astype(int)
+            for index in order:
+                if not visible[index]:
+                    continue
+                full_areas[index + 1] = _draw_shape(frame, labels, index, is_circle[index], centers[index], half_sizes[index],
+                                                    tuple(int(c) for c in colors[index][::-1]))
+
+            visible_areas = np.bincount(labels.ravel(), minlength=count + 1)
+            for index in np.flatnonzero(visible):
+                if visible_areas[index + 1] >= min_visible * full_areas[index + 1]:
+                    histories[index].append([frame_id, centers[index].tolist()])
+            writer.write(frame)
+
+            # constant velocity, bouncing off the borders
+            positions += velocities
+            low, high = positions < half_sizes, positions > [width, height] - half_sizes
+            velocities[low | high] *= -1
+            positions = np.clip(positions, half_sizes, [width, height] - half_sizes)
+    finally:
+        writer.release()
+
+    ground_truth = {
+        "video": path,
+        "width": width,
+        "height": height,
+        "frames": frames,
+        "tracks": [{
+            "id": index + 1,
+            "shape_type": "circle" if is_circle[index] else "rectangle",
+            "color": colors[index].tolist(),
+            "history": histories[index],
+        } for index in range(count)],
+    }
+    with open(ground_truth_path(path), "w") as f:
+        json.dump(ground_truth, f)
+    return ground_truth
+
+
+def load_ground_truth(video_path: str) -> dict:
+    with open(ground_truth_path(video_path)) as f:
+        return json.load(f)
+
+
+def _draw_shape(frame: np.ndarray, labels: np.ndarray, index: int, is_circle: bool, center: np.ndarray, half_size: np.ndarray, color: tuple) -> int:
+    """ Draw the shape on the frame and its label, returns its full area in pixels. """
+    x, y = center.tolist()
+    label = int(index) + 1
+    if is_circle:
+        radius = int(half_size[0])
+        cv2.circle(frame, (x, y), radius, color, -1)
+        cv2.circle(labels, (x, y), radius, label, -1)
+        return int(np.pi * radius * radius)
+
+    half_width, half_height = half_size.tolist()
+    cv2.rectangle(frame, (x - half_width, y - half_height), (x + half_width, y + half_height), color, -1)
+    cv2.rectangle(labels, (x - half_width, y - half_height), (x + half_width, y + half_height), label, -1)
+    return (2 * half_width + 1) * (2 * half_height + 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", help="output video path (.mp4)")
+    parser.add_argument("--size", type=int, nargs=2, default=[1280, 720], metavar=("WIDTH", "HEIGHT"))
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--circles", type=int, default=5)
+    parser.add_argument("--rectangles", type=int, default=5)
+    parser.add_argument("--disappear-chance", type=float, default=0.025)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    ground_truth = generate_video(args.video, *args.size, frames=args.frames, circles=args.circles, rectangles=args.rectangles,
+                                  disappear_chance=args.disappear_chance, seed=args.seed)
+    points = sum(len(track["history"]) for track in ground_truth["tracks"])
+    print(f"{args.video}: {args.frames} frames, {len(ground_truth['tracks'])} shapes, {points} ground truth points -> {ground_truth_path(args.video)}")
+
+
+if __name__ == '__main__':
+    main()
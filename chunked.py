@@ -0,0 +1,191 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+from pipeline import create_detector, resolve_config, read_batch
+from tracker import Tracker
+from history import TrackHistory
+from shape import Shape, ShapeType
+from utils import pair_costs, greedy_assignment
+from config import TrackingConfig, DEFAULT_CONFIG
+
+
+def process_chunk(video_path: str, start_frame: int, end_frame: int, config: TrackingConfig = DEFAULT_CONFIG, batch_size: int = 1) -> list:
+    """ 
+        Detect and track the shapes in the frames [start_frame, end_frame) of the video with its own Detector and Tracker (of the config),
+        runs in the worker process, the frames are read and detected in blocks of batch_size frames.
+        Returns the tracks as dicts (Shape.to_dict()), frame IDs are global (from the video start).
+    """
+    cap = cv2.VideoCapture(video_path)
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    detector = create_detector(config)
+    tracker = Tracker(np.zeros((height, width, 3), dtype=np.uint8), **config.tracker._asdict())
+    try:
+        frame_id = start_frame
+        while frame_id < end_frame and (batch := read_batch(cap, min(batch_size, end_frame - frame_id))) is not None:
+            for frame, detections in zip(batch, detector.detect_batch(batch)):
+                tracker.new_frame(frame_id, frame, detections)
+                frame_id += 1
+    finally:
+        cap.release()
+
+    return [shape.to_dict() for shape in tracker.all_shapes()]
+
+
+def split_frames(frame_count: int, chunks: int, overlap: int) -> list:
+    """ (start, end) frame ranges of the chunks, each chunk (except the last) continues overlap frames into the next one. """
+    chunk_size = -(-frame_count // chunks) # ceil
+    ranges = []
+    for start in range(0, frame_count, chunk_size):
+        ranges.append((start, min(start + chunk_size + overlap, frame_count)))
+    return ranges
+
+
+def stitch_tracks(chunk_results: list, max_distance=100, max_color_distance=0.15) -> list:
+    """ 
+        Merge the tracks of consecutive chunks into global tracks.
+
+        chunk_results is list of (start, end, tracks) of the chunks in order. Each frame belongs to the chunk which saw it first,
+        the overlap of two chunks (frames seen by both) is only used to match the tracks of the second chunk to the first one,
+        with the same criteria as the Tracker (utils.pair_costs: same type, color and position close enough in the common frames).
+        Returns the global tracks as Shape objects, with IDs ordered by the first occurence.
+    """
+    global_tracks = [] # [type, color, bounding, frames (list of arrays), centers (list of arrays)]
+    previous = {} # local ID of the previous chunk's track -> its global track
+    previous_tracks = []
+    previous_end = 0
+
+    for start, end, tracks in chunk_results:
+        tracks = [_track_arrays(track) for track in tracks]
+        matches = _match_overlap(previous_tracks, tracks, start, previous_end, max_distance, max_color_distance)
+
+        current = {}
+        for track in tracks:
+            # frames before previous_end already belong to the previous chunk
+            owned = track["frames"] >= previous_end
+            if not owned.any():
+                continue
+
+            global_track = previous.get(matches.get(track["id"]))
+            if global_track is None:
+                global_track = [track["shape_type"], track["color"], track["bounding"], [], []]
+                global_tracks.append(global_track)
+            global_track[2] = track["bounding"]
+            global_track[3].append(track["frames"][owned])
+            global_track[4].append(track["centers"][owned])
+            current[track["id"]] = global_track
+
+        previous, previous_tracks, previous_end = current, tracks, end
+
+    shapes = []
+    global_tracks.sort(key=lambda global_track: int(global_track[3][0][0]))
+    for shape_id, (shape_type, color, bounding, frames, centers) in enumerate(global_tracks, start=1):
+        frames, centers = np.concatenate(frames), np.concatenate(centers)
+        history = TrackHistory.from_arrays(frames, centers, int(frames[-1]))
+        shapes.append(Shape(shape_id, ShapeType(shape_type), bounding, tuple(centers[-1].tolist()), color, history))
+    return shapes
+
+
+def _track_arrays(track: dict) -> dict:
+    history = np.array([[frame_id, x, y] for frame_id, (x, y) in track["history"]], dtype=np.int64).reshape(-1, 3)
+    bounding = track["bounding"]
+    return {
+        "id": track["id"],
+        "shape_type": track["shape_type"],
+        "color": tuple(track["color"]),
+        "bounding": tuple(tuple(b) for b in bounding) if isinstance(bounding[0], (list, tuple)) else tuple(bounding),
+        "frames": history[:, 0],
+        "centers": history[:, 1:],
+    }
+
+
+def _match_overlap(previous_tracks: list, tracks: list, overlap_start: int, overlap_end: int, max_distance, max_color_distance) -> dict:
+    """ Local ID of the track -> local ID of the previous chunk's track, matched in the overlap frames [overlap_start, overlap_end). """
+    track_indices, detection_indices, costs = [], [], []
+    for i, previous_track in enumerate(previous_tracks):
+        for j, track in enumerate(tracks):
+            common, previous_positions, positions = np.intersect1d(previous_track["frames"], track["frames"], return_indices=True)
+            in_overlap = (common >= overlap_start) & (common < overlap_end)
+            if not in_overlap.any():
+                continue
+
+            count = int(in_overlap.sum())
+            frame_costs = pair_costs(
+                previous_track["centers"][previous_positions[in_overlap]].astype(np.float64),
+                np.tile(np.array(previous_track["color"], dtype=np.float64), (count, 1)),
+                np.repeat(previous_track["shape_type"], count),
+                track["centers"][positions[in_overlap]].astype(np.float64),
+                np.tile(np.array(track["color"], dtype=np.float64), (count, 1)),
+                np.repeat(track["shape_type"], count),
+                max_distance, max_color_distance
+            )
+
+            # same shape if it matches in most of the common frames
+            finite = np.isfinite(frame_costs)
+            if finite.mean() >= 0.5:
+                track_indices.append(i)
+                detection_indices.append(j)
+                costs.append(frame_costs[finite].mean())
+
+    pairs = greedy_assignment(np.array(track_indices, dtype=np.int64), np.array(detection_indices, dtype=np.int64), np.array(costs))
+    return {tracks[j]["id"]: previous_tracks[i]["id"] for i, j in pairs}
+
+
+class ChunkedVideoProcessor:
+    """ 
+        Offline processing of a video file split into overlapping frame ranges, processed in parallel processes
+        (each with its own Detector and Tracker) and stitched together into globally consistent tracks.
+
+        Parameters
+        ----------
+        video_path : str
+            Path to the video file, must be seekable (not a camera or stream).
+        processes : int | None
+            Number of worker processes, default is the number of CPUs.
+        chunks : int | None
+            Number of frame ranges, default is the number of processes.
+        overlap : int
+            Number of frames each chunk continues into the next one, used for stitching the tracks.
+        pyramid_levels : int | None
+            Multi-resolution detection, see Detector.
+        engine : str | None
+            Detection engine, see VideoPipeline.
+        batch_size : int
+            Frames read and detected at once by each process, see Detector.detect_batch.
+        config : TrackingConfig | None
+            Detector and tracker parameters, see VideoPipeline, the tracker distances are also used for stitching.
+
+        Methods
+        -------
+        process() -> list
+            Process the video, returns all the tracks as Shape objects.
+    """
+    def __init__(self, video_path: str, processes: int | None = None, chunks: int | None = None, overlap: int = 30,
+                 pyramid_levels: int | None = None, engine: str | None = None, batch_size: int = 1, config: TrackingConfig | None = None) -> None:
+        self.video_path = video_path
+        self.config = resolve_config(config, engine, pyramid_levels)
+        self.batch_size = batch_size
+        self.processes = processes or os.cpu_count() or 1
+        self.chunks = chunks or self.processes
+        self.overlap = overlap
+        self.frame_count = 0
+
+    def process(self) -> list:
+        cap = cv2.VideoCapture(self.video_path)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        if frame_count <= 0:
+            self.frame_count = 0
+            return []
+
+        ranges = split_frames(frame_count, self.chunks, self.overlap)
+        with ProcessPoolExecutor(self.processes) as executor:
+            futures = [executor.submit(process_chunk, self.video_path, start, end, self.config, batch_size=self.batch_size)
+                       for start, end in ranges]
+            chunk_results = [(start, end, future.result()) for (start, end), future in zip(ranges, futures)]
+
+        self.frame_count = frame_count
+        return stitch_tracks(chunk_results, self.config.tracker.max_distance, self.config.tracker.max_color_distance)
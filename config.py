@@ -0,0 +1,86 @@
+import json
+from typing import NamedTuple
+
+
+class DetectorConfig(NamedTuple):
+    """ Parameters of the detection engines (Detector, ContourDetector), the defaults are tuned for task_video.mp4. """
+    threshold: int = 11 # grayscale threshold of the shapes against the dark background
+    hough_param1: float = 50.0 # HoughCircles: upper Canny threshold of its edge detection
+    hough_param2: float = 30.0 # HoughCircles: accumulator threshold, lower finds more (also false) circles
+    hough_min_dist: int = 20 # HoughCircles: minimum distance of the circle centers
+    hough_min_radius: int = 10
+    canny_low: float = 50.0 # edges of the rectangle contours
+    canny_high: float = 150.0
+    polygon_epsilon: float = 0.02 # approxPolyDP epsilon of the rectangles, fraction of the contour perimeter
+    min_circle_area: float = 1000.0 # smaller shapes are dropped as false positives, not good idea if we want to detect small shapes
+    min_rectangle_area: float = 1200.0
+
+
+class TrackerConfig(NamedTuple):
+    """ Parameters of the Tracker (same names as its arguments). """
+    max_distance: float = 100 # maximum distance (pixels) of a track and a matched detection
+    max_color_distance: float = 0.15 # maximum distance of the normalized RGB colors of a track and a matched detection
+    max_missed_frames: int | None = None # the track is terminated after this many frames without detection, None never
+    history_gap: int = 10 # more missing frames split the trajectory into separate segments (overlaps, edge of the screen)
+
+
+class TrackingConfig(NamedTuple):
+    """
+        All the tunable settings of the detection and tracking in one (immutable, picklable) object, used by the pipelines,
+        saved / loaded as JSON (CLI --config) and produced by the parameter sweep (benchmarks/sweep.py).
+        The parameters are addressed by flat names: "engine", "pyramid_levels", "detector.<name>" and "tracker.<name>".
+
+        Methods
+        -------
+        params() -> dict
+            {flat name: value} of all the parameters.
+
+        replace(params: dict) -> TrackingConfig
+            Copy with the given {flat name: value} parameters changed.
+
+        load(path: str) -> TrackingConfig
+            Read from JSON, missing parameters have the default values.
+
+        save(path: str) -> None
+    """
+    engine: str = "hough" # key of DETECTOR_ENGINES (pipeline.py)
+    pyramid_levels: int = 0 # multi-resolution detection, see Detector
+    detector: DetectorConfig = DetectorConfig()
+    tracker: TrackerConfig = TrackerConfig()
+
+    def params(self) -> dict:
+        params = {"engine": self.engine, "pyramid_levels": self.pyramid_levels}
+        params.update({f"detector.{name}": value for name, value in self.detector._asdict().items()})
+        params.update({f"tracker.{name}": value for name, value in self.tracker._asdict().items()})
+        return params
+
+    def replace(self, params: dict) -> "TrackingConfig":
+        top, groups = {}, {"detector": {}, "tracker": {}}
+        for name, value in params.items():
+            group, _, field = name.rpartition(".")
+            if group:
+                if group not in groups or field not in getattr(self, group)._fields:
+                    raise KeyError(f"unknown parameter {name}")
+                groups[group][field] = value
+            elif name in ("engine", "pyramid_levels"):
+                top[name] = value
+            else:
+                raise KeyError(f"unknown parameter {name}")
+        return self._replace(detector=self.detector._replace(**groups["detector"]), tracker=self.tracker._replace(**groups["tracker"]), **top)
+
+    @classmethod
+    def load(cls, path: str) -> "TrackingConfig":
+        with open(path) as f:
+            data = json.load(f)
+        params = {name: value for name, value in data.items() if name in ("engine", "pyramid_levels")}
+        for group in ("detector", "tracker"):
+            params.update({f"{group}.{name}": value for name, value in data.get(group, {}).items()})
+        return cls().replace(params)
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"engine": self.engine, "pyramid_levels": self.pyramid_levels,
+                       "detector": self.detector._asdict(), "tracker": self.tracker._asdict()}, f, indent=2)
+
+
+DEFAULT_CONFIG = TrackingConfig()
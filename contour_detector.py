@@ -0,0 +1,119 @@
+import cv2
+import numpy as np
+from detector import Detector, gray_stack, map_frames
+from config import DetectorConfig
+from track_store import empty_detections, CIRCLE, RECTANGLE
+
+
+class ContourDetector(Detector):
+    """ 
+        Alternative detection engine, single pass over the frame instead of two separate pipelines (HoughCircles and Canny):
+        the frame is converted to grayscale and thresholded once, contours are extracted once and each contour is classified
+        as circle or rectangle by its shape descriptors. The color is the mean color inside the contour, measured in the same pass.
+
+        Returns the same detections as Detector, so it can be used anywhere instead of it (including the pyramid and ROI modes).
+        Unlike HoughCircles it can't separate overlapping shapes (they form one contour, which is not classified),
+        the tracker handles them as missing detections.
+
+        Parameters
+        ----------
+        pyramid_levels, refine_margin
+            See Detector.
+        threshold : int | None
+            Grayscale threshold separating the shapes from the (dark) background, config.threshold by default.
+        min_circularity : float
+            Minimum 4*pi*area/perimeter^2 of a circle.
+        rectangle_fill : float
+            Minimum area/bounding box area ratio of a rectangle.
+        circle_fill : tuple
+            (min, max) area/bounding box area ratio of a circle (ideal pi/4).
+        config : DetectorConfig | None
+            See Detector, the Hough and Canny parameters aren't used.
+    """
+    # both shape types come from the same pass
+    concurrent_shapes = False
+
+    def __init__(self, pyramid_levels: int = 0, refine_margin: int = 8, threshold: int | None = None, min_circularity: float = 0.7,
+                 rectangle_fill: float = 0.85, circle_fill: tuple = (0.65, 0.85), config: DetectorConfig | None = None) -> None:
+        super().__init__(pyramid_levels, refine_margin, config)
+        self.threshold = self.config.threshold if threshold is None else threshold
+        self.min_circularity = min_circularity
+        self.rectangle_fill = rectangle_fill
+        self.circle_fill = circle_fill
+
+    def detect_batch(self, frames: np.ndarray, workers: int = 1,
+                     min_circle_area: float | None = None, min_rectangle_area: float | None = None) -> list:
+        frames = np.asarray(frames)
+        if self.pyramid_levels > 0:
+            return super().detect_batch(frames, workers, min_circle_area, min_rectangle_area)
+
+        # grayscale + threshold of the whole batch at once, contours and classification per frame
+        gray = gray_stack(frames)
+        _, binary = cv2.threshold(gray.reshape(-1, gray.shape[-1]), self.threshold, 255, cv2.THRESH_BINARY)
+        binary = binary.reshape(gray.shape)
+        return map_frames(lambda i: self._classify(frames[i], binary[i], min_circle_area, min_rectangle_area), range(len(frames)), workers)
+
+    def detect_image(self, image: np.ndarray, min_circle_area: float | None = None, min_rectangle_area: float | None = None) -> np.ndarray:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        _, binary = cv2.threshold(gray, self.threshold, 255, cv2.THRESH_BINARY)
+        return self._classify(image, binary, min_circle_area, min_rectangle_area)
+
+    def _classify(self, image: np.ndarray, binary: np.ndarray, min_circle_area: float | None, min_rectangle_area: float | None) -> np.ndarray:
+        """ Detections of the contours of the thresholded image. """
+        min_circle_area, min_rectangle_area = self._min_areas(min_circle_area, min_rectangle_area)
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        min_area = min(min_circle_area, min_rectangle_area)
+        circles = []
+        rectangles = []
+        for contour in contours:
+            area = cv2.contourArea(contour)
+            if area < min_area:
+                continue
+
+            perimeter = cv2.arcLength(contour, True)
+            x, y, w, h = cv2.boundingRect(contour)
+            fill = area / (w * h)
+            vertices = len(cv2.approxPolyDP(contour, self.config.polygon_epsilon * perimeter, True))
+
+            if vertices == 4 and fill >= self.rectangle_fill and w * h >= min_rectangle_area:
+                rectangles.append((contour, (x, y, x + w, y + h)))
+            elif (vertices > 4 and self.circle_fill[0] <= fill <= self.circle_fill[1]
+                  and 4 * np.pi * area / perimeter ** 2 >= self.min_circularity):
+                r = (w + h) // 4
+                if np.pi * r * r >= min_circle_area:
+                    circles.append((contour, (x + w // 2 - r, y + h // 2 - r, x + w // 2 + r, y + h // 2 + r)))
+
+        # circles first, same order as Detector
+        shapes = circles + rectangles
+        detections = empty_detections(len(shapes))
+        if not shapes:
+            return detections
+
+        detections["shape_type"] = [CIRCLE] * len(circles) + [RECTANGLE] * len(rectangles)
+        detections["bbox"] = [bbox for _, bbox in shapes]
+        bbox = detections["bbox"]
+        detections["center"] = np.column_stack(((bbox[:, 0] + bbox[:, 2]) // 2, (bbox[:, 1] + bbox[:, 3]) // 2))
+        detections["color"] = [self._mean_color(image, contour) for contour, _ in shapes]
+        return detections
+
+    def detect_circles(self, frame: np.ndarray, min_dist: int | None = None, min_radius: int | None = None) -> list | None:
+        """ Same output as Detector.detect_circles, for compatibility, runs the whole single pass. """
+        min_radius = self.config.hough_min_radius if min_radius is None else min_radius
+        detections = self.detect_image(frame, min_circle_area=np.pi * min_radius ** 2)
+        circles = [(int(x), int(y), int((x2 - x1) // 2)) for (x, y), (x1, _, x2, _), shape_type
+                   in zip(detections["center"].tolist(), detections["bbox"].tolist(), detections["shape_type"].tolist()) if shape_type == CIRCLE]
+        return circles or None
+
+    def detect_rectangles(self, frame: np.ndarray) -> list:
+        """ Same output as Detector.detect_rectangles, for compatibility, runs the whole single pass. """
+        detections = self.detect_image(frame, min_rectangle_area=0)
+        return [tuple(bbox) for bbox in detections["bbox"][detections["shape_type"] == RECTANGLE].tolist()]
+
+    def _mean_color(self, image: np.ndarray, contour: np.ndarray) -> tuple:
+        """ Mean RGB color inside the contour, computed only in its bounding box. """
+        x, y, w, h = cv2.boundingRect(contour)
+        mask = np.zeros((h, w), dtype=np.uint8)
+        cv2.drawContours(mask, [contour], -1, 255, -1, offset=(-x, -y))
+        b, g, r, _ = cv2.mean(image[y:y + h, x:x + w], mask=mask)
+        return (round(r), round(g), round(b))
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import numpy as np
+from track_store import DETECTION_DTYPE
+
+# part of the cache key, increase when the detection results of the same parameters change
+CACHE_VERSION = 2
+
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """ Hash of the file content (renamed or copied videos share their cache, changed ones don't). """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def detector_params(detector) -> dict:
+    """ Everything the detections depend on besides the video: engine, its attributes and its DetectorConfig. """
+    attributes = {name: value for name, value in vars(detector).items() if name != "config"}
+    return {
+        "version": CACHE_VERSION,
+        "engine": type(detector).__name__,
+        "attributes": attributes,
+        "config": detector.config._asdict(),
+    }
+
+
+class DetectionCache:
+    """
+        Persistent per-frame detections (DETECTION_DTYPE records) of one video and detector configuration,
+        so re-running the tracking (e.g. with other tracker parameters) doesn't have to repeat the detection.
+
+        Two files in the cache directory, named by the key (hash of the video content and of the detector parameters):
+        <key>.detections with the records of all the frames one after another and <key>.index with the end offset (in records)
+        of each frame. Both are append-only, the cached frames are read through a memory map.
+        The cache covers the frames [0, frame_count), a partial cache (interrupted run) is resumed by appending the next frames.
+        Records written after the last complete index entry (e.g. killed process) are dropped when the cache is opened.
+
+        Parameters
+        ----------
+        directory : str
+            Cache directory, created if it doesn't exist.
+        video_path : str
+            The video file (cameras and streams can't be cached).
+        detector : Detector | ContourDetector
+            The detector producing the detections, see detector_params().
+
+        Methods
+        -------
+        get(frame_id: int) -> np.ndarray | None
+            Detections of the cached frame, None if the frame isn't cached yet.
+
+        append(frame_id: int, detections: np.ndarray) -> None
+            Store the detections of the next frame (frame_id == frame_count), other frames are ignored.
+
+        close() -> None
+    """
+    def __init__(self, directory: str, video_path: str, detector) -> None:
+        params = detector_params(detector)
+        self.video_hash = file_hash(video_path)
+        self.key = hashlib.blake2b(f"{self.video_hash}:{json.dumps(params, sort_keys=True)}".encode(), digest_size=16).hexdigest()
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.key)
+        self.index_path = base + ".index"
+        self.data_path = base + ".detections"
+
+        if not os.path.exists(base + ".json"):
+            with open(base + ".json", "w") as f:
+                json.dump({"video": video_path, "video_hash": self.video_hash, "detector": params}, f, indent=2)
+
+        self._offsets = self._repair() # end offset of each cached frame
+        self._records = self._map(self._offsets[-1] if self._offsets else 0)
+        self._index_file = open(self.index_path, "ab")
+        self._data_file = open(self.data_path, "ab")
+
+    @property
+    def frame_count(self) -> int:
+        return len(self._offsets)
+
+    def get(self, frame_id: int) -> np.ndarray | None:
+        if not 0 <= frame_id < len(self._offsets):
+            return None
+        end = self._offsets[frame_id]
+        if end > len(self._records):
+            # appended after the file was mapped
+            self._records = self._map(self._offsets[-1])
+        start = self._offsets[frame_id - 1] if frame_id > 0 else 0
+        return np.array(self._records[start:end])
+
+    def append(self, frame_id: int, detections: np.ndarray) -> None:
+        if frame_id != len(self._offsets):
+            return
+        end = (self._offsets[-1] if self._offsets else 0) + len(detections)
+        # the records first, an index entry is never written before its records
+        self._data_file.write(np.ascontiguousarray(detections, dtype=DETECTION_DTYPE).tobytes())
+        self._data_file.flush()
+        self._index_file.write(np.int64(end).tobytes())
+        self._index_file.flush()
+        self._offsets.append(end)
+
+    def close(self) -> None:
+        self._index_file.close()
+        self._data_file.close()
+        self._records = None
+
+    def _repair(self) -> list:
+        """ Offsets of the complete frames, truncates the files to them. """
+        index = b""
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                index = f.read()
+        offsets = np.frombuffer(index[:len(index) - len(index) % 8], dtype=np.int64)
+        records = os.path.getsize(self.data_path) // DETECTION_DTYPE.itemsize if os.path.exists(self.data_path) else 0
+        valid = (offsets <= records) & (offsets >= np.concatenate(([0], offsets[:-1])))
+        count = len(offsets) if valid.all() else int(np.argmin(valid))
+        offsets = offsets[:count]
+
+        with open(self.index_path, "ab") as f:
+            f.truncate(count * offsets.itemsize)
+        with open(self.data_path, "ab") as f:
+            f.truncate((int(offsets[-1]) if count else 0) * DETECTION_DTYPE.itemsize)
+        return offsets.tolist()
+
+    def _map(self, records: int) -> np.ndarray:
+        if records == 0:
+            return np.zeros(0, dtype=DETECTION_DTYPE)
+        return np.memmap(self.data_path, dtype=DETECTION_DTYPE, mode="r", shape=(records,))
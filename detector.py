@@ -1,32 +1,221 @@
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
+from track_store import circle_detections, rectangle_detections, empty_detections
+from utils import get_object_colors, merge_boxes
+from config import DetectorConfig
+
+
+def stack_filter(stack: np.ndarray, image_filter, pad: int, border: str) -> np.ndarray:
+    """ 
+        Apply a 2D OpenCV filter to all images of the (N, H, W) stack in one call. The images are stacked vertically,
+        separated by pad rows of their own border (numpy pad mode matching the border mode of the filter),
+        so the result is the same as filtering each image on its own.
+    """
+    if len(stack) == 1:
+        return image_filter(stack[0])[None]
+    n, height, width = stack.shape
+    padded = np.pad(stack, ((0, 0), (pad, pad), (0, 0)), mode=border)
+    return image_filter(padded.reshape(-1, width)).reshape(n, height + 2 * pad, width)[:, pad:pad + height]
+
+
+def gray_stack(frames: np.ndarray) -> np.ndarray:
+    """ Grayscale (N, H, W) of the (N, H, W, 3) BGR frames, one cvtColor call. """
+    n, height, width = frames.shape[:3]
+    return cv2.cvtColor(frames.reshape(-1, width, 3), cv2.COLOR_BGR2GRAY).reshape(n, height, width)
+
+
+def map_frames(function, items, workers: int) -> list:
+    """ [function(item) for item in items], spread over a thread pool if workers > 1 (OpenCV releases the GIL). """
+    if workers <= 1:
+        return [function(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(function, items))
+
 
 class Detector:
     """ 
         simple class that manages the detection of shapes in given image (frame). 
 
+        Parameters
+        ----------
+        pyramid_levels : int
+            Number of cv2.pyrDown halvings of the frame for the multi-resolution mode of detect(), 0 (default) detects in full resolution.
+            The shapes are found in the downscaled frame and then detected again in full resolution, only in small windows around them,
+            to get the exact centers, radii and bounding boxes.
+        refine_margin : int
+            Margin (in full resolution pixels) of the refinement windows around the shapes found in the downscaled frame.
+        config : DetectorConfig | None
+            Thresholds and other parameters of the detection (config.py), the minimum areas are the defaults of the detect methods.
+
         Methods
         -------
+        detect(frame: np.array) -> np.array
+            Both circles and rectangles (bigger than minimum areas) with their colors, as DETECTION_DTYPE records (track_store.py).
+
+        detect_batch(frames: np.array, workers: int = 1) -> list
+            detect() of each frame of the (N, H, W, 3) batch, the preprocessing runs once for the whole batch
+            and the rest (Hough, contours) is spread over workers threads.
+
+        detect_image(image: np.array) -> np.array
+            One full resolution detection pass over the image (frame or its part), the detection engine used by all the other modes.
+
+        to_detections(frame: np.array, circles: list, rectangles: list) -> np.array
+            Second half of detect(), for callers running detect_circles and detect_rectangles on their own (e.g. in parallel).
+
+        detect_pyramid(frame: np.array) -> np.array
+            Multi-resolution version of detect(), used by detect() if pyramid_levels > 0.
+
+        detect_rois(frame: np.array, rois: np.array) -> np.array
+            Same as detect(), but only inside the (x1, y1, x2, y2) regions of interest.
+
         detect_circles(frame: np.array) -> list
 
         detect_rectangles(frame: np.array) -> list
     """
+    # detect_circles and detect_rectangles are independent, they can run concurrently (see ThreadedVideoPipeline)
+    concurrent_shapes = True
+
+    def __init__(self, pyramid_levels: int = 0, refine_margin: int = 8, config: DetectorConfig | None = None) -> None:
+        self.pyramid_levels = pyramid_levels
+        self.refine_margin = refine_margin
+        self.config = config if config is not None else DetectorConfig()
+
+    def detect(self, frame: np.ndarray, min_circle_area: float | None = None, min_rectangle_area: float | None = None) -> np.ndarray:
+        if self.pyramid_levels > 0:
+            return self.detect_pyramid(frame, min_circle_area, min_rectangle_area)
+        return self.detect_image(frame, min_circle_area, min_rectangle_area)
+
+    def detect_batch(self, frames: np.ndarray, workers: int = 1,
+                     min_circle_area: float | None = None, min_rectangle_area: float | None = None) -> list:
+        frames = np.asarray(frames)
+        if self.pyramid_levels > 0:
+            # the downscaled detection decides where to look in full resolution, only the frames are parallel
+            return map_frames(lambda frame: self.detect_pyramid(frame, min_circle_area, min_rectangle_area), frames, workers)
+
+        gray = gray_stack(frames)
+        circle_images = self._circle_images(gray)
+        edge_images = self._edge_images(gray)
+
+        def detect_frame(i: int) -> np.ndarray:
+            circles = self._hough_circles(circle_images[i])
+            rectangles = self._contour_rectangles(self._contours(edge_images[i]))
+            return self.to_detections(frames[i], circles, rectangles, min_circle_area, min_rectangle_area)
+
+        return map_frames(detect_frame, range(len(frames)), workers)
+
+    def detect_image(self, image: np.ndarray, min_circle_area: float | None = None, min_rectangle_area: float | None = None) -> np.ndarray:
+        return self.to_detections(image, self.detect_circles(image), self.detect_rectangles(image), min_circle_area, min_rectangle_area)
 
-    def detect_circles(self, frame: np.ndarray) -> list:
-        gray_image = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) # needed for HoughCircles
+    def detect_pyramid(self, frame: np.ndarray, min_circle_area: float | None = None, min_rectangle_area: float | None = None) -> np.ndarray:
+        """ Multi-resolution detection, see pyramid_levels. """
+        min_circle_area, min_rectangle_area = self._min_areas(min_circle_area, min_rectangle_area)
+        small = frame
+        for _ in range(self.pyramid_levels):
+            small = cv2.pyrDown(small)
+        scale = 2 ** self.pyramid_levels
 
+        # Hough parameters and minimum areas scaled to the downscaled frame, with some tolerance for the lost precision
+        circles = self.detect_circles(small, min_dist=max(1, self.config.hough_min_dist // scale), min_radius=max(1, self.config.hough_min_radius // scale))
+        circles = np.array(circles if circles is not None else [], dtype=np.int64).reshape(-1, 3)
+        # the corners of small rectangles get rounded by the blur, so every contour is a rectangle candidate here,
+        # the full resolution detection in the window decides
+        rectangles = [cv2.boundingRect(contour) for contour in self._find_contours(small)]
+        rectangles = np.array([(x, y, x + w, y + h) for x, y, w, h in rectangles], dtype=np.int64).reshape(-1, 4)
+        circles = circles[np.pi * circles[:, 2] ** 2 >= 0.5 * min_circle_area / scale ** 2]
+        rectangle_areas = np.abs(rectangles[:, 2] - rectangles[:, 0]) * np.abs(rectangles[:, 3] - rectangles[:, 1])
+        rectangles = rectangles[rectangle_areas >= 0.5 * min_rectangle_area / scale ** 2]
+
+        # full resolution windows around the candidates, the margin covers the rounding of the downscaled coordinates
+        margin = self.refine_margin + scale
+        x, y, r = circles[:, 0], circles[:, 1], circles[:, 2]
+        windows = np.concatenate((
+            np.column_stack((x - r, y - r, x + r, y + r)) * scale,
+            rectangles * scale
+        )) + np.array([-margin, -margin, margin, margin])
+
+        height, width = frame.shape[:2]
+        windows[:, [0, 2]] = np.clip(windows[:, [0, 2]], 0, width)
+        windows[:, [1, 3]] = np.clip(windows[:, [1, 3]], 0, height)
+        return self.detect_rois(frame, merge_boxes(windows), min_circle_area, min_rectangle_area)
+
+    def to_detections(self, frame: np.ndarray, circles: list | None, rectangles: list,
+                      min_circle_area: float | None = None, min_rectangle_area: float | None = None) -> np.ndarray:
+        """ Filter the detect_circles() and detect_rectangles() results by the minimum areas and convert them to DETECTION_DTYPE records. """
+        min_circle_area, min_rectangle_area = self._min_areas(min_circle_area, min_rectangle_area)
+        circles = np.array(circles if circles is not None else [], dtype=np.int32).reshape(-1, 3)
+        rectangles = np.array(rectangles, dtype=np.int32).reshape(-1, 4)
+
+        circle_areas = np.pi * circles[:, 2] * circles[:, 2]
+        rectangle_areas = np.abs(rectangles[:, 2] - rectangles[:, 0]) * np.abs(rectangles[:, 3] - rectangles[:, 1])
+
+        detections = np.concatenate((
+            circle_detections(circles[circle_areas >= min_circle_area]),
+            rectangle_detections(rectangles[rectangle_areas >= min_rectangle_area])
+        ))
+        detections["color"] = get_object_colors(frame, detections["center"])
+        return detections
+
+    def detect_rois(self, frame: np.ndarray, rois: np.ndarray,
+                    min_circle_area: float | None = None, min_rectangle_area: float | None = None) -> np.ndarray:
+        height, width = frame.shape[:2]
+        results = [empty_detections()]
+        for x1, y1, x2, y2 in np.asarray(rois, dtype=np.int64).tolist():
+            roi = frame[y1:y2, x1:x2]
+            if roi.size == 0:
+                continue
+
+            detections = self.detect_image(roi, min_circle_area, min_rectangle_area)
+            detections["bbox"] += np.array([x1, y1, x1, y1], dtype=np.int32)
+            detections["center"] += np.array([x1, y1], dtype=np.int32)
+
+            # shapes cut by the ROI border are dropped (wrong center and size), unless the border is the frame border
+            bbox = detections["bbox"]
+            inside = (
+                ((bbox[:, 0] > x1) | (x1 == 0)) & ((bbox[:, 1] > y1) | (y1 == 0)) &
+                ((bbox[:, 2] < x2) | (x2 == width)) & ((bbox[:, 3] < y2) | (y2 == height))
+            )
+            results.append(detections[inside])
+
+        # circles first, same order as detect()
+        detections = np.concatenate(results)
+        return detections[np.argsort(detections["shape_type"], kind="stable")]
+
+    def detect_circles(self, frame: np.ndarray, min_dist: int | None = None, min_radius: int | None = None) -> list:
+        return self._hough_circles(self._circle_images(gray_stack(frame[None]))[0], min_dist, min_radius)
+
+    def detect_rectangles(self, frame: np.ndarray) -> list:
+        return self._contour_rectangles(self._find_contours(frame))
+
+    def _min_areas(self, min_circle_area: float | None, min_rectangle_area: float | None) -> tuple:
+        """ The minimum areas, the configured ones if not given. """
+        return (self.config.min_circle_area if min_circle_area is None else min_circle_area,
+                self.config.min_rectangle_area if min_rectangle_area is None else min_rectangle_area)
+
+    def _find_contours(self, frame: np.ndarray) -> list:
+        return self._contours(self._edge_images(gray_stack(frame[None]))[0])
+
+    # preprocessing of (N, H, W) grayscale stacks, shared by the single frame and the batch detection
+
+    def _circle_images(self, gray: np.ndarray) -> np.ndarray:
         # simple preprocessing for better circle detection
-        _, thresholded_image = cv2.threshold(gray_image, 11, 255, cv2.THRESH_BINARY)
-        blurred_image = cv2.blur(thresholded_image, (4, 4))
+        _, thresholded = cv2.threshold(gray.reshape(-1, gray.shape[-1]), self.config.threshold, 255, cv2.THRESH_BINARY)
+        return stack_filter(thresholded.reshape(gray.shape), lambda image: cv2.blur(image, (4, 4)), 2, "reflect")
+
+    def _edge_images(self, gray: np.ndarray) -> np.ndarray:
+        # medianBlur replicates the border
+        return stack_filter(gray, lambda image: cv2.medianBlur(image, 5), 2, "edge")
 
+    def _hough_circles(self, blurred_image: np.ndarray, min_dist: int | None = None, min_radius: int | None = None) -> list | None:
+        config = self.config
         circles = cv2.HoughCircles(
             blurred_image,
             cv2.HOUGH_GRADIENT,
             dp=1,
-            minDist=20,
-            param1=50,
-            param2=30,
-            minRadius=10,
+            minDist=config.hough_min_dist if min_dist is None else min_dist,
+            param1=config.hough_param1,
+            param2=config.hough_param2,
+            minRadius=config.hough_min_radius if min_radius is None else min_radius,
             maxRadius=0
         )
 
@@ -37,18 +226,17 @@ class Detector:
 
         return circles
 
-    def detect_rectangles(self, frame: np.ndarray) -> list:
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-        blurred = cv2.medianBlur(gray, 5)
-        edged = cv2.Canny(blurred, 50, 150)
-        contours, _ = cv2.findContours(edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
+    def _contour_rectangles(self, contours: list) -> list:
         rectangles = []
         for contour in contours:
-            approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+            approx = cv2.approxPolyDP(contour, self.config.polygon_epsilon * cv2.arcLength(contour, True), True)
             if len(approx) == 4:
                 (x, y, w, h) = cv2.boundingRect(approx)
                 rectangles.append((x, y, x + w, y + h))
 
-        return rectangles
\ No newline at end of file
+        return rectangles
+
+    def _contours(self, blurred: np.ndarray) -> list:
+        edged = cv2.Canny(blurred, self.config.canny_low, self.config.canny_high)
+        contours, _ = cv2.findContours(edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return contours
@@ -0,0 +1,176 @@
+import os
+import queue
+import threading
+import time
+from typing import NamedTuple
+import cv2
+import numpy as np
+from profiling import Profiler
+
+
+class ExportSettings(NamedTuple):
+    """ What the VideoExporter writes (see VideoPipeline(export=...)). """
+    video_path: str | None = None # annotated output video
+    trajectory_path: str | None = None # final trajectory image, the snapshots are written next to it (<name>_<frame>.png)
+    snapshot_interval: int = 0 # trajectory snapshot every N frames, 0 only the final image
+    queue_depth: int = 8 # frames waiting for the encoding
+    drop: bool = False # drop the frames the writer can't keep up with instead of blocking the processing
+    fourcc: str = "mp4v"
+
+
+class VideoExporter:
+    """
+        Writes the annotated frames into a video and the trajectory image (periodic snapshots and the final one) into PNG files
+        in a background thread, so the processing doesn't wait for the encoding.
+
+        The frames are copied into a fixed pool of queue_depth preallocated buffers (trajectory snapshots into a pool of two),
+        the writer thread returns a buffer to its pool after encoding it. When the pool is empty (the writer falls behind),
+        write() either waits for a free buffer (backpressure, every frame is exported) or drops the frame (settings.drop,
+        the processing never waits, the video skips the dropped frames).
+
+        Parameters
+        ----------
+        settings : ExportSettings
+        fps : float
+            Frame rate of the output video.
+        profiler : Profiler | None
+            Records the "export" (copy into the buffer, including the wait for it) and "encode" (writer thread) sections, disabled by default.
+
+        Methods
+        -------
+        write(frame_id: int, frame: np.ndarray, trajectory_image: np.ndarray | None = None) -> bool
+            Queue the frame and the trajectory snapshot, if it's due, False if the frame was dropped (the snapshot is still queued).
+            Errors of the writer thread are raised by the next write() or close().
+
+        close(trajectory_image: np.ndarray | None = None) -> None
+            Wait for the queued frames, write the final trajectory image and close the video.
+
+        report() -> str
+            Exported / dropped frames (and dropped trajectory snapshots) and the encoding time.
+    """
+    def __init__(self, settings: ExportSettings, fps: float, profiler: Profiler | None = None) -> None:
+        self.settings = settings
+        self.fps = fps if fps > 0 and np.isfinite(fps) else 30.0
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.snapshots_dropped = 0
+        self.trajectory_images = 0
+        self.encode_time = 0.0
+        self._writer = None
+        self._frame_buffers = None # free buffers, allocated with the first frame
+        self._snapshot_buffers = None
+        self._pending = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="export", daemon=True)
+        self._thread.start()
+
+    def write(self, frame_id: int, frame: np.ndarray, trajectory_image: np.ndarray | None = None) -> bool:
+        self._raise_error()
+        queued = True
+        with self.profiler.section("export"):
+            if self.settings.video_path:
+                if self._writer is None:
+                    self._open(frame)
+                buffer = self._take(self._frame_buffers)
+                if buffer is None:
+                    self.frames_dropped += 1
+                    queued = False
+                else:
+                    np.copyto(buffer, frame)
+                    self._pending.put(("frame", frame_id, buffer))
+
+            # the snapshot is due regardless of the frame (its own pool of buffers)
+            interval = self.settings.snapshot_interval
+            if interval and self.settings.trajectory_path and trajectory_image is not None and frame_id > 0 and frame_id % interval == 0:
+                if self._snapshot_buffers is None:
+                    self._snapshot_buffers = _buffer_pool(trajectory_image, 2)
+                buffer = self._take(self._snapshot_buffers)
+                if buffer is None:
+                    self.snapshots_dropped += 1
+                else:
+                    np.copyto(buffer, trajectory_image)
+                    self._pending.put(("snapshot", frame_id, buffer))
+        return queued
+
+    def close(self, trajectory_image: np.ndarray | None = None) -> None:
+        if not self._thread.is_alive():
+            return
+        if trajectory_image is not None and self.settings.trajectory_path:
+            self._pending.put(("final", None, trajectory_image.copy()))
+        self._pending.put(None)
+        self._thread.join()
+        if self._writer is not None:
+            self._writer.release()
+        self._raise_error()
+
+    def report(self) -> str:
+        encoded = self.frames_written + self.trajectory_images
+        average = self.encode_time / encoded * 1000 if encoded else 0.0
+        snapshots_dropped = f" ({self.snapshots_dropped} snapshots dropped)" if self.snapshots_dropped else ""
+        return (f"export: {self.frames_written} frames written, {self.frames_dropped} dropped, {self.trajectory_images} trajectory images"
+                f"{snapshots_dropped}, encoding {average:.1f} ms per image")
+
+    def _open(self, frame: np.ndarray) -> None:
+        height, width = frame.shape[:2]
+        self._writer = cv2.VideoWriter(self.settings.video_path, cv2.VideoWriter_fourcc(*self.settings.fourcc), self.fps, (width, height))
+        if not self._writer.isOpened():
+            raise ValueError(f"can't write the video {self.settings.video_path} ({self.settings.fourcc})")
+        self._frame_buffers = _buffer_pool(frame, max(1, self.settings.queue_depth))
+
+    def _take(self, buffers: queue.Queue) -> np.ndarray | None:
+        """ Free buffer of the pool, None if there is none and the frames are dropped. """
+        if self.settings.drop:
+            try:
+                return buffers.get_nowait()
+            except queue.Empty:
+                return None
+        while True:
+            try:
+                return buffers.get(timeout=0.1)
+            except queue.Empty:
+                self._raise_error()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self) -> None:
+        while (item := self._pending.get()) is not None:
+            kind, frame_id, buffer = item
+            if self._error is not None:
+                # only keep the pools going until close()
+                self._release(kind, buffer)
+                continue
+            start = time.perf_counter()
+            try:
+                if kind == "frame":
+                    self._writer.write(buffer)
+                    self.frames_written += 1
+                elif kind == "snapshot":
+                    name, extension = os.path.splitext(self.settings.trajectory_path)
+                    cv2.imwrite(f"{name}_{frame_id:06d}{extension}", buffer)
+                    self.trajectory_images += 1
+                else:
+                    cv2.imwrite(self.settings.trajectory_path, buffer)
+                    self.trajectory_images += 1
+            except Exception as error:
+                self._error = error
+            end = time.perf_counter()
+            self.encode_time += end - start
+            self.profiler.record("encode", start, end)
+            self._release(kind, buffer)
+
+    def _release(self, kind: str, buffer: np.ndarray) -> None:
+        if kind == "frame":
+            self._frame_buffers.put(buffer)
+        elif kind == "snapshot":
+            self._snapshot_buffers.put(buffer)
+
+
+def _buffer_pool(image: np.ndarray, size: int) -> queue.Queue:
+    buffers = queue.Queue()
+    for _ in range(size):
+        buffers.put(np.empty_like(image))
+    return buffers
@@ -1,17 +1,32 @@
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QSizePolicy, QGridLayout, QFrame, QFileDialog, QSpacerItem
+import os
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QSizePolicy, QGridLayout, QFrame, QFileDialog, QSpacerItem, QCheckBox, QMessageBox, QSpinBox
 from PyQt5.QtGui import QPixmap, QImage, QPainter, QColor, QBrush
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from video_processor import VideoProcessorWorker
+from multi_stream_ui import MultiStreamWindow
+from replay_ui import ReplayControls
 from shape_info_ui import ShapeWidget
+from shape_updates import ShapeListDelta
+from profiling import Profiler
+from exporter import ExportSettings
+from config import TrackingConfig, DEFAULT_CONFIG
 import numpy as np
 
+EXPORT_SNAPSHOT_INTERVAL = 250 # frames
+
 class ShapeTrackingApp(QWidget):
     def __init__(self) -> None:
         super().__init__()
+        self.profiler = Profiler(enabled=False) # switched on by the profiling checkbox
         self.initUI()
         self.setFixedWidth(1340)
         self.worker = None
         self.video_file = None
+        self.video_files = [] # more than one selected file is processed in the multi-stream window
+        self.multi_stream_windows = []
+        self.shape_items = {} # shape ID -> (container in the grid, ShapeWidget)
+        self.shape_positions = {} # shape ID -> index in the grid
+        self.icon_cache = {} # (shape type, color) -> QPixmap
 
     def initUI(self) -> None:
         self.setWindowTitle('Shape Tracking')
@@ -58,9 +73,65 @@ class ShapeTrackingApp(QWidget):
         self.start_button.setEnabled(False)  # Disabled until file is selected
         self.start_button.clicked.connect(self.start_processing)
         button_layout.addWidget(self.start_button)
+
+        # real-time mode: paced to the video fps, frames over the latency budget are dropped or only predicted
+        self.realtime_checkbox = QCheckBox('Real-time', self)
+        button_layout.addWidget(self.realtime_checkbox)
+
+        # export of the annotated video and the trajectory image (snapshots every EXPORT_SNAPSHOT_INTERVAL frames) next to the video
+        self.export_checkbox = QCheckBox('Export', self)
+        button_layout.addWidget(self.export_checkbox)
+
+        # track log of the run for the replay, the file is chosen when the processing starts
+        self.track_log_checkbox = QCheckBox('Track Log', self)
+        button_layout.addWidget(self.track_log_checkbox)
         button_layout.setAlignment(Qt.AlignTop)
 
         left_layout.addLayout(button_layout)
+
+        # termination of the tracks not detected for this many frames (max_missed_frames), 0 keeps them alive
+        termination_layout = QHBoxLayout()
+        termination_layout.addWidget(QLabel('Terminate after', self))
+        self.max_missed_input = QSpinBox(self)
+        self.max_missed_input.setRange(0, 100000)
+        self.max_missed_input.setSpecialValueText('never')
+        self.max_missed_input.setSuffix(' missed frames')
+        termination_layout.addWidget(self.max_missed_input)
+        termination_layout.addStretch(1)
+        left_layout.addLayout(termination_layout)
+
+        # replay of a track log (written by a run with the Track Log checkbox) instead of processing the video
+        self.replay_button = QPushButton('Replay Log', self)
+        self.replay_button.clicked.connect(self.open_replay)
+        left_layout.addWidget(self.replay_button, alignment=Qt.AlignTop)
+        self.replay_controls = ReplayControls((window_width, window_height), self)
+        self.replay_controls.frame_ready.connect(self.show_images)
+        left_layout.addWidget(self.replay_controls, alignment=Qt.AlignTop)
+
+        # profiling: overlay with the per-stage timings over the frame window, export of the timings
+        profiling_layout = QHBoxLayout()
+        self.profiling_checkbox = QCheckBox('Profiling', self)
+        self.profiling_checkbox.toggled.connect(self.set_profiling)
+        profiling_layout.addWidget(self.profiling_checkbox)
+
+        self.save_profile_button = QPushButton('Save Profile', self)
+        self.save_profile_button.clicked.connect(self.save_profile)
+        profiling_layout.addWidget(self.save_profile_button)
+        profiling_layout.setAlignment(Qt.AlignTop)
+        left_layout.addLayout(profiling_layout)
+
+        self.profile_overlay = QLabel(self.frame_label)
+        self.profile_overlay.setStyleSheet("background-color: rgba(0, 0, 0, 160); color: white; font-family: monospace; font-size: 10px;")
+        self.profile_overlay.move(4, 4)
+        self.profile_overlay.hide()
+        self.profile_timer = QTimer(self)
+        self.profile_timer.timeout.connect(self.update_profile_overlay)
+
+        # report of the last run (stage utilization, real-time latency)
+        self.report_label = QLabel('', self)
+        self.report_label.setStyleSheet("font-family: monospace; font-size: 10px;")
+        self.report_label.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        left_layout.addWidget(self.report_label, 1)
         bottom_layout.addLayout(left_layout, 1)  
 
         # right (shape list)
@@ -79,12 +150,13 @@ class ShapeTrackingApp(QWidget):
         self.setLayout(main_layout) 
 
     def select_file(self) -> None:
-        """Open a file dialog to select a video file."""
+        """Open a file dialog to select a video file (or more files, processed concurrently)."""
         options = QFileDialog.Options()
-        file, _ = QFileDialog.getOpenFileName(self, "Select Video File", "",
-                                              "Video Files (*.mp4 *.avi *.mov);;All Files (*)", options=options)
-        if file:
-            self.video_file = file
+        files, _ = QFileDialog.getOpenFileNames(self, "Select Video File(s)", "",
+                                                "Video Files (*.mp4 *.avi *.mov);;All Files (*)", options=options)
+        if files:
+            self.video_file = files[0]
+            self.video_files = files
             self.start_button.setEnabled(True)
 
     def start_processing(self) -> None:
@@ -92,57 +164,166 @@ class ShapeTrackingApp(QWidget):
         if not self.video_file:
             return # no file selected
 
+        if len(self.video_files) > 1:
+            # several streams, one tile per stream in a separate window
+            window = MultiStreamWindow(self.video_files, self.tracking_config())
+            window.show()
+            self.multi_stream_windows = [w for w in self.multi_stream_windows if w.isVisible()] + [window]
+            return
+
+        base = os.path.splitext(self.video_file)[0]
+        track_log = None
+        if self.track_log_checkbox.isChecked():
+            # the dialog asks before overwriting an existing log
+            track_log, _ = QFileDialog.getSaveFileName(self, "Save Track Log", base + ".stlog", "Track Logs (*.stlog);;All Files (*)")
+            if not track_log:
+                return
+
         self.start_button.setEnabled(False)
-        self.worker = VideoProcessorWorker(self.video_file) 
+        self.replay_button.setEnabled(False)
+        self.replay_controls.pause()
+        self.replay_controls.setEnabled(False)
+        self.clear_shape_list()
+        self.profiler.reset()
+        self.report_label.clear()
+        export = None
+        if self.export_checkbox.isChecked():
+            # the real-time mode must not wait for the encoding
+            export = ExportSettings(base + "_annotated.mp4", base + "_trajectory.png", EXPORT_SNAPSHOT_INTERVAL,
+                                    drop=self.realtime_checkbox.isChecked())
+        self.worker = VideoProcessorWorker(self.video_file, display_size=(self.frame_label.width(), self.frame_label.height()),
+                                           profiler=self.profiler, realtime=self.realtime_checkbox.isChecked(),
+                                           track_log=track_log, export=export, config=self.tracking_config())
 
         # connect signals with VideoProcessor worker
         self.worker.shapes_updated.connect(self.update_shape_list)
-        self.worker.image_updated.connect(self.update_image)  
-        self.worker.frame_updated.connect(self.update_frame) 
+        self.worker.display_ready.connect(self.update_display)
+        self.worker.processing_failed.connect(self.on_processing_failed)
+        self.worker.report_ready.connect(self.report_label.setText)
         self.worker.processing_finished.connect(self.on_processing_finished)
         self.worker.start()
 
-    def update_shape_list(self, tracked_shapes: list) -> None:
-        for i in reversed(range(self.grid_layout.count())): # clear the grid layout
-            self.grid_layout.itemAt(i).widget().setParent(None)
-
-        for index, shape in enumerate(tracked_shapes):
-            # pixmap for the shape image
-            pixmap_size = 30
-            pixmap = QPixmap(pixmap_size, pixmap_size)
-            pixmap.fill(QColor('transparent'))
+    def tracking_config(self) -> TrackingConfig:
+        """ Parameters of the next run, the defaults with the termination of the tracks set in the GUI. """
+        max_missed_frames = self.max_missed_input.value() or None
+        return DEFAULT_CONFIG.replace({"tracker.max_missed_frames": max_missed_frames})
 
-            painter = QPainter(pixmap)
-            painter.setBrush(QBrush(QColor(*shape.color)))
-            painter.setPen(QColor(*shape.color))
+    def update_shape_list(self, delta: ShapeListDelta) -> None:
+        """ Apply the changes of the shape list, only the widgets of the added, removed and changed shapes are touched. """
+        for shape_id in delta.removed:
+            container, _ = self.shape_items.pop(shape_id)
+            self.shape_positions.pop(shape_id, None)
+            self.grid_layout.removeWidget(container)
+            container.deleteLater()
 
-            if shape.shape_type.name == "CIRCLE":
-                painter.drawEllipse(0, 0, pixmap_size-5, pixmap_size-5)
-            else:
-                painter.drawRect(0, 0, pixmap_size-5, pixmap_size-5)
-
-            painter.end()
+        for shape in delta.changed:
+            _, shape_widget = self.shape_items[shape.id]
+            shape_widget.set_shape(self.shape_icon(shape.shape_type, shape.color), shape.history)
 
+        for shape in delta.added:
             # one shape item (icon + ID), wrapped in a container
-            h_layout = ShapeWidget(pixmap, str(shape.id), shape.history).get_layout()
+            shape_widget = ShapeWidget(self.shape_icon(shape.shape_type, shape.color), str(shape.id), shape.history)
             container = QFrame()
-            container.setLayout(h_layout)
-
-            # add the container to the grid layout
-            row = index // 6  # calc row number (6 items per row)
-            col = index % 6  
-            self.grid_layout.addWidget(container, row, col)
-
-    def update_image(self, qimage: QImage) -> None:
-        pixmap = QPixmap.fromImage(qimage)
-        self.image_label.setPixmap(pixmap)
+            container.setLayout(shape_widget.get_layout())
+            self.shape_items[shape.id] = (container, shape_widget)
+
+        if delta.added or delta.removed:
+            # shapes ordered by ID, only the items which moved are re-added to the grid layout
+            for index, shape_id in enumerate(sorted(self.shape_items)):
+                if self.shape_positions.get(shape_id) == index:
+                    continue
+                container, _ = self.shape_items[shape_id]
+                if shape_id in self.shape_positions:
+                    self.grid_layout.removeWidget(container)
+                self.grid_layout.addWidget(container, index // 6, index % 6) # 6 items per row
+                self.shape_positions[shape_id] = index
+
+    def clear_shape_list(self) -> None:
+        for container, _ in self.shape_items.values():
+            self.grid_layout.removeWidget(container)
+            container.deleteLater()
+        self.shape_items = {}
+        self.shape_positions = {}
+
+    def shape_icon(self, shape_type, color: tuple) -> QPixmap:
+        """ Icon of the shape, painted once for each (type, color). """
+        key = (shape_type, tuple(color))
+        if key in self.icon_cache:
+            return self.icon_cache[key]
+
+        # pixmap for the shape image
+        pixmap_size = 30
+        pixmap = QPixmap(pixmap_size, pixmap_size)
+        pixmap.fill(QColor('transparent'))
+
+        painter = QPainter(pixmap)
+        painter.setBrush(QBrush(QColor(*color)))
+        painter.setPen(QColor(*color))
+
+        if shape_type.name == "CIRCLE":
+            painter.drawEllipse(0, 0, pixmap_size-5, pixmap_size-5)
+        else:
+            painter.drawRect(0, 0, pixmap_size-5, pixmap_size-5)
+
+        painter.end()
+        self.icon_cache[key] = pixmap
+        return pixmap
 
-    def update_frame(self, qimage: QImage) -> None:
-        pixmap = QPixmap.fromImage(qimage)
-        self.frame_label.setPixmap(pixmap)
+    def update_display(self) -> None:
+        # only the latest images are shown, the frames presented while the GUI was busy are skipped
+        images = self.worker.take_display() if self.worker is not None else None
+        if images is None:
+            return
+        self.show_images(*images)
+
+    def show_images(self, qimage_frame: QImage, qimage_trajectory: QImage) -> None:
+        self.frame_label.setPixmap(QPixmap.fromImage(qimage_frame))
+        self.image_label.setPixmap(QPixmap.fromImage(qimage_trajectory))
+
+    def open_replay(self) -> None:
+        """ Replay a track log: the frames and trajectories are rendered from the log, the shape list shows all the logged tracks. """
+        path, _ = QFileDialog.getOpenFileName(self, "Select Track Log", os.path.dirname(self.video_file or ""),
+                                              "Track Logs (*.stlog);;All Files (*)")
+        if not path:
+            return
+        try:
+            log = self.replay_controls.load(path)
+        except (OSError, ValueError) as error:
+            QMessageBox.warning(self, "Replay Log", str(error))
+            return
+        self.clear_shape_list()
+        self.update_shape_list(ShapeListDelta(tuple(shape.snapshot() for shape in log.shapes()), (), ()))
+
+    def set_profiling(self, enabled: bool) -> None:
+        self.profiler.enabled = enabled
+        self.profile_overlay.setVisible(enabled)
+        if enabled:
+            self.update_profile_overlay()
+            self.profile_timer.start(500)
+        else:
+            self.profile_timer.stop()
+
+    def update_profile_overlay(self) -> None:
+        self.profile_overlay.setText(self.profiler.report())
+        self.profile_overlay.adjustSize()
+
+    def save_profile(self) -> None:
+        """ Save the timings as JSON statistics or as Chrome trace (chrome://tracing, Perfetto). """
+        path, selected_filter = QFileDialog.getSaveFileName(self, "Save Profile", "profile.json",
+                                                            "Statistics (*.json);;Chrome trace (*.json)")
+        if not path:
+            return
+        if selected_filter.startswith("Chrome"):
+            self.profiler.save_chrome_trace(path)
+        else:
+            self.profiler.save_json(path)
+
+    def on_processing_failed(self, message: str) -> None:
+        QMessageBox.warning(self, "Processing", message)
 
     def on_processing_finished(self) -> None:
         self.start_button.setEnabled(True)
+        self.replay_button.setEnabled(True)
 
     def create_black_image(self, height: int, width: int) -> QPixmap:
         black_image = np.zeros((height, width, 3), dtype=np.uint8)
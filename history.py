@@ -0,0 +1,116 @@
+import numpy as np
+
+
+class TrackHistory:
+    """ 
+        Compact, NumPy backed history of the centers of one tracked shape.
+
+        Only the frames where the shape was detected are stored (frame ID + center), the frames where the shape was missing
+        are run-length encoded by the gaps between the stored frame IDs (and the frames after the last detection up to last_frame),
+        so a missing frame costs nothing instead of one (frame_id, None) tuple.
+
+        Iterating over the history still yields (frame_id, center) tuples for every frame, with None for the missing ones,
+        same as the old list based history.
+
+        Methods
+        -------
+        append(frame_id, center) -> None
+            Add the next frame, center is None if the shape was not detected in the frame.
+
+        points() -> tuple
+            (frame IDs, centers) arrays of the frames where the shape was detected.
+
+        missing_runs() -> np.ndarray
+            (N, 2) array of (first missing frame ID, number of missing frames) runs.
+
+        frozen() -> TrackHistory
+            O(1) copy of the current state, safe to read from other threads while the original is appended to.
+    """
+    INITIAL_CAPACITY = 16
+
+    def __init__(self, first_frame: int, center: tuple) -> None:
+        self._frames = np.empty(self.INITIAL_CAPACITY, dtype=np.int64)
+        self._centers = np.empty((self.INITIAL_CAPACITY, 2), dtype=np.int32)
+        self._size = 0
+        self.first_frame = first_frame
+        self.last_frame = first_frame - 1
+        self.append(first_frame, center)
+
+    @classmethod
+    def from_arrays(cls, frames: np.ndarray, centers: np.ndarray, last_frame: int) -> "TrackHistory":
+        history = cls.__new__(cls)
+        history._frames = np.array(frames, dtype=np.int64)
+        history._centers = np.array(centers, dtype=np.int32).reshape(-1, 2)
+        history._size = len(history._frames)
+        history.first_frame = int(history._frames[0])
+        history.last_frame = last_frame
+        return history
+
+    def frozen(self) -> "TrackHistory":
+        # append() never writes below _size and reallocates when full, so the views of the filled part never change
+        history = TrackHistory.__new__(TrackHistory)
+        history._frames = self._frames[:self._size]
+        history._centers = self._centers[:self._size]
+        history._size = self._size
+        history.first_frame = self.first_frame
+        history.last_frame = self.last_frame
+        return history
+
+    def append(self, frame_id: int, center: tuple | None) -> None:
+        self.last_frame = frame_id
+        if center is None:
+            return
+
+        if self._size == len(self._frames):
+            self._frames = np.resize(self._frames, 2 * self._size)
+            self._centers = np.resize(self._centers, (2 * self._size, 2))
+        self._frames[self._size] = frame_id
+        self._centers[self._size] = center
+        self._size += 1
+
+    @property
+    def last_valid_frame(self) -> int:
+        """ Frame ID of the last detection of the shape. """
+        return int(self._frames[self._size - 1])
+
+    @property
+    def missed_frames(self) -> int:
+        """ Number of frames since the last detection of the shape. """
+        return self.last_frame - self.last_valid_frame
+
+    def points(self) -> tuple:
+        return self._frames[:self._size], self._centers[:self._size]
+
+    def missing_runs(self) -> np.ndarray:
+        frames = np.append(self._frames[:self._size], self.last_frame + 1)
+        gaps = np.diff(frames) - 1
+        starts = frames[:-1] + 1
+        return np.column_stack((starts[gaps > 0], gaps[gaps > 0]))
+
+    def __len__(self) -> int:
+        return self.last_frame - self.first_frame + 1
+
+    def __iter__(self):
+        frames, centers = self.points()
+        expected_frame = self.first_frame
+        for frame_id, (x, y) in zip(frames.tolist(), centers.tolist()):
+            for missing_frame in range(expected_frame, frame_id):
+                yield (missing_frame, None)
+            yield (frame_id, (x, y))
+            expected_frame = frame_id + 1
+        for missing_frame in range(expected_frame, self.last_frame + 1):
+            yield (missing_frame, None)
+
+    def __getitem__(self, index: int) -> tuple:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("history index out of range")
+
+        frame_id = self.first_frame + index
+        frames = self._frames[:self._size]
+        position = np.searchsorted(frames, frame_id)
+        if position < self._size and frames[position] == frame_id:
+            x, y = self._centers[position].tolist()
+            return (frame_id, (x, y))
+        return (frame_id, None)
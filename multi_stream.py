@@ -0,0 +1,147 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+import numpy as np
+from threaded_pipeline import ThreadedVideoPipeline
+from config import TrackingConfig
+
+
+class StreamFrame(NamedTuple):
+    """ One processed frame of one of the streams of MultiStreamManager. """
+    stream: int # index of the source
+    frame_id: int
+    frame: np.ndarray # annotated frame
+    tracks: np.ndarray # TRACK_DTYPE records of the active tracks
+    trajectory_image: np.ndarray | None # copy of the trajectory image (snapshot mode only)
+    shapes: list | None # ShapeSnapshots of the active tracks (snapshot mode only)
+
+
+class MultiStreamManager:
+    """
+        Processes several sources (video files or local cameras, see open_capture) concurrently.
+        Each source runs in its own ThreadedVideoPipeline (own decoding and Tracker state), the detection of all of them
+        is scheduled on one shared, bounded thread pool (OpenCV releases the GIL, so the pool scales with the cores).
+
+        Scheduling is fair by backpressure: each stream has at most queue_depth + 1 frames in the pool at a time and its decoding
+        blocks until they are tracked, so a fast source can't starve the others. The processed frames of all the streams are merged
+        into one bounded queue, a slow consumer (e.g. the GUI) slows down all the streams instead of buffering frames.
+
+        Parameters
+        ----------
+        sources : list
+            Video file paths / stream URLs / camera indices.
+        detection_workers : int | None
+            Size of the shared detection pool, number of CPUs by default.
+        queue_depth : int
+            Maximum number of frames waiting between the stages of each stream.
+        engine, pyramid_levels, config
+            Detection and tracking settings of all the streams, see VideoPipeline.
+        snapshot : bool
+            Copy the trajectory image and the shapes with every frame (GUI), see ThreadedVideoPipeline.
+
+        Methods
+        -------
+        frames() -> generator
+            StreamFrame of each processed frame of all the streams, in the order they are processed (frames of one stream in order).
+
+        stop() -> None
+            Stop all the streams (e.g. cameras, which never end), frames() returns after the frames already processed.
+
+        report() -> str
+            Frames and fps of each stream and the aggregate throughput of the last run.
+    """
+    def __init__(self, sources: list, detection_workers: int | None = None, queue_depth: int = 2, engine: str | None = None,
+                 pyramid_levels: int | None = None, snapshot: bool = False, config: TrackingConfig | None = None) -> None:
+        self.sources = list(sources)
+        self.detection_workers = detection_workers or os.cpu_count() or 1
+        self.queue_depth = queue_depth
+        self.engine = engine
+        self.pyramid_levels = pyramid_levels
+        self.snapshot = snapshot
+        self.config = config
+        self.pipelines = []
+        self.wall_time = 0.0
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def frames(self):
+        self._stop.clear()
+        pool = ThreadPoolExecutor(self.detection_workers, thread_name_prefix="detect")
+        self.pipelines = [
+            ThreadedVideoPipeline(source, queue_depth=self.queue_depth, detection_workers=self.detection_workers,
+                                  pyramid_levels=self.pyramid_levels, engine=self.engine, snapshot=self.snapshot, pool=pool,
+                                  config=self.config)
+            for source in self.sources
+        ]
+        merged = queue.Queue(max(1, self.queue_depth) * len(self.pipelines))
+        threads = [threading.Thread(target=self._drain, args=(index, pipeline, merged), name=f"stream-{index}", daemon=True)
+                   for index, pipeline in enumerate(self.pipelines)]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        try:
+            running = len(threads)
+            while running:
+                try:
+                    item = merged.get(timeout=0.1)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        break
+                    continue
+                if item is None:
+                    running -= 1
+                elif isinstance(item, BaseException):
+                    raise item
+                else:
+                    yield item
+        finally:
+            self._stop.set()
+            # unblock the streams waiting for space in the merged queue
+            while any(thread.is_alive() for thread in threads):
+                try:
+                    merged.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            pool.shutdown(wait=True, cancel_futures=True)
+            self.wall_time = time.perf_counter() - start
+
+    def report(self) -> str:
+        lines = [f"{'stream':<6} {'frames':>7} {'fps':>7}  source"]
+        for index, (source, pipeline) in enumerate(zip(self.sources, self.pipelines)):
+            fps = pipeline.frame_count / pipeline.wall_time if pipeline.wall_time > 0 else 0.0
+            lines.append(f"{index:<6} {pipeline.frame_count:>7} {fps:>7.1f}  {source}")
+        total = sum(pipeline.frame_count for pipeline in self.pipelines)
+        fps = total / self.wall_time if self.wall_time > 0 else 0.0
+        lines.append(f"{'total':<6} {total:>7} {fps:>7.1f}  ({self.detection_workers} detection threads)")
+        return "\n".join(lines)
+
+    def _drain(self, index: int, pipeline: ThreadedVideoPipeline, merged: queue.Queue) -> None:
+        """ Moves the frames of one stream into the merged queue, None marks the end of the stream. """
+        frames = pipeline.frames()
+        try:
+            for frame_id, frame, tracks in frames:
+                item = StreamFrame(index, frame_id, frame, tracks, pipeline.trajectory_image if self.snapshot else None,
+                                   pipeline.shapes if self.snapshot else None)
+                if not self._put(merged, item):
+                    return
+            self._put(merged, None)
+        except Exception as error:
+            self._put(merged, error)
+        finally:
+            frames.close()
+
+    def _put(self, merged: queue.Queue, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                merged.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
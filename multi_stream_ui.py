@@ -0,0 +1,117 @@
+import math
+import threading
+import time
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QGridLayout, QLabel, QPushButton
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from multi_stream import MultiStreamManager
+from config import TrackingConfig
+from video_processor import FramePresenter
+
+
+class MultiStreamWorker(QThread):
+    """
+        Worker thread for processing several sources at once (MultiStreamManager), the consumer of the merged frames of all the streams.
+        Same display model as VideoProcessorWorker: each stream presents at most max_display_fps frames per second at the tile size,
+        only the latest frame of each stream waits for the GUI (take_display()).
+    """
+    display_ready = pyqtSignal()
+    report_ready = pyqtSignal(str) # frames and fps of each stream of the finished run
+    processing_finished = pyqtSignal()
+
+    def __init__(self, sources: list, tile_size: tuple = (426, 240), detection_workers: int | None = None, max_display_fps: float | None = 15.0,
+                 config: TrackingConfig | None = None):
+        super().__init__()
+        self.manager = MultiStreamManager(sources, detection_workers=detection_workers, config=config)
+        self.presenters = [FramePresenter(tile_size) for _ in sources]
+        self.min_display_interval = 1.0 / max_display_fps if max_display_fps else 0.0
+        self._last_display = [None] * len(sources)
+        self._display = {} # stream -> (QImage, caption) waiting for the GUI
+        self._display_lock = threading.Lock()
+
+    def run(self) -> None:
+        for item in self.manager.frames():
+            now = time.monotonic()
+            last = self._last_display[item.stream]
+            if last is not None and now - last < self.min_display_interval:
+                continue
+            self._last_display[item.stream] = now
+
+            qimage = self.presenters[item.stream].present(item.frame)
+            caption = f"{self.manager.sources[item.stream]} - frame {item.frame_id}, {len(item.tracks)} shapes"
+            with self._display_lock:
+                waiting = bool(self._display)
+                self._display[item.stream] = (qimage, caption)
+            if not waiting:
+                self.display_ready.emit()
+
+        self.report_ready.emit(self.manager.report())
+        self.processing_finished.emit()
+
+    def stop(self) -> None:
+        self.manager.stop()
+
+    def take_display(self) -> dict:
+        """ {stream: (QImage, caption)} of the streams with a new frame since the last call. """
+        with self._display_lock:
+            display, self._display = self._display, {}
+        return display
+
+
+class MultiStreamWindow(QWidget):
+    """ One tile (frame + caption) per stream, the streams are processed by MultiStreamWorker. """
+    def __init__(self, sources: list, config: TrackingConfig | None = None, parent=None) -> None:
+        super().__init__(parent)
+        self.setWindowTitle(f'Shape Tracking - {len(sources)} streams')
+        columns = math.ceil(math.sqrt(len(sources)))
+        tile_width, tile_height = 426, 240
+
+        main_layout = QVBoxLayout(self)
+        grid_layout = QGridLayout()
+        self.tiles = []
+        for index, source in enumerate(sources):
+            image_label = QLabel(self)
+            image_label.setFixedSize(tile_width, tile_height)
+            image_label.setStyleSheet("background-color: black;")
+            caption_label = QLabel(str(source), self)
+            caption_label.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
+
+            tile_layout = QVBoxLayout()
+            tile_layout.addWidget(image_label)
+            tile_layout.addWidget(caption_label)
+            grid_layout.addLayout(tile_layout, index // columns, index % columns)
+            self.tiles.append((image_label, caption_label))
+        main_layout.addLayout(grid_layout)
+
+        self.report_label = QLabel('', self)
+        self.report_label.setStyleSheet("font-family: monospace; font-size: 10px;")
+        main_layout.addWidget(self.report_label)
+
+        self.stop_button = QPushButton('Stop', self)
+        self.stop_button.clicked.connect(self.stop)
+        main_layout.addWidget(self.stop_button)
+
+        self.worker = MultiStreamWorker(sources, tile_size=(tile_width, tile_height), config=config)
+        self.worker.display_ready.connect(self.update_tiles)
+        self.worker.report_ready.connect(self.report_label.setText)
+        self.worker.processing_finished.connect(self.on_processing_finished)
+        self.worker.start()
+
+    def update_tiles(self) -> None:
+        for stream, (qimage, caption) in self.worker.take_display().items():
+            image_label, caption_label = self.tiles[stream]
+            image_label.setPixmap(QPixmap.fromImage(qimage))
+            caption_label.setText(caption)
+
+    def stop(self) -> None:
+        self.stop_button.setEnabled(False)
+        self.worker.stop()
+
+    def on_processing_finished(self) -> None:
+        self.update_tiles()
+        self.stop_button.setEnabled(False)
+
+    def closeEvent(self, event) -> None:
+        self.worker.stop()
+        self.worker.wait()
+        super().closeEvent(event)
@@ -0,0 +1,223 @@
+import cv2
+import numpy as np
+from detector import Detector
+from contour_detector import ContourDetector
+from tracker import Tracker
+from archive import TrackArchive
+from roi_detection import PredictiveDetector
+from profiling import Profiler
+from detection_cache import DetectionCache
+from track_log import TrackLogWriter
+from config import TrackingConfig, DEFAULT_CONFIG
+from exporter import ExportSettings, VideoExporter
+
+# detection engines selectable by name (CLI, pipelines)
+DETECTOR_ENGINES = {
+    "hough": Detector,
+    "contour": ContourDetector,
+}
+
+
+def create_detector(config: TrackingConfig) -> Detector:
+    """ Detection engine of the config (engine, pyramid levels and DetectorConfig). """
+    return DETECTOR_ENGINES[config.engine](pyramid_levels=config.pyramid_levels, config=config.detector)
+
+
+def resolve_config(config: TrackingConfig | None, engine: str | None = None, pyramid_levels: int | None = None) -> TrackingConfig:
+    """ The config (DEFAULT_CONFIG if None) with the explicitly given engine and pyramid levels. """
+    config = config if config is not None else DEFAULT_CONFIG
+    if engine is not None:
+        config = config._replace(engine=engine)
+    if pyramid_levels is not None:
+        config = config._replace(pyramid_levels=pyramid_levels)
+    return config
+
+
+def is_camera(source: str | int) -> bool:
+    """ Local camera given by its index (int or digits, e.g. "0"). """
+    return isinstance(source, int) or str(source).isdigit()
+
+
+def open_capture(source: str | int) -> cv2.VideoCapture:
+    """ cv2.VideoCapture of a video file / stream URL, or of a local camera given by its index (see is_camera). """
+    if is_camera(source):
+        return cv2.VideoCapture(int(source))
+    return cv2.VideoCapture(source)
+
+
+def read_batch(cap: cv2.VideoCapture, size: int) -> np.ndarray | None:
+    """ Next (up to) size frames of the capture as (N, H, W, 3) array, None at the end of the video. """
+    frames = []
+    while len(frames) < size:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    return np.stack(frames) if frames else None
+
+
+class VideoPipeline:
+    """
+        The decode -> Detector -> Tracker loop, shared by the GUI worker (video_processor.py) and the headless CLI (shape_tracker.py).
+        Must not import anything from PyQt5, so it can run on machines without a display stack.
+
+        Parameters
+        ----------
+        video_path : str
+            Path to the video file (anything cv2.VideoCapture can open), or index of a local camera (see open_capture).
+        archive : TrackArchive | None
+            Store for the terminated tracks, see Tracker.
+        roi_refresh : int | None
+            Detect only around the predicted positions of the tracked shapes and the whole frame every roi_refresh frames
+            (see PredictiveDetector), None detects the whole frame every frame.
+        pyramid_levels : int | None
+            Multi-resolution detection, see Detector, overrides config.pyramid_levels.
+        engine : str | None
+            Detection engine, key of DETECTOR_ENGINES ("hough" - Detector, "contour" - ContourDetector), overrides config.engine.
+        batch_size : int
+            Read and detect the frames in blocks of batch_size frames (Detector.detect_batch), not possible with roi_refresh
+            (the regions depend on the tracking of the previous frame). The frames are still tracked and yielded one by one.
+        batch_workers : int
+            Threads of Detector.detect_batch.
+        cache_dir : str | None
+            Persistent detection cache directory (DetectionCache, detection_cache.py), the cached frames of the video are not detected again
+            and the newly detected frames are added to the cache. Video files only, not possible with roi_refresh.
+        track_log : str | None
+            Write the drawn shapes of every frame to this track log file (TrackLogWriter, track_log.py), for the replay.
+        profiler : Profiler | None
+            Records the "decode", "detect" ("cache" for the cached frames) and "track" sections (and the sections of the Tracker), disabled by default.
+        config : TrackingConfig | None
+            Detector and tracker parameters (config.py), DEFAULT_CONFIG by default.
+        export : ExportSettings | None
+            Write the annotated frames into a video and the trajectory image into PNG files in a background thread (VideoExporter, exporter.py).
+
+        Methods
+        -------
+        frames() -> generator
+            Process the video frame by frame, yields (frame_id, annotated frame, active tracks) for each frame,
+            the tracks are TRACK_DTYPE records (track_store.py), see Tracker.tracked_shapes for Shape views.
+    """
+    def __init__(self, video_path: str, archive: TrackArchive | None = None, roi_refresh: int | None = None, pyramid_levels: int | None = None,
+                 engine: str | None = None, batch_size: int = 1, batch_workers: int = 1, cache_dir: str | None = None,
+                 track_log: str | None = None, profiler: Profiler | None = None, config: TrackingConfig | None = None,
+                 export: ExportSettings | None = None) -> None:
+        if batch_size > 1 and roi_refresh:
+            raise ValueError("batch detection can't be combined with the ROI detection")
+        if cache_dir and roi_refresh:
+            raise ValueError("the detection cache can't be combined with the ROI detection")
+        self.video_path = video_path
+        self.archive = archive
+        self.roi_refresh = roi_refresh
+        self.batch_size = batch_size
+        self.batch_workers = batch_workers
+        self.cache_dir = cache_dir
+        self.track_log_path = track_log
+        self.track_log = None
+        self.export = export
+        self.exporter = None
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        self.config = resolve_config(config, engine, pyramid_levels)
+        self.detector = create_detector(self.config)
+        self.predictive_detector = None
+        self.detection_cache = None
+        self.cached_frames = 0 # number of frames of the last run read from the detection cache
+        self.tracker = None
+        self.frame_count = 0 # number of frames processed so far
+
+    @property
+    def trajectory_image(self) -> np.ndarray | None:
+        return self.tracker.trajectory_image if self.tracker is not None else None
+
+    @property
+    def shapes(self) -> list:
+        """ Shape views of the active tracks (for the GUI). """
+        return self.tracker.tracked_shapes if self.tracker is not None else []
+
+    def frames(self):
+        cap = open_capture(self.video_path)
+        self.tracker = self._new_tracker(cap)
+        if self.roi_refresh:
+            self.predictive_detector = PredictiveDetector(self.detector, self.tracker, refresh_interval=self.roi_refresh)
+        self.frame_count = 0
+        self.cached_frames = 0
+        if self.cache_dir:
+            self.detection_cache = DetectionCache(self.cache_dir, self.video_path, self.detector)
+
+        try:
+            for frame_id, frame, detections in self._detected_frames(cap):
+                if self.detection_cache is not None:
+                    self.detection_cache.append(frame_id, detections)
+                # pass detected shapes to the tracker to handle the tracking and drawing
+                with self.profiler.section("track"):
+                    tracks = self.tracker.new_frame(frame_id, frame, detections)
+                if self.exporter is not None:
+                    self.exporter.write(frame_id, frame, self.tracker.trajectory_image)
+                yield frame_id, frame, tracks
+
+                self.frame_count = frame_id + 1
+        finally:
+            cap.release()
+            if self.detection_cache is not None:
+                self.detection_cache.close()
+            self._close_writers()
+
+    def _new_tracker(self, cap: cv2.VideoCapture) -> Tracker:
+        """ Tracker for the frames of the capture (and its track log writer and exporter). """
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        if self.track_log_path:
+            self.track_log = TrackLogWriter(self.track_log_path, width, height, cap.get(cv2.CAP_PROP_FPS))
+        if self.export is not None:
+            self.exporter = VideoExporter(self.export, cap.get(cv2.CAP_PROP_FPS), self.profiler)
+        return Tracker(np.zeros((height, width, 3), dtype=np.uint8), **self.config.tracker._asdict(), archive=self.archive, profiler=self.profiler,
+                       track_log=self.track_log)
+
+    def _close_writers(self) -> None:
+        """ Finish the track log and the export (final trajectory image) at the end of frames(). """
+        if self.track_log is not None:
+            self.track_log.close()
+        if self.exporter is not None:
+            self.exporter.close(self.tracker.trajectory_image if self.frame_count else None)
+
+    def _detected_frames(self, cap: cv2.VideoCapture):
+        """ (frame_id, frame, detections) of the frames of the capture. """
+        frame_id = 0
+        cached = self.detection_cache.frame_count if self.detection_cache is not None else 0
+        while frame_id < cached:
+            # the frames are still decoded, the tracker draws into them
+            with self.profiler.section("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                return
+            with self.profiler.section("cache"):
+                detections = self.detection_cache.get(frame_id)
+            yield frame_id, frame, detections
+            frame_id += 1
+            self.cached_frames = frame_id
+
+        if self.batch_size > 1:
+            while True:
+                with self.profiler.section("decode_batch"):
+                    batch = read_batch(cap, self.batch_size)
+                if batch is None:
+                    break
+                with self.profiler.section("detect_batch"):
+                    batch_detections = self.detector.detect_batch(batch, self.batch_workers)
+                for frame, detections in zip(batch, batch_detections):
+                    yield frame_id, frame, detections
+                    frame_id += 1
+            return
+
+        while cap.isOpened():
+            with self.profiler.section("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+
+            with self.profiler.section("detect"):
+                if self.predictive_detector is not None:
+                    detections = self.predictive_detector.detect(frame_id, frame)
+                else:
+                    detections = self.detector.detect(frame)
+            yield frame_id, frame, detections
+            frame_id += 1
@@ -0,0 +1,134 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+import numpy as np
+
+_DISABLED = nullcontext() # shared no-op section of the disabled profiler
+
+
+class Profiler:
+    """
+        Timing hooks for the processing stages: `with profiler.section("detect"): ...` records the duration of the block.
+        Keeps the last window durations of each section for rolling p50 / p95 / max latency and fps,
+        and optionally the raw events for a Chrome trace (chrome://tracing, Perfetto). Sections can be recorded from any thread.
+        When disabled, section() returns a shared no-op context manager, so the hooks can stay in the code.
+
+        Parameters
+        ----------
+        enabled : bool
+            Record the sections, can be switched at any time.
+        window : int
+            Number of the last durations of each section used for the statistics.
+        trace_events : int
+            Maximum number of the last events kept for the Chrome trace, 0 doesn't keep any.
+
+        Methods
+        -------
+        section(name: str) -> context manager
+
+        stats() -> dict
+            {section: {count, p50_ms, p95_ms, max_ms, fps}} of the rolling window.
+
+        report() -> str
+            stats() as a text table.
+
+        save_json(path: str) -> None
+
+        save_chrome_trace(path: str) -> None
+
+        reset() -> None
+    """
+    def __init__(self, enabled: bool = True, window: int = 300, trace_events: int = 100_000) -> None:
+        self.enabled = enabled
+        self.window = window
+        self.trace_events = trace_events
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples = {} # section -> deque of (start, end)
+            self._counts = {}
+            self._trace = deque(maxlen=self.trace_events) if self.trace_events else None
+            self._origin = time.perf_counter()
+
+    def section(self, name: str):
+        if not self.enabled:
+            return _DISABLED
+        return _Section(self, name)
+
+    def record(self, name: str, start: float, end: float) -> None:
+        """ Add a measured section, start and end are time.perf_counter() values. """
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._counts[name] = 0
+            samples.append((start, end))
+            self._counts[name] += 1
+            if self._trace is not None:
+                self._trace.append((name, start, end, threading.current_thread().name))
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = {name: np.array(values) for name, values in self._samples.items()}
+            counts = dict(self._counts)
+
+        stats = {}
+        for name, values in samples.items():
+            durations = (values[:, 1] - values[:, 0]) * 1000
+            span = values[-1, 1] - values[0, 0]
+            stats[name] = {
+                "count": counts[name],
+                "p50_ms": float(np.percentile(durations, 50)),
+                "p95_ms": float(np.percentile(durations, 95)),
+                "max_ms": float(durations.max()),
+                "fps": len(values) / span if span > 0 else 0.0,
+            }
+        return stats
+
+    def report(self) -> str:
+        lines = [f"{'section':<18} {'count':>7} {'p50 [ms]':>9} {'p95 [ms]':>9} {'max [ms]':>9} {'fps':>7}"]
+        for name, stats in self.stats().items():
+            lines.append(f"{name:<18} {stats['count']:>7} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['max_ms']:>9.2f} {stats['fps']:>7.1f}")
+        return "\n".join(lines)
+
+    def save_json(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"window": self.window, "sections": self.stats()}, f, indent=2)
+
+    def save_chrome_trace(self, path: str) -> None:
+        """ Complete ("X") events in the Chrome trace event format, one track per thread. """
+        with self._lock:
+            events = list(self._trace or [])
+            origin = self._origin
+
+        pid = os.getpid()
+        thread_ids = {}
+        trace = []
+        for name, start, end, thread in events:
+            tid = thread_ids.setdefault(thread, len(thread_ids))
+            trace.append({"name": name, "ph": "X", "pid": pid, "tid": tid,
+                          "ts": round((start - origin) * 1e6, 1), "dur": round((end - start) * 1e6, 1)})
+        for thread, tid in thread_ids.items():
+            trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread}})
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+class _Section:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler: Profiler, name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.profiler.record(self.name, self.start, time.perf_counter())
@@ -0,0 +1,202 @@
+import math
+import threading
+import time
+import cv2
+import numpy as np
+from pipeline import VideoPipeline, open_capture, is_camera
+from archive import TrackArchive
+from roi_detection import PredictiveDetector
+from profiling import Profiler
+from config import TrackingConfig
+from exporter import ExportSettings
+
+
+class LatestFrame:
+    """ One frame slot between the capture thread and the processing, a new frame replaces the waiting one (the old one is dropped). """
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._item = None
+        self._ended = False
+        self._error = None
+        self.overwritten = 0 # frames replaced before they were taken
+
+    def put(self, item) -> None:
+        with self._condition:
+            if self._item is not None:
+                self.overwritten += 1
+            self._item = item
+            self._condition.notify()
+
+    def end(self, error: BaseException | None = None) -> None:
+        with self._condition:
+            self._ended = True
+            self._error = error
+            self._condition.notify()
+
+    def get(self):
+        """ The waiting frame (blocks until there is one), None at the end of the stream. """
+        with self._condition:
+            while self._item is None and not self._ended:
+                self._condition.wait()
+            if self._error is not None:
+                raise self._error
+            item, self._item = self._item, None
+            return item
+
+
+class RealtimeVideoPipeline(VideoPipeline):
+    """
+        VideoPipeline with bounded latency instead of processing every frame. The capture thread reads a video file
+        at its own fps (CAP_PROP_FPS, like a live stream) or a camera as fast as it delivers the frames, the processing always
+        takes the newest frame, the frames it didn't keep up with are dropped.
+
+        Each frame has a latency budget from its capture to the end of its processing (including the consumer of frames()):
+            - a frame older than the budget when it's taken is dropped (stale)
+            - if the detection wouldn't fit into the rest of the budget (estimated from the last detected frames),
+              the frame isn't detected and the tracks coast on their constant velocity prediction (Tracker.coast, yellow boxes),
+              at most max_coasted frames in a row, then a frame is detected regardless of the budget
+        The dropped and coasted frames count as missed frames of the tracks (see Tracker.new_frame), so the segments of the trajectory
+        and the termination of the tracks (max_missed_frames) depend on the frames of the source, not on the load.
+
+        Parameters
+        ----------
+        video_path : str
+            Path to the video file, or index of a local camera (see open_capture).
+        archive : TrackArchive | None
+            Store for the terminated tracks, see Tracker.
+        budget : float | None
+            Latency budget of a frame in seconds, two frame intervals of the source by default.
+        max_coasted : int
+            Maximum number of consecutive frames without detection.
+        roi_refresh, pyramid_levels, engine, config
+            Detection and tracking settings, see VideoPipeline.
+        track_log : str | None
+            Track log file for the replay, see VideoPipeline (the dropped frames are logged as empty).
+        export : ExportSettings | None
+            Export of the annotated video and the trajectory image, see VideoPipeline (only the processed frames, the copy for the export
+            is part of the latency).
+        profiler : Profiler | None
+            Records the "decode", "detect", "track" and "latency" (capture -> processed) sections, disabled by default.
+
+        Methods
+        -------
+        frames() -> generator
+            Same as VideoPipeline.frames(), only for the processed frames (the frame IDs of the dropped ones are skipped).
+
+        report() -> str
+            Processed / coasted / dropped frames and the latency statistics of the last run.
+    """
+    def __init__(self, video_path: str, archive: TrackArchive | None = None, budget: float | None = None, max_coasted: int = 5,
+                 roi_refresh: int | None = None, pyramid_levels: int | None = None, engine: str | None = None, track_log: str | None = None,
+                 profiler: Profiler | None = None, config: TrackingConfig | None = None, export: ExportSettings | None = None) -> None:
+        super().__init__(video_path, archive, roi_refresh=roi_refresh, pyramid_levels=pyramid_levels, engine=engine, track_log=track_log,
+                         profiler=profiler, config=config, export=export)
+        self.budget = budget
+        self.max_coasted = max_coasted
+        self.source_fps = 0.0
+        self.frames_read = 0
+        self.detected_frames = 0
+        self.coasted_frames = 0
+        self.stale_frames = 0
+        self.overwritten_frames = 0
+        self.latencies = [] # seconds from the capture to the end of the processing of each processed frame
+        self._detected_cost = 0.0 # moving average of the processing time of the detected frames
+
+    @property
+    def dropped_frames(self) -> int:
+        return self.stale_frames + self.overwritten_frames
+
+    def frames(self):
+        cap = open_capture(self.video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        self.source_fps = fps if fps > 0 and math.isfinite(fps) else 30.0
+        budget = self.budget or 2.0 / self.source_fps
+        self.tracker = self._new_tracker(cap)
+        if self.roi_refresh:
+            self.predictive_detector = PredictiveDetector(self.detector, self.tracker, refresh_interval=self.roi_refresh)
+        self.frame_count = 0
+        self.frames_read = self.detected_frames = self.coasted_frames = self.stale_frames = self.overwritten_frames = 0
+        self.latencies = []
+        self._detected_cost = 0.0
+
+        slot = LatestFrame()
+        stop = threading.Event()
+        thread = threading.Thread(target=self._capture, args=(cap, slot, stop, not is_camera(self.video_path)), name="capture", daemon=True)
+        thread.start()
+
+        coasted_in_row = 0
+        try:
+            while (item := slot.get()) is not None:
+                frame_id, frame, captured = item
+                start = time.perf_counter()
+                age = start - captured
+                if age > budget:
+                    self.stale_frames += 1
+                    continue
+
+                detect = coasted_in_row >= self.max_coasted or age + self._detected_cost <= budget
+                if detect:
+                    with self.profiler.section("detect"):
+                        if self.predictive_detector is not None:
+                            detections = self.predictive_detector.detect(frame_id, frame)
+                        else:
+                            detections = self.detector.detect(frame)
+                    with self.profiler.section("track"):
+                        tracks = self.tracker.new_frame(frame_id, frame, detections)
+                    self.detected_frames += 1
+                    coasted_in_row = 0
+                else:
+                    with self.profiler.section("track"):
+                        tracks = self.tracker.coast(frame_id, frame)
+                    self.coasted_frames += 1
+                    coasted_in_row += 1
+                if self.exporter is not None:
+                    self.exporter.write(frame_id, frame, self.tracker.trajectory_image)
+                yield frame_id, frame, tracks
+
+                end = time.perf_counter()
+                self.latencies.append(end - captured)
+                self.profiler.record("latency", captured, end)
+                if detect:
+                    self._detected_cost = end - start if self.detected_frames == 1 else 0.8 * self._detected_cost + 0.2 * (end - start)
+                self.frame_count = frame_id + 1
+        finally:
+            stop.set()
+            thread.join()
+            cap.release()
+            self._close_writers()
+            self.overwritten_frames = slot.overwritten
+
+    def report(self) -> str:
+        budget = self.budget or (2.0 / self.source_fps if self.source_fps else 0.0)
+        processed = self.detected_frames + self.coasted_frames
+        lines = [f"real-time: source {self.source_fps:.1f} fps, budget {budget * 1000:.1f} ms, {self.frames_read} frames read",
+                 f"processed {processed} (detected {self.detected_frames}, coasted {self.coasted_frames}), "
+                 f"dropped {self.dropped_frames} (overwritten {self.overwritten_frames}, stale {self.stale_frames})"]
+        if self.latencies:
+            latencies = np.array(self.latencies) * 1000
+            over = int((latencies > budget * 1000).sum())
+            lines.append(f"latency p50 {np.percentile(latencies, 50):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms, "
+                         f"max {latencies.max():.1f} ms, over budget {over} frames")
+        return "\n".join(lines)
+
+    def _capture(self, cap: cv2.VideoCapture, slot: LatestFrame, stop: threading.Event, paced: bool) -> None:
+        """ Reads the frames into the slot, video files paced to their fps (the capture time of a frame is when it's due). """
+        interval = 1.0 / self.source_fps
+        start = time.perf_counter()
+        frame_id = 0
+        try:
+            while not stop.is_set():
+                due = start + frame_id * interval
+                if paced and stop.wait(max(0.0, due - time.perf_counter())):
+                    break
+                with self.profiler.section("decode"):
+                    ret, frame = cap.read()
+                if not ret:
+                    break
+                slot.put((frame_id, frame, due if paced else time.perf_counter()))
+                frame_id += 1
+                self.frames_read = frame_id
+            slot.end()
+        except Exception as error:
+            slot.end(error)
@@ -0,0 +1,106 @@
+import time
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QSlider, QComboBox
+from PyQt5.QtGui import QImage
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from track_log import TrackLog, TrackLogPlayer
+from video_processor import FramePresenter
+
+REPLAY_SPEEDS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+
+
+class ReplayControls(QWidget):
+    """
+        Replay of a track log (track_log.py) instead of processing the video: play / pause, speed and a slider for seeking.
+        The frames are rendered from the log by TrackLogPlayer (no decoding or detection) in the GUI thread and signaled
+        as (frame, trajectory) QImages of the display size.
+    """
+    frame_ready = pyqtSignal(QImage, QImage)
+
+    def __init__(self, display_size: tuple, parent=None) -> None:
+        super().__init__(parent)
+        self.log = None
+        self.player = None
+        self.position = 0.0 # current frame, fractional while playing
+        self._last_tick = None
+        self.frame_presenter = FramePresenter(display_size)
+        self.trajectory_presenter = FramePresenter(display_size)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        controls_layout = QHBoxLayout()
+        self.play_button = QPushButton('Play', self)
+        self.play_button.clicked.connect(self.toggle_play)
+        controls_layout.addWidget(self.play_button)
+
+        self.speed_combo = QComboBox(self)
+        for speed in REPLAY_SPEEDS:
+            self.speed_combo.addItem(f"{speed:g}x", speed)
+        self.speed_combo.setCurrentIndex(REPLAY_SPEEDS.index(1.0))
+        controls_layout.addWidget(self.speed_combo)
+
+        self.frame_text = QLabel('', self)
+        controls_layout.addWidget(self.frame_text, 1)
+        layout.addLayout(controls_layout)
+
+        self.slider = QSlider(Qt.Horizontal, self)
+        self.slider.valueChanged.connect(self.seek)
+        layout.addWidget(self.slider)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(33)
+        self.timer.timeout.connect(self.tick)
+        self.setEnabled(False)
+
+    def load(self, path: str) -> TrackLog:
+        """ Open the log and show its first frame, raises ValueError if the file isn't a track log. """
+        self.pause()
+        log = TrackLog(path)
+        if self.player is not None:
+            self.player.close()
+        self.log, self.player = log, TrackLogPlayer(log)
+        self.position = 0.0
+        self.slider.blockSignals(True)
+        self.slider.setRange(0, max(0, log.frame_count - 1))
+        self.slider.setValue(0)
+        self.slider.blockSignals(False)
+        self.setEnabled(log.frame_count > 0)
+        if log.frame_count:
+            self.show_frame(0)
+        return log
+
+    def toggle_play(self) -> None:
+        if self.timer.isActive():
+            self.pause()
+            return
+        if self.position >= self.log.frame_count - 1:
+            self.position = 0.0
+        self._last_tick = time.monotonic()
+        self.play_button.setText('Pause')
+        self.timer.start()
+
+    def pause(self) -> None:
+        self.timer.stop()
+        self.play_button.setText('Play')
+
+    def tick(self) -> None:
+        """ Advance by the elapsed time (source fps times speed), frames are skipped at high speeds. """
+        now = time.monotonic()
+        fps = self.log.fps or 30.0
+        self.position += (now - self._last_tick) * fps * self.speed_combo.currentData()
+        self._last_tick = now
+        if self.position >= self.log.frame_count - 1:
+            self.position = float(self.log.frame_count - 1)
+            self.pause()
+        self.show_frame(int(self.position))
+
+    def seek(self, frame_id: int) -> None:
+        self.position = float(frame_id)
+        self.show_frame(frame_id)
+
+    def show_frame(self, frame_id: int) -> None:
+        frame, trajectory_image = self.player.render(frame_id)
+        self.slider.blockSignals(True)
+        self.slider.setValue(frame_id)
+        self.slider.blockSignals(False)
+        self.frame_text.setText(f"frame {frame_id} / {self.log.frame_count - 1}")
+        self.frame_ready.emit(self.frame_presenter.present(frame), self.trajectory_presenter.present(trajectory_image))
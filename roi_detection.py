@@ -0,0 +1,75 @@
+import numpy as np
+from detector import Detector
+from tracker import Tracker
+from utils import merge_boxes
+
+
+class PredictiveDetector:
+    """ 
+        Detection guided by the tracker: the positions of the active tracks are predicted (constant velocity, Tracker.predict)
+        and the Detector runs only in padded regions of interest around them.
+        Whole frame is detected every refresh_interval frames (and whenever less shapes than expected are found in the ROIs),
+        to catch the new shapes and the ones lost by the tracker.
+
+        Parameters
+        ----------
+        detector : Detector
+            Detector used for both the ROIs and the full frames.
+        tracker : Tracker
+            Tracker providing the predictions, must be updated with the detections of every frame before the next detect().
+        refresh_interval : int
+            Every refresh_interval-th frame is detected as whole.
+        padding : int
+            Pixels added around the predicted bounding box of the shape (multiplied by the number of frames since the last detection).
+        min_coverage : float
+            If the ROIs contain less than this fraction of the predicted shapes, the next frame is detected as whole.
+
+        Methods
+        -------
+        detect(frame_id, frame) -> np.array
+            Detections of the frame (DETECTION_DTYPE records), same as Detector.detect().
+    """
+    def __init__(self, detector: Detector, tracker: Tracker, refresh_interval: int = 10, padding: int = 20, min_coverage: float = 0.9) -> None:
+        self.detector = detector
+        self.tracker = tracker
+        self.refresh_interval = refresh_interval
+        self.padding = padding
+        self.min_coverage = min_coverage
+        self.force_full_frame = True
+        self.full_frames = 0 # statistics, number of frames detected as whole
+        self.roi_frames = 0
+        self.roi_area = 0.0 # sum of the fractions of the frame area covered by ROIs
+
+    def detect(self, frame_id: int, frame: np.ndarray) -> np.ndarray:
+        rois, expected = self.regions_of_interest(frame_id, frame.shape)
+        if self.force_full_frame or frame_id % self.refresh_interval == 0 or expected == 0:
+            self.force_full_frame = False
+            self.full_frames += 1
+            return self.detector.detect(frame)
+
+        detections = self.detector.detect_rois(frame, rois)
+        self.force_full_frame = len(detections) < self.min_coverage * expected
+        self.roi_frames += 1
+        self.roi_area += float(np.prod(rois[:, 2:] - rois[:, :2], axis=1).sum()) / (frame.shape[0] * frame.shape[1])
+        return detections
+
+    def regions_of_interest(self, frame_id: int, frame_shape: tuple) -> tuple:
+        """ Merged, padded boxes around the predicted positions of the recently detected tracks, and the number of these tracks. """
+        tracks = self.tracker.store.tracks
+        recent = tracks["missed"] <= self.tracker.history_gap
+        if not recent.any():
+            return np.empty((0, 4), dtype=np.int64), 0
+
+        tracks = tracks[recent]
+        shift = np.rint(self.tracker.predict(frame_id)[recent] - tracks["center"]).astype(np.int64)
+        padding = (self.padding * (tracks["missed"].astype(np.int64) + 1))[:, None]
+
+        boxes = tracks["bbox"].astype(np.int64) + np.tile(shift, 2)
+        boxes[:, :2] -= padding
+        boxes[:, 2:] += padding
+
+        height, width = frame_shape[:2]
+        boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, width)
+        boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, height)
+        boxes = boxes[(boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])]
+        return merge_boxes(boxes), len(tracks)
@@ -1,15 +1,64 @@
 from enum import Enum
+from typing import NamedTuple
+import numpy as np
+from history import TrackHistory
 
 class ShapeType(Enum):
     CIRCLE = "circle"
     RECTANGLE = "rectangle"
 
+# index of the shape type in this tuple is its code in the NumPy track/detection arrays (track_store.py)
+SHAPE_TYPES = (ShapeType.CIRCLE, ShapeType.RECTANGLE)
+
 class Shape:
-    def __init__(self, shape_id: int, shape_type: ShapeType, bounding: tuple, center: tuple, color: tuple, first_occurence: int) -> None:
+    """ 
+        Thin, read-only view of one track for the GUI and export, the tracking itself works on the TrackStore arrays.
+        Use Shape.from_record() to create it from a row of the TrackStore.
+    """
+    __slots__ = ("id", "shape_type", "bounding", "center", "color", "history")
+
+    def __init__(self, shape_id: int, shape_type: ShapeType, bounding: tuple, center: tuple, color: tuple, history: TrackHistory) -> None:
         self.id = shape_id
         self.shape_type = shape_type
-        self.bounding = bounding
+        self.bounding = bounding # (x, y, r) for circle, ((x1, y1), (x2, y2)) for rectangle
         self.center = center 
         self.color = color
-        # list of center points of the shape during its existence, with the frame ID as the first element
-        self.history = [(first_occurence, center)] 
\ No newline at end of file
+        # center points of the shape during its existence, iterates as (frame ID, center) tuples, center is None if not detected
+        self.history = history
+
+    @classmethod
+    def from_record(cls, record: np.void, history: TrackHistory) -> "Shape":
+        shape_type = SHAPE_TYPES[record["shape_type"]]
+        x1, y1, x2, y2 = record["bbox"].tolist()
+        center = tuple(record["center"].tolist())
+        if shape_type == ShapeType.CIRCLE:
+            bounding = (center[0], center[1], (x2 - x1) // 2)
+        else:
+            bounding = ((x1, y1), (x2, y2))
+        return cls(int(record["id"]), shape_type, bounding, center, tuple(record["color"].tolist()), history)
+
+    def snapshot(self) -> "ShapeSnapshot":
+        return ShapeSnapshot(self.id, self.shape_type, self.color, self.history.frozen())
+
+    def to_dict(self) -> dict:
+        """ JSON serializable representation of the shape, only the frames where the shape was detected are kept in the history. """
+        frames, centers = self.history.points()
+        return {
+            "id": self.id,
+            "shape_type": self.shape_type.value,
+            "color": [int(c) for c in self.color],
+            "bounding": self.bounding,
+            "first_occurence": self.history.first_frame,
+            "history": [[frame_id, center] for frame_id, center in zip(frames.tolist(), centers.tolist())],
+        }
+
+
+class ShapeSnapshot(NamedTuple):
+    """ Immutable state of one track for the GUI (passed between threads), the history is frozen (TrackHistory.frozen()). """
+    id: int
+    shape_type: ShapeType
+    color: tuple
+    history: TrackHistory
+
+    def snapshot(self) -> "ShapeSnapshot":
+        return self
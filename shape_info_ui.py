@@ -1,64 +1,157 @@
-from PyQt5.QtWidgets import QDialog, QLabel, QVBoxLayout, QWidget, QHBoxLayout, QScrollArea, QGridLayout
+import numpy as np
+from PyQt5.QtWidgets import QDialog, QLabel, QVBoxLayout, QWidget, QHBoxLayout, QTableView, QHeaderView, QCheckBox, QSpinBox, QPushButton, QAbstractItemView
 from PyQt5.QtGui import QPixmap
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from history import TrackHistory
 
 class ShapeWidget(QWidget):
-    def __init__(self, pixmap: QPixmap, shape_id: str, history: list , parent=None) -> None:
+    def __init__(self, pixmap: QPixmap, shape_id: str, history: TrackHistory, parent=None) -> None:
         super().__init__(parent)
+        self.shape_id = shape_id
+        self.history = history
+        self.pixmap = pixmap
         self.h_layout = QHBoxLayout()
         self.h_layout.setSpacing(-5)
         self.h_layout.setContentsMargins(0, 0, 0, 0)
         
         # icon label
-        icon_label = QLabel()
-        icon_label.setPixmap(pixmap)
-        icon_label.mousePressEvent = lambda event: self.open_window(event, shape_id, history)
-        self.h_layout.addWidget(icon_label)
+        self.icon_label = QLabel()
+        self.icon_label.setPixmap(pixmap)
+        self.icon_label.mousePressEvent = lambda event: self.open_window(event, self.shape_id, self.history)
+        self.h_layout.addWidget(self.icon_label)
         
         # ID label
         id_label = QLabel(f"ID: {shape_id}")
         id_label.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-        id_label.mousePressEvent = lambda event: self.open_window(event, shape_id, history)
+        id_label.mousePressEvent = lambda event: self.open_window(event, self.shape_id, self.history)
         self.h_layout.addWidget(id_label)
         
     def get_layout(self) -> QHBoxLayout:
         return self.h_layout
+
+    def set_shape(self, pixmap: QPixmap, history: TrackHistory) -> None:
+        """ Show the newer state of the shape, the icon is repainted only if it changed (pixmaps are cached by the GUI). """
+        self.history = history
+        if pixmap is not self.pixmap:
+            self.pixmap = pixmap
+            self.icon_label.setPixmap(pixmap)
     
-    def open_window(self, event, shape_id: int, history: list) -> None:
+    def open_window(self, event, shape_id: int, history: TrackHistory) -> None:
         info_dialog = ShapeInfoDialog(shape_id, history)
         info_dialog.exec_()
 
+class HistoryTableModel(QAbstractTableModel):
+    """ 
+        Table (frame, center) of the history of one shape, the cells are read from the TrackHistory only when the view asks for them
+        (visible rows), so the size of the history doesn't matter.
+
+        Parameters
+        ----------
+        history : TrackHistory
+            Frozen history of the shape (TrackHistory.frozen()), must not change while shown.
+        show_missing : bool
+            Rows for all frames (center "missing" if not detected), otherwise only the frames where the shape was detected.
+    """
+    HEADERS = ("Frame", "Center")
+
+    def __init__(self, history: TrackHistory, show_missing: bool = False, parent=None) -> None:
+        super().__init__(parent)
+        self.history = history
+        self.frames, self.centers = history.points()
+        self.show_missing = show_missing
+
+    def set_show_missing(self, show_missing: bool) -> None:
+        self.beginResetModel()
+        self.show_missing = show_missing
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.history) if self.show_missing else len(self.frames)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+
+        if self.show_missing:
+            frame_id, center = self.history[index.row()]
+        else:
+            frame_id, center = int(self.frames[index.row()]), tuple(self.centers[index.row()].tolist())
+
+        if index.column() == 0:
+            return str(frame_id)
+        return f"{center}" if center is not None else "missing"
+
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def row_of_frame(self, frame_id: int) -> int:
+        """ Row of the frame, or of the first row after it (frame not detected and missing frames hidden), clipped to the table. """
+        if self.show_missing:
+            row = frame_id - self.history.first_frame
+        else:
+            row = int(np.searchsorted(self.frames, frame_id))
+        return min(max(row, 0), self.rowCount() - 1)
+
+
 class ShapeInfoDialog(QDialog):
-    def __init__(self, shape_id: int, history: list, parent=None):
+    def __init__(self, shape_id: int, history: TrackHistory, parent=None):
         super().__init__(parent)
         self.setWindowTitle(f'Shape {shape_id} History')
         
         main_layout = QVBoxLayout(self)
 
-        # scroll area to hold the grid layout
-        scroll_area = QScrollArea(self)
-        scroll_area.setWidgetResizable(True)
-        main_layout.addWidget(scroll_area)
+        # controls: jump to frame, show missing frames
+        controls_layout = QHBoxLayout()
+        controls_layout.addWidget(QLabel("Frame:"))
+        self.frame_input = QSpinBox(self)
+        self.frame_input.setRange(history.first_frame, history.last_frame)
+        self.frame_input.lineEdit().returnPressed.connect(self.jump_to_frame)
+        controls_layout.addWidget(self.frame_input)
 
-        container_widget = QWidget()
-        scroll_area.setWidget(container_widget)
-        
-        grid_layout = QGridLayout(container_widget)
-        container_widget.setLayout(grid_layout)
-
-        # populate the grid layout with the history of the shape
-        row = 0
-        column = 0
-        for frame in history:
-            if frame[-1] is not None:
-                # Create a label with the frame and value
-                label = QLabel(f"Frame {frame[0]}: {frame[1]}")
-                grid_layout.addWidget(label, row, column)
-                
-                # next column
-                column += 1
-                if column >= 3: 
-                    column = 0
-                    row += 1
+        jump_button = QPushButton('Go', self)
+        jump_button.setAutoDefault(False)
+        jump_button.clicked.connect(self.jump_to_frame)
+        controls_layout.addWidget(jump_button)
+
+        self.missing_checkbox = QCheckBox('Show missing frames', self)
+        self.missing_checkbox.toggled.connect(self.set_show_missing)
+        controls_layout.addWidget(self.missing_checkbox)
+        controls_layout.addStretch(1)
+        main_layout.addLayout(controls_layout)
+
+        # the table view creates only the visible rows
+        self.model = HistoryTableModel(history, parent=self)
+        self.table_view = QTableView(self)
+        self.table_view.setModel(self.model)
+        self.table_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table_view.verticalHeader().setVisible(False)
+        self.table_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed) # no per-row size calculation
+        self.table_view.horizontalHeader().setStretchLastSection(True)
+        main_layout.addWidget(self.table_view)
 
         self.setLayout(main_layout)
+
+    def set_show_missing(self, show_missing: bool) -> None:
+        # keep the selected frame in view
+        selected = self.table_view.selectionModel().selectedRows()
+        frame_id = int(self.model.data(selected[0])) if selected else None
+        self.model.set_show_missing(show_missing)
+        if frame_id is not None:
+            self.select_frame(frame_id)
+
+    def jump_to_frame(self) -> None:
+        self.select_frame(self.frame_input.value())
+
+    def select_frame(self, frame_id: int) -> None:
+        if self.model.rowCount() == 0:
+            return
+        index = self.model.index(self.model.row_of_frame(frame_id), 0)
+        self.table_view.selectRow(index.row())
+        self.table_view.scrollTo(index, QAbstractItemView.PositionAtCenter)
@@ -0,0 +1,250 @@
+"""
+    Headless command line entry point, runs the detector and tracker without the GUI (no PyQt5 import).
+
+    Usage:
+        python -m shape_tracker process video.mp4 --out tracks.json [--trajectory trajectory.png] [--archive tracks.db]
+                                     [--threads 2 --queue-depth 4]
+        python -m shape_tracker process video.mp4 --out tracks.json --processes 4 [--overlap 30]
+        python -m shape_tracker process video.mp4 --out tracks.json --roi-refresh 10
+        python -m shape_tracker process video.mp4 --out tracks.json --pyramid 1
+        python -m shape_tracker process video.mp4 --out tracks.json --engine contour
+        python -m shape_tracker process video.mp4 --out tracks.json --batch 16 [--batch-workers 4]
+        python -m shape_tracker process video.mp4 --out tracks.json --profile profile.json [--trace trace.json]
+        python -m shape_tracker process video.mp4 --out tracks.json --cache detections/
+        python -m shape_tracker process video.mp4 --out tracks.json --realtime [--budget 66]
+        python -m shape_tracker process video.mp4 --out tracks.json --track-log video.stlog    (replay in the GUI)
+        python -m shape_tracker process video.mp4 --out tracks.json --config tuned.json    (e.g. from benchmarks/sweep.py)
+        python -m shape_tracker process video.mp4 --out tracks.json --export-video annotated.mp4 [--trajectory trajectory.png --snapshot-interval 100]
+        python -m shape_tracker multi video1.mp4 video2.mp4 0 --out-dir tracks/ [--threads 4]    (0 = camera index)
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import cv2
+from pipeline import VideoPipeline, DETECTOR_ENGINES, is_camera
+from threaded_pipeline import ThreadedVideoPipeline
+from realtime_pipeline import RealtimeVideoPipeline
+from archive import TrackArchive
+from chunked import ChunkedVideoProcessor
+from profiling import Profiler
+from multi_stream import MultiStreamManager
+from config import TrackingConfig
+from exporter import ExportSettings
+
+
+def load_config(args: argparse.Namespace) -> TrackingConfig | None:
+    """ The --config file with --max-missed-frames applied, None without both, exits with an error message if the file can't be read. """
+    config = None
+    if args.config:
+        try:
+            config = TrackingConfig.load(args.config)
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            sys.exit(f"invalid config {args.config}: {error}")
+    if args.max_missed_frames is not None:
+        config = (config or TrackingConfig()).replace({"tracker.max_missed_frames": args.max_missed_frames or None})
+    return config
+
+
+def process(args: argparse.Namespace) -> int:
+    config = load_config(args)
+    if args.processes:
+        return process_chunked(args, config)
+
+    archive = TrackArchive(args.archive) if args.archive else None
+    profiler = Profiler(enabled=bool(args.profile or args.trace))
+    if args.roi_refresh and args.threads:
+        print("--roi-refresh needs the tracking results of the previous frame, it can't be used with --threads", file=sys.stderr)
+        return 2
+    if args.batch > 1 and (args.roi_refresh or args.threads):
+        print("--batch can't be used with --roi-refresh or --threads", file=sys.stderr)
+        return 2
+    if args.cache and (args.roi_refresh or args.threads):
+        print("--cache can't be used with --roi-refresh or --threads", file=sys.stderr)
+        return 2
+    if args.realtime and (args.threads or args.batch > 1 or args.cache):
+        print("--realtime can't be used with --threads, --batch or --cache", file=sys.stderr)
+        return 2
+    if args.snapshot_interval and not args.trajectory:
+        print("--snapshot-interval needs --trajectory (the snapshots are written next to it)", file=sys.stderr)
+        return 2
+    export = None
+    if args.export_video or args.snapshot_interval:
+        export = ExportSettings(args.export_video, args.trajectory, args.snapshot_interval, args.export_queue, args.export_drop)
+    if args.realtime:
+        pipeline = RealtimeVideoPipeline(args.video, archive=archive, budget=args.budget / 1000 if args.budget else None,
+                                         roi_refresh=args.roi_refresh, pyramid_levels=args.pyramid, engine=args.engine,
+                                         track_log=args.track_log, profiler=profiler, config=config, export=export)
+    elif args.threads > 0:
+        pipeline = ThreadedVideoPipeline(args.video, archive=archive, queue_depth=args.queue_depth,
+                                         detection_workers=args.threads, pyramid_levels=args.pyramid, engine=args.engine,
+                                         track_log=args.track_log, profiler=profiler, config=config, export=export)
+    else:
+        pipeline = VideoPipeline(args.video, archive=archive, roi_refresh=args.roi_refresh, pyramid_levels=args.pyramid,
+                                 engine=args.engine, batch_size=args.batch, batch_workers=args.batch_workers, cache_dir=args.cache,
+                                 track_log=args.track_log, profiler=profiler, config=config, export=export)
+
+    start = time.perf_counter()
+    frames = pipeline.frames()
+    try:
+        for _ in frames:
+            pass
+    except KeyboardInterrupt:
+        # cameras never end
+        frames.close()
+    elapsed = time.perf_counter() - start
+
+    if pipeline.frame_count == 0:
+        print(f"no frames could be read from {args.video}", file=sys.stderr)
+        return 1
+
+    write_tracks(args, pipeline.frame_count, pipeline.tracker.all_shapes(), elapsed)
+    if args.trajectory and export is None:
+        # otherwise written by the exporter
+        cv2.imwrite(args.trajectory, pipeline.trajectory_image)
+    if pipeline.exporter is not None:
+        print(pipeline.exporter.report())
+    if isinstance(pipeline, (ThreadedVideoPipeline, RealtimeVideoPipeline)):
+        print(pipeline.report())
+    elif pipeline.detection_cache is not None:
+        cache = pipeline.detection_cache
+        print(f"{pipeline.cached_frames} frames from the detection cache, {cache.frame_count} frames cached ({cache.data_path})")
+    if pipeline.predictive_detector is not None:
+        predictive = pipeline.predictive_detector
+        roi_area = predictive.roi_area / predictive.roi_frames if predictive.roi_frames else 0.0
+        print(f"whole frame detected in {predictive.full_frames} frames, ROIs in {predictive.roi_frames} frames ({roi_area:.1%} of the frame on average)")
+    if profiler.enabled:
+        print(profiler.report())
+        if args.profile:
+            profiler.save_json(args.profile)
+        if args.trace:
+            profiler.save_chrome_trace(args.trace)
+    return 0
+
+
+def process_chunked(args: argparse.Namespace, config: TrackingConfig | None) -> int:
+    if (args.trajectory or args.archive or args.threads or args.roi_refresh or args.profile or args.trace or args.cache or args.realtime
+            or args.track_log or args.export_video):
+        print("--trajectory, --archive, --threads, --roi-refresh, --profile, --trace, --cache, --realtime, --track-log and --export-video "
+              "are not supported with --processes", file=sys.stderr)
+        return 2
+
+    processor = ChunkedVideoProcessor(args.video, processes=args.processes, overlap=args.overlap, pyramid_levels=args.pyramid,
+                                      engine=args.engine, batch_size=args.batch, config=config)
+
+    start = time.perf_counter()
+    shapes = processor.process()
+    elapsed = time.perf_counter() - start
+
+    if processor.frame_count == 0:
+        print(f"no frames could be read from {args.video}", file=sys.stderr)
+        return 1
+
+    write_tracks(args, processor.frame_count, shapes, elapsed)
+    return 0
+
+
+def process_multi(args: argparse.Namespace) -> int:
+    """ Process all the sources concurrently, one tracks file per source, Ctrl+C stops the streams (cameras) and writes the results. """
+    manager = MultiStreamManager(args.sources, detection_workers=args.threads or None, queue_depth=args.queue_depth,
+                                 engine=args.engine, pyramid_levels=args.pyramid, config=load_config(args))
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    frames = manager.frames()
+    counts = [0] * len(args.sources)
+    try:
+        for item in frames:
+            counts[item.stream] += 1
+            if args.max_frames and min(counts) >= args.max_frames:
+                manager.stop()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        frames.close()
+
+    for index, (source, pipeline) in enumerate(zip(args.sources, manager.pipelines)):
+        name = os.path.splitext(os.path.basename(str(source)))[0] if not is_camera(source) else f"camera{source}"
+        path = os.path.join(args.out_dir, f"{index}_{name}.json")
+        shapes = pipeline.tracker.all_shapes() if pipeline.tracker is not None else []
+        with open(path, "w") as f:
+            json.dump({"video": str(source), "frames": pipeline.frame_count, "tracks": [shape.to_dict() for shape in shapes]}, f)
+        print(f"{source}: {pipeline.frame_count} frames, {len(shapes)} tracks -> {path}")
+    print(manager.report())
+    return 0 if any(pipeline.frame_count for pipeline in manager.pipelines) else 1
+
+
+def write_tracks(args: argparse.Namespace, frame_count: int, shapes: list, elapsed: float) -> None:
+    tracks = [shape.to_dict() for shape in shapes]
+    with open(args.out, "w") as f:
+        json.dump({"video": args.video, "frames": frame_count, "tracks": tracks}, f)
+
+    fps = frame_count / elapsed if elapsed > 0 else float("inf")
+    print(f"processed {frame_count} frames in {elapsed:.2f}s ({fps:.1f} fps), {len(tracks)} tracks -> {args.out}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="shape_tracker", description="Headless shape detection and tracking.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    process_parser = subparsers.add_parser("process", help="detect and track shapes in a video file")
+    process_parser.add_argument("video", help="path to the input video (or camera index with --realtime)")
+    process_parser.add_argument("--out", default="tracks.json", help="output JSON file with the tracks (default: tracks.json)")
+    process_parser.add_argument("--trajectory", help="optionally save the final trajectory image (e.g. trajectory.png)")
+    process_parser.add_argument("--archive", help="optionally keep the terminated tracks in this SQLite file instead of in memory")
+    process_parser.add_argument("--threads", type=int, default=0,
+                                help="run the stages in parallel with this many detection threads (default: 0, single thread)")
+    process_parser.add_argument("--queue-depth", type=int, default=4, help="maximum number of frames waiting between the stages (default: 4)")
+    process_parser.add_argument("--roi-refresh", type=int, default=0,
+                                help="detect only around the predicted shapes, whole frame every N frames (default: 0, whole frame always)")
+    process_parser.add_argument("--engine", choices=sorted(DETECTOR_ENGINES),
+                                help="detection engine: hough (HoughCircles + Canny, default) or contour (single pass contour classification)")
+    process_parser.add_argument("--pyramid", type=int,
+                                help="detect in frame downscaled by 2^N and refine in full resolution (default: 0, full resolution only)")
+    process_parser.add_argument("--config", help="JSON file with the detector and tracker parameters (config.py), --engine and --pyramid override it")
+    process_parser.add_argument("--max-missed-frames", type=int,
+                                help="terminate the tracks not detected for this many frames and move them to the archive (default: never, 0 never)")
+    process_parser.add_argument("--batch", type=int, default=1,
+                                help="read and detect the frames in blocks of N frames (default: 1, frame by frame)")
+    process_parser.add_argument("--batch-workers", type=int, default=1, help="detection threads for the frames of a block (default: 1)")
+    process_parser.add_argument("--processes", type=int, default=0,
+                                help="split the video into frame ranges processed in this many processes, tracks are stitched together (default: 0, off)")
+    process_parser.add_argument("--overlap", type=int, default=30, help="frames shared by consecutive ranges for stitching (default: 30)")
+    process_parser.add_argument("--profile", help="save the per-stage timings (p50 / p95 / max latency, fps) to this JSON file")
+    process_parser.add_argument("--trace", help="save the timings of the stages as Chrome trace (chrome://tracing, Perfetto) to this JSON file")
+    process_parser.add_argument("--cache", help="detection cache directory, the detections of the video are reused by the next runs (resumed if incomplete)")
+    process_parser.add_argument("--realtime", action="store_true",
+                                help="read the video at its fps (or a camera), drop / don't detect the frames which would exceed the latency budget")
+    process_parser.add_argument("--budget", type=float, default=0,
+                                help="latency budget of a frame in milliseconds for --realtime (default: 0, two frame intervals)")
+    process_parser.add_argument("--track-log", help="write the tracks of every frame to this binary log (.stlog), replayed in the GUI without the video")
+    process_parser.add_argument("--export-video", help="write the annotated frames into this video (e.g. annotated.mp4), encoded in a background thread")
+    process_parser.add_argument("--snapshot-interval", type=int, default=0,
+                                help="also write the trajectory image every N frames next to --trajectory (trajectory_000100.png, ...)")
+    process_parser.add_argument("--export-queue", type=int, default=8, help="frames waiting for the export encoding (default: 8)")
+    process_parser.add_argument("--export-drop", action="store_true",
+                                help="drop the frames the export can't keep up with instead of waiting for it (default: wait, every frame exported)")
+    process_parser.set_defaults(func=process)
+
+    multi_parser = subparsers.add_parser("multi", help="detect and track shapes in several videos / cameras concurrently")
+    multi_parser.add_argument("sources", nargs="+", help="input videos or camera indices (e.g. 0)")
+    multi_parser.add_argument("--out-dir", default="tracks", help="directory for the output JSON files, one per source (default: tracks)")
+    multi_parser.add_argument("--threads", type=int, default=0, help="size of the shared detection pool (default: 0, number of CPUs)")
+    multi_parser.add_argument("--queue-depth", type=int, default=2, help="maximum number of frames waiting between the stages of each stream (default: 2)")
+    multi_parser.add_argument("--max-frames", type=int, default=0, help="stop when each stream has this many frames, for cameras (default: 0, whole videos)")
+    multi_parser.add_argument("--engine", choices=sorted(DETECTOR_ENGINES), help="detection engine (see process)")
+    multi_parser.add_argument("--pyramid", type=int, help="multi-resolution detection (see process)")
+    multi_parser.add_argument("--config", help="detector and tracker parameters (see process)")
+    multi_parser.add_argument("--max-missed-frames", type=int, help="terminate the tracks not detected for this many frames (see process)")
+    multi_parser.set_defaults(func=process_multi)
+
+    return parser
+
+
+def main(argv: list | None = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
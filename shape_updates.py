@@ -0,0 +1,68 @@
+import time
+from typing import NamedTuple
+
+
+class ShapeListDelta(NamedTuple):
+    """ Changes of the shape list since the previous delta, shapes are ShapeSnapshot objects (shape.py). """
+    added: tuple
+    removed: tuple # IDs
+    changed: tuple
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+
+class ShapeListDiffer:
+    """ 
+        Turns the per-frame shape lists of the pipeline into ShapeListDelta updates for the GUI, at most max_rate updates per second.
+        The changes of the skipped frames are not lost, the next update is computed against the last emitted state.
+
+        The widgets show the type and color of a shape, its history only when its window is opened, so a shape whose history
+        just grew is "changed" only once its last detection moved by history_interval frames (a forced update, e.g. the last
+        one of the video, sends every newer history).
+
+        Parameters
+        ----------
+        max_rate : float | None
+            Maximum number of updates per second, None for every frame.
+        history_interval : int
+            Frames of newer detections before a shape is sent again only for its history.
+
+        Methods
+        -------
+        update(shapes: list, force: bool = False) -> ShapeListDelta | None
+            Delta of the shapes (ShapeSnapshot or Shape objects) against the last emitted state,
+            None if nothing changed or the previous update was too recent (unless force).
+    """
+    def __init__(self, max_rate: float | None = 10.0, history_interval: int = 100) -> None:
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self.history_interval = max(1, history_interval)
+        self._last_update = None
+        self._state = {} # ID -> (shape type, color, last detected frame, last frame) of the emitted shapes
+
+    def update(self, shapes: list, force: bool = False) -> ShapeListDelta | None:
+        now = time.monotonic()
+        if not force and self._last_update is not None and now - self._last_update < self.min_interval:
+            return None
+
+        state = {}
+        added = []
+        changed = []
+        for shape in shapes:
+            key = (shape.shape_type, shape.color, shape.history.last_valid_frame, shape.history.last_frame)
+            previous = self._state.get(shape.id)
+            if previous is None:
+                added.append(shape.snapshot())
+            elif previous[:2] != key[:2] or key[2] - previous[2] >= self.history_interval or (force and previous != key):
+                changed.append(shape.snapshot())
+            else:
+                key = previous # the emitted history stays the reference
+            state[shape.id] = key
+        removed = tuple(shape_id for shape_id in self._state if shape_id not in state)
+
+        delta = ShapeListDelta(tuple(added), removed, tuple(changed))
+        if not delta:
+            return None
+        self._state = state
+        self._last_update = now
+        return delta
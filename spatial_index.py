@@ -0,0 +1,69 @@
+import numpy as np
+
+
+class GridIndex:
+    """ 
+        Uniform grid over 2D points (centers of the tracked shapes), used to find candidate pairs for the association
+        without comparing every detection with every track.
+
+        With the cell size equal to the search radius, all points within the radius of a query point
+        are in the 3x3 neighbouring cells of the query point's cell.
+
+        Parameters
+        ----------
+        cell_size : float
+            Size of one grid cell, should be the search radius (max_distance of the association).
+
+        Methods
+        -------
+        build(points) -> None
+            Rebuild the grid from the (N, 2) array of points.
+
+        query(query_points) -> tuple
+            Candidate pairs of (point indices, query indices), superset of the pairs closer than cell_size.
+    """
+    # offsets of the 3x3 neighbourhood of a cell
+    NEIGHBOURS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)], dtype=np.int64)
+
+    def __init__(self, cell_size: float) -> None:
+        self.cell_size = cell_size
+        self.sorted_keys = np.empty(0, dtype=np.int64)
+        self.order = np.empty(0, dtype=np.int64)
+
+    def build(self, points: np.ndarray) -> None:
+        keys = self._cell_keys(self._cells(points))
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+
+    def query(self, query_points: np.ndarray) -> tuple:
+        empty = np.empty(0, dtype=np.int64)
+        if len(self.sorted_keys) == 0 or len(query_points) == 0:
+            return empty, empty
+
+        cells = self._cells(query_points)
+        point_indices = []
+        query_indices = []
+        for offset in self.NEIGHBOURS:
+            keys = self._cell_keys(cells + offset)
+            starts = np.searchsorted(self.sorted_keys, keys, side="left")
+            ends = np.searchsorted(self.sorted_keys, keys, side="right")
+            counts = ends - starts
+            total = int(counts.sum())
+            if total == 0:
+                continue
+
+            # expand the [start, end) ranges of each query into flat arrays of pairs
+            query_indices.append(np.repeat(np.arange(len(query_points)), counts))
+            range_offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            point_indices.append(self.order[np.repeat(starts, counts) + range_offsets])
+
+        if not point_indices:
+            return empty, empty
+        return np.concatenate(point_indices), np.concatenate(query_indices)
+
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        return np.floor(np.asarray(points, dtype=np.float64) / self.cell_size).astype(np.int64).reshape(-1, 2)
+
+    def _cell_keys(self, cells: np.ndarray) -> np.ndarray:
+        # pack the (x, y) cell coordinates into one int64 key, y shifted to be non-negative
+        return (cells[:, 0] << 32) + (cells[:, 1] + (1 << 31))
@@ -0,0 +1,16 @@
+import os
+import sys
+import pytest
+
+# the modules are at the repository root (python -m pytest from the root adds it too)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_video
+
+
+@pytest.fixture(scope="session")
+def video(tmp_path_factory) -> str:
+    """ Short synthetic video whose shapes are detected in every frame (no disappearing shapes), so every mode finds the same tracks. """
+    path = str(tmp_path_factory.mktemp("video") / "synthetic.mp4")
+    generate_video(path, width=640, height=360, frames=60, circles=2, rectangles=2, disappear_chance=0.0, seed=2)
+    return path
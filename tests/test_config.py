@@ -0,0 +1,24 @@
+import pytest
+from config import TrackingConfig, DEFAULT_CONFIG
+
+
+def test_save_and_load(tmp_path):
+    config = DEFAULT_CONFIG.replace({"engine": "contour", "detector.threshold": 20, "tracker.max_missed_frames": 30})
+    path = str(tmp_path / "config.json")
+    config.save(path)
+    assert TrackingConfig.load(path) == config
+
+
+def test_missing_parameters_have_the_defaults(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text('{"tracker": {"max_distance": 50}}')
+    assert TrackingConfig.load(str(path)) == DEFAULT_CONFIG.replace({"tracker.max_distance": 50})
+
+
+def test_replace():
+    config = DEFAULT_CONFIG.replace({"pyramid_levels": 1, "tracker.history_gap": 5})
+    assert config.params() == {**DEFAULT_CONFIG.params(), "pyramid_levels": 1, "tracker.history_gap": 5}
+    assert DEFAULT_CONFIG.tracker.history_gap == 10
+    for name in ("threshold", "detector.unknown", "camera.threshold"):
+        with pytest.raises(KeyError):
+            DEFAULT_CONFIG.replace({name: 1})
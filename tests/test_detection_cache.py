@@ -0,0 +1,74 @@
+import numpy as np
+import detection_cache
+from detection_cache import DetectionCache
+from pipeline import VideoPipeline, create_detector
+from track_store import DETECTION_DTYPE
+from config import DEFAULT_CONFIG
+
+
+def tracks(shapes: list) -> list:
+    return [(shape.id, shape.shape_type, tuple(int(c) for c in shape.color), shape.to_dict()["history"]) for shape in shapes]
+
+
+def run(video: str, cache_dir: str, frames: int | None = None) -> VideoPipeline:
+    """ Pipeline with the detection cache, stopped after the given number of frames. """
+    pipeline = VideoPipeline(video, cache_dir=cache_dir)
+    generator = pipeline.frames()
+    for frame_id, _, _ in generator:
+        if frame_id + 1 == frames:
+            generator.close()
+    return pipeline
+
+
+def test_cached_run_gives_the_same_tracks(video, tmp_path):
+    first = run(video, str(tmp_path))
+    assert first.cached_frames == 0
+    second = run(video, str(tmp_path))
+    assert second.cached_frames == 60
+    assert tracks(second.tracker.all_shapes()) == tracks(first.tracker.all_shapes())
+
+
+def test_interrupted_run_is_resumed(video, tmp_path):
+    run(video, str(tmp_path), frames=20)
+    resumed = run(video, str(tmp_path))
+    assert resumed.cached_frames == 20
+    assert run(video, str(tmp_path)).cached_frames == 60
+    assert tracks(resumed.tracker.all_shapes()) == tracks(run(video, str(tmp_path / "other")).tracker.all_shapes())
+
+
+def test_incomplete_frames_are_dropped(video, tmp_path):
+    detector = create_detector(DEFAULT_CONFIG)
+    cache = DetectionCache(str(tmp_path), video, detector)
+    detections = np.zeros(3, dtype=DETECTION_DTYPE)
+    detections["center"] = [(1, 2), (3, 4), (5, 6)]
+    cache.append(0, detections[:2])
+    cache.append(1, detections[2:])
+    cache.append(5, detections) # not the next frame, ignored
+    cache.close()
+    # killed while writing the next frame: its records without the index entry, and half an index entry
+    with open(cache.data_path, "ab") as f:
+        f.write(detections.tobytes()[:-3])
+    with open(cache.index_path, "ab") as f:
+        f.write(b"\1\0\0")
+
+    cache = DetectionCache(str(tmp_path), video, detector)
+    assert cache.frame_count == 2
+    assert cache.get(0)["center"].tolist() == [[1, 2], [3, 4]]
+    assert cache.get(1)["center"].tolist() == [[5, 6]]
+    assert cache.get(2) is None
+    cache.append(2, detections[:1])
+    assert cache.get(2)["center"].tolist() == [[1, 2]]
+    cache.close()
+
+
+def test_other_detector_or_version_uses_another_cache(video, tmp_path, monkeypatch):
+    def key(config) -> str:
+        cache = DetectionCache(str(tmp_path), video, create_detector(config))
+        cache.close()
+        return cache.key
+
+    default = key(DEFAULT_CONFIG)
+    assert key(DEFAULT_CONFIG) == default
+    assert key(DEFAULT_CONFIG.replace({"detector.threshold": 20})) != default
+    monkeypatch.setattr(detection_cache, "CACHE_VERSION", detection_cache.CACHE_VERSION + 1)
+    assert key(DEFAULT_CONFIG) != default
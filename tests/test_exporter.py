@@ -0,0 +1,84 @@
+import time
+import cv2
+import numpy as np
+import pytest
+from exporter import ExportSettings, VideoExporter
+
+
+class SlowWriter:
+    """ cv2.VideoWriter taking delay seconds per frame, raises error instead of writing if set. """
+    delay = 0.05
+    error = None
+
+    def __init__(self, *args) -> None:
+        self.frames = []
+        SlowWriter.instance = self
+
+    def isOpened(self) -> bool:
+        return True
+
+    def write(self, frame: np.ndarray) -> None:
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        self.frames.append(int(frame[0, 0, 0]))
+
+    def release(self) -> None:
+        pass
+
+
+@pytest.fixture
+def slow_writer(monkeypatch):
+    images = []
+    monkeypatch.setattr(cv2, "VideoWriter", SlowWriter)
+    monkeypatch.setattr(cv2, "imwrite", lambda path, image: time.sleep(SlowWriter.delay) or images.append(path))
+    monkeypatch.setattr(SlowWriter, "error", None)
+    return images
+
+
+def frame(frame_id: int) -> np.ndarray:
+    return np.full((36, 64, 3), frame_id, dtype=np.uint8)
+
+
+def test_drop_never_blocks(slow_writer, tmp_path):
+    settings = ExportSettings("out.mp4", str(tmp_path / "trajectory.png"), snapshot_interval=1, queue_depth=2, drop=True)
+    exporter = VideoExporter(settings, 30.0)
+    queued = []
+    for frame_id in range(30):
+        start = time.perf_counter()
+        queued.append(exporter.write(frame_id, frame(frame_id), frame(frame_id)))
+        assert time.perf_counter() - start < SlowWriter.delay
+    exporter.close(frame(29))
+
+    # the queued frames are written in order from the reused buffers, with their own content
+    assert SlowWriter.instance.frames == [frame_id for frame_id in range(30) if queued[frame_id]]
+    assert exporter.frames_written + exporter.frames_dropped == 30 and exporter.frames_dropped > 0
+    assert exporter.trajectory_images + exporter.snapshots_dropped == 30 and exporter.snapshots_dropped > 0
+    assert "dropped" in exporter.report()
+
+
+def test_backpressure_writes_every_frame(slow_writer, tmp_path):
+    settings = ExportSettings("out.mp4", str(tmp_path / "trajectory.png"), snapshot_interval=10, queue_depth=2)
+    exporter = VideoExporter(settings, 30.0)
+    assert all(exporter.write(frame_id, frame(frame_id), frame(frame_id)) for frame_id in range(30))
+    exporter.close(frame(29))
+    assert SlowWriter.instance.frames == list(range(30))
+    assert (exporter.frames_dropped, exporter.snapshots_dropped) == (0, 0)
+    assert slow_writer == [str(tmp_path / f"trajectory_{frame_id:06d}.png") for frame_id in (10, 20)] + [settings.trajectory_path]
+
+
+def test_writer_error_is_raised_by_the_next_write(slow_writer, monkeypatch):
+    monkeypatch.setattr(SlowWriter, "error", OSError("disk full"))
+    exporter = VideoExporter(ExportSettings("out.mp4", queue_depth=2), 30.0)
+    with pytest.raises(OSError, match="disk full"):
+        for frame_id in range(100):
+            exporter.write(frame_id, frame(frame_id))
+    exporter.close()
+
+
+def test_writer_error_is_raised_by_close(slow_writer, monkeypatch):
+    monkeypatch.setattr(SlowWriter, "error", OSError("disk full"))
+    exporter = VideoExporter(ExportSettings("out.mp4", queue_depth=2), 30.0)
+    exporter.write(0, frame(0))
+    with pytest.raises(OSError, match="disk full"):
+        exporter.close()
@@ -0,0 +1,63 @@
+import numpy as np
+from history import TrackHistory
+from archive import TrackArchive
+from shape import Shape, ShapeType
+
+
+def make_history(points: list, last_frame: int) -> TrackHistory:
+    """ History of (frame_id, center) points, center None for a missing frame. """
+    history = TrackHistory(points[0][0], points[0][1])
+    for frame_id, center in points[1:]:
+        history.append(frame_id, center)
+    history.last_frame = last_frame
+    return history
+
+
+POINTS = [(5, (10, 20)), (6, (11, 21)), (7, None), (8, None), (9, (14, 24)), (10, None), (11, (16, 26))]
+
+
+def test_iteration_decodes_the_missing_frames():
+    history = make_history(POINTS, 13)
+    assert list(history) == POINTS + [(12, None), (13, None)]
+    assert len(history) == 9
+    assert [history[i] for i in range(len(history))] == list(history)
+    assert history[-1] == (13, None)
+
+
+def test_only_detections_are_stored():
+    history = make_history(POINTS, 13)
+    frames, centers = history.points()
+    assert frames.tolist() == [5, 6, 9, 11]
+    assert centers.tolist() == [[10, 20], [11, 21], [14, 24], [16, 26]]
+    assert history.missing_runs().tolist() == [[7, 2], [10, 1], [12, 2]]
+    assert history.last_valid_frame == 11
+    assert history.missed_frames == 2
+
+
+def test_from_arrays_round_trip():
+    history = make_history(POINTS, 13)
+    frames, centers = history.points()
+    decoded = TrackHistory.from_arrays(frames, centers, history.last_frame)
+    assert list(decoded) == list(history)
+    assert decoded.first_frame == history.first_frame
+
+
+def test_frozen_copy_does_not_change():
+    history = TrackHistory(0, (0, 0))
+    frozen = history.frozen()
+    for frame_id in range(1, 100): # several reallocations
+        history.append(frame_id, (frame_id, frame_id) if frame_id % 3 else None)
+    assert list(frozen) == [(0, (0, 0))]
+    assert len(history) == 100
+
+
+def test_archive_round_trip():
+    history = make_history(POINTS, 13)
+    shape = Shape(7, ShapeType.RECTANGLE, ((1, 2), (3, 4)), (16, 26), (200, 100, 50), history)
+    archive = TrackArchive()
+    archive.add(shape)
+    loaded = archive.get(7)
+    assert loaded.shape_type == ShapeType.RECTANGLE
+    assert tuple(loaded.color) == (200, 100, 50)
+    assert list(loaded.history) == list(history)
+    archive.close()
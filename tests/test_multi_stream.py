@@ -0,0 +1,85 @@
+import threading
+import time
+import numpy as np
+import pytest
+from benchmarks.synthetic import generate_video
+from multi_stream import MultiStreamManager
+from pipeline import VideoPipeline
+from threaded_pipeline import ThreadedVideoPipeline
+
+
+def tracks(shapes: list) -> list:
+    return [(shape.id, shape.shape_type, tuple(int(c) for c in shape.color), shape.to_dict()["history"]) for shape in shapes]
+
+
+@pytest.fixture(scope="module")
+def sources(video, tmp_path_factory) -> list:
+    other = str(tmp_path_factory.mktemp("video") / "other.mp4")
+    generate_video(other, width=480, height=270, frames=40, circles=1, rectangles=2, disappear_chance=0.0, seed=5)
+    return [video, other]
+
+
+def sequential(source: str) -> tuple:
+    pipeline = VideoPipeline(source)
+    for _ in pipeline.frames():
+        pass
+    return tracks(pipeline.tracker.all_shapes()), pipeline.trajectory_image
+
+
+def pipeline_threads() -> list:
+    return [thread for thread in threading.enumerate() if thread.name.startswith(("stream-", "decode", "dispatch", "track", "detect"))]
+
+
+def test_streams_match_their_sequential_runs(sources):
+    manager = MultiStreamManager(sources, detection_workers=2, snapshot=True)
+    frames = {0: [], 1: []}
+    last = {}
+    for item in manager.frames():
+        frames[item.stream].append(item.frame_id)
+        last[item.stream] = item
+    assert frames == {0: list(range(60)), 1: list(range(40))}
+    for index, source in enumerate(sources):
+        expected_tracks, expected_image = sequential(source)
+        assert tracks(manager.pipelines[index].tracker.all_shapes()) == expected_tracks
+        assert np.array_equal(last[index].trajectory_image, expected_image)
+    assert "total" in manager.report()
+    assert not pipeline_threads()
+
+
+def test_stop_returns_without_hanging(sources):
+    manager = MultiStreamManager(sources, detection_workers=2)
+    start = time.perf_counter()
+    count = 0
+    for _ in manager.frames():
+        count += 1
+        if count == 5:
+            manager.stop()
+        time.sleep(0.01) # slow consumer, the streams wait for space in the merged queue
+    assert count < 100
+    assert time.perf_counter() - start < 10
+    assert not pipeline_threads()
+
+
+def test_early_close_of_the_generator(sources):
+    manager = MultiStreamManager(sources, detection_workers=2, queue_depth=1)
+    frames = manager.frames()
+    for _, _ in zip(range(3), frames):
+        pass
+    frames.close()
+    assert not pipeline_threads()
+
+
+def test_stream_error_is_raised(sources, monkeypatch):
+    new_tracker = ThreadedVideoPipeline._new_tracker
+
+    def failing(self, cap):
+        if self.video_path == sources[1]:
+            raise OSError("can't write the track log")
+        return new_tracker(self, cap)
+
+    monkeypatch.setattr(ThreadedVideoPipeline, "_new_tracker", failing)
+    manager = MultiStreamManager(sources, detection_workers=2)
+    with pytest.raises(OSError, match="track log"):
+        for _ in manager.frames():
+            pass
+    assert not pipeline_threads()
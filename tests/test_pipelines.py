@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from pipeline import VideoPipeline
+from threaded_pipeline import ThreadedVideoPipeline
+from chunked import ChunkedVideoProcessor, split_frames, stitch_tracks
+from shape import ShapeType
+
+
+def tracks(shapes: list) -> list:
+    """ ID, type, color and history of the shapes, comparable between the modes. """
+    return [(shape.id, shape.shape_type, tuple(int(c) for c in shape.color), shape.to_dict()["history"]) for shape in shapes]
+
+
+def run(pipeline: VideoPipeline) -> tuple:
+    """ (tracks, trajectory image) of the whole video. """
+    frame_ids = [frame_id for frame_id, _, _ in pipeline.frames()]
+    assert frame_ids == list(range(len(frame_ids)))
+    return tracks(pipeline.tracker.all_shapes()), pipeline.trajectory_image
+
+
+@pytest.fixture(scope="module")
+def sequential(video) -> tuple:
+    result = run(VideoPipeline(video))
+    assert len(result[0]) == 4
+    return result
+
+
+def test_threaded_pipeline_matches_the_sequential_one(video, sequential):
+    pipeline = ThreadedVideoPipeline(video)
+    shapes, trajectory_image = run(pipeline)
+    assert shapes == sequential[0]
+    assert np.array_equal(trajectory_image, sequential[1])
+    assert pipeline.stats["detect"].items == 60
+
+
+def test_batch_detection_matches_the_sequential_one(video, sequential):
+    shapes, trajectory_image = run(VideoPipeline(video, batch_size=4, batch_workers=2))
+    assert shapes == sequential[0]
+    assert np.array_equal(trajectory_image, sequential[1])
+
+
+def test_chunked_processing_matches_the_sequential_one(video, sequential):
+    processor = ChunkedVideoProcessor(video, processes=2, overlap=10)
+    assert tracks(processor.process()) == sequential[0]
+    assert processor.frame_count == 60
+
+
+def test_split_frames():
+    assert split_frames(100, 3, 10) == [(0, 44), (34, 78), (68, 100)]
+    assert split_frames(10, 1, 5) == [(0, 10)]
+
+
+def chunk_track(shape_id: int, shape_type: ShapeType, color: tuple, frames: range, y: int) -> dict:
+    """ Track of a chunk (Shape.to_dict()) moving right by 2 px per frame. """
+    return {"id": shape_id, "shape_type": shape_type.value, "color": list(color), "bounding": (frames[-1] * 2, y, 20),
+            "history": [[frame_id, [frame_id * 2, y]] for frame_id in frames]}
+
+
+def test_stitch_tracks_continues_the_tracks_matched_in_the_overlap():
+    red, blue, green = (220, 30, 30), (30, 30, 220), (30, 220, 30)
+    first = [chunk_track(1, ShapeType.CIRCLE, red, range(0, 15), 50), chunk_track(2, ShapeType.RECTANGLE, blue, range(0, 15), 150)]
+    # local IDs of the second chunk in another order, a new shape appears after the overlap
+    second = [chunk_track(1, ShapeType.RECTANGLE, blue, range(10, 20), 150), chunk_track(2, ShapeType.CIRCLE, red, range(10, 20), 50),
+              chunk_track(3, ShapeType.CIRCLE, green, range(16, 20), 250)]
+    shapes = stitch_tracks([(0, 15, first), (10, 20, second)])
+
+    assert [(shape.id, shape.shape_type, shape.color) for shape in shapes] == [
+        (1, ShapeType.CIRCLE, red), (2, ShapeType.RECTANGLE, blue), (3, ShapeType.CIRCLE, green)]
+    assert shapes[0].history.points()[0].tolist() == list(range(20))
+    assert shapes[1].to_dict()["history"] == [[frame_id, [frame_id * 2, 150]] for frame_id in range(20)]
+    assert shapes[2].history.points()[0].tolist() == list(range(16, 20))
+
+
+def test_snapshot_interval_limits_the_trajectory_copies(video, sequential):
+    for interval, copied in ((0.0, list(range(60))), (3600.0, [0])):
+        pipeline = ThreadedVideoPipeline(video, snapshot=True, snapshot_interval=interval)
+        copies = {pipeline.trajectory_frame for _ in pipeline.frames()}
+        assert sorted(copies) == copied
+        assert np.array_equal(pipeline.trajectory_image, sequential[1])
@@ -0,0 +1,42 @@
+from history import TrackHistory
+from shape import Shape, ShapeType
+from shape_updates import ShapeListDiffer
+
+
+def shape(shape_id: int, frames: int, color=(220, 30, 30)) -> Shape:
+    """ Circle detected in the frames [0, frames). """
+    history = TrackHistory(0, (10, 10))
+    for frame_id in range(1, frames):
+        history.append(frame_id, (10 + frame_id, 10))
+    return Shape(shape_id, ShapeType.CIRCLE, (10, 10, 5), (10, 10), color, history)
+
+
+def ids(shapes: tuple) -> list:
+    return [shape.id for shape in shapes]
+
+
+def test_deltas_against_the_emitted_state():
+    differ = ShapeListDiffer(max_rate=None, history_interval=10)
+    delta = differ.update([shape(1, 1), shape(2, 1)])
+    assert (ids(delta.added), delta.removed, ids(delta.changed)) == ([1, 2], (), [])
+
+    # moving shapes aren't changed until their history grew by history_interval frames
+    for frames in range(2, 10):
+        assert differ.update([shape(1, frames), shape(2, frames)]) is None
+    delta = differ.update([shape(1, 11), shape(2, 11, color=(30, 30, 220)), shape(3, 1)])
+    assert (ids(delta.added), delta.removed, ids(delta.changed)) == ([3], (), [1, 2])
+    assert delta.changed[0].history.last_frame == 10
+
+    delta = differ.update([shape(1, 12), shape(3, 1)])
+    assert (ids(delta.added), delta.removed, ids(delta.changed)) == ([], (2,), [])
+    delta = differ.update([shape(1, 13), shape(3, 1)], force=True)
+    assert (ids(delta.added), delta.removed, ids(delta.changed)) == ([], (), [1])
+    assert differ.update([shape(1, 13), shape(3, 1)], force=True) is None
+
+
+def test_rate_limit():
+    differ = ShapeListDiffer(max_rate=0.001)
+    assert differ.update([shape(1, 1)])
+    assert differ.update([shape(2, 1)]) is None
+    delta = differ.update([shape(2, 1)], force=True)
+    assert (ids(delta.added), delta.removed) == ([2], (1,))
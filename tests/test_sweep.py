@@ -0,0 +1,33 @@
+import argparse
+import pytest
+from benchmarks.sweep import parse_param, grid_settings, random_settings, pareto_front, choose
+from config import DEFAULT_CONFIG
+
+
+def test_parse_param():
+    base = DEFAULT_CONFIG.params()
+    assert parse_param("detector.threshold=8,11", base) == ("detector.threshold", [8, 11])
+    assert parse_param("tracker.max_color_distance=0.1:0.3", base) == ("tracker.max_color_distance", (0.1, 0.3))
+    assert parse_param("tracker.max_missed_frames=none,30", base) == ("tracker.max_missed_frames", [None, 30])
+    for text in ("detector.threshold", "detector.unknown=1", "engine=a:b"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_param(text, base)
+
+
+def test_settings():
+    params = [("a", [1, 2]), ("b", ["x", "y", "z"])]
+    assert len(grid_settings(params)) == 6
+    assert grid_settings(params)[1] == {"a": 1, "b": "y"}
+    settings = random_settings([("a", (1, 3)), ("b", ["x", "y"])], 4, seed=0)
+    assert len(settings) == 4 and len({tuple(setting.items()) for setting in settings}) == 4
+    assert all(1 <= setting["a"] <= 3 for setting in settings)
+
+
+def test_pareto_front_and_choice():
+    results = [{"fps": 100, "mota": 0.80}, {"fps": 50, "mota": 0.95}, {"fps": 40, "mota": 0.90}, {"fps": 80, "mota": 0.90},
+               {"fps": 100, "mota": 0.70}]
+    front = pareto_front(results)
+    assert front == [0, 1, 3]
+    assert choose(results, front, None) == 1
+    assert choose(results, front, 0.85) == 3
+    assert choose(results, front, 0.99) is None
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+from pipeline import VideoPipeline
+from track_log import TrackLogWriter, TrackLog, TrackLogPlayer
+from track_store import LOG_DTYPE
+
+
+def tracks(shapes: list) -> list:
+    return [(shape.id, shape.shape_type, tuple(int(c) for c in shape.color), shape.to_dict()["history"]) for shape in shapes]
+
+
+def log_records(*ids) -> np.ndarray:
+    records = np.zeros(len(ids), dtype=LOG_DTYPE)
+    records["id"] = ids
+    return records
+
+
+@pytest.fixture(scope="module")
+def logged(video, tmp_path_factory) -> tuple:
+    """ (pipeline, track log) of the processed video. """
+    path = str(tmp_path_factory.mktemp("log") / "tracks.stlog")
+    pipeline = VideoPipeline(video, track_log=path)
+    for _ in pipeline.frames():
+        pass
+    return pipeline, TrackLog(path)
+
+
+def test_write_and_read_frames(tmp_path):
+    path = str(tmp_path / "tracks.stlog")
+    writer = TrackLogWriter(path, 320, 200, fps=25.0, chunk_frames=4)
+    writer.add(0, log_records(1))
+    writer.add(1, log_records(1, 2))
+    writer.add(6, log_records(2)) # frames 2..5 were skipped
+    with pytest.raises(ValueError):
+        writer.add(6, log_records(2))
+    writer.close()
+
+    log = TrackLog(path)
+    assert (log.width, log.height, log.fps, log.frame_count) == (320, 200, 25.0, 7)
+    assert [log.frame(frame_id)["id"].tolist() for frame_id in range(8)] == [[1], [1, 2], [], [], [], [], [2], []]
+
+
+def test_interrupted_log_is_read_up_to_the_last_complete_chunk(tmp_path):
+    path = str(tmp_path / "tracks.stlog")
+    writer = TrackLogWriter(path, 320, 200, chunk_frames=2)
+    for frame_id in range(5):
+        writer.add(frame_id, log_records(frame_id + 1))
+    writer._file.flush() # the last frame is still buffered, as if the process was killed
+
+    log = TrackLog(path)
+    assert log.frame_count == 4
+    assert log.frame(3)["id"].tolist() == [4]
+    assert len(log.frame(4)) == 0
+
+
+def test_not_a_track_log(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"\0" * 100)
+    with pytest.raises(ValueError):
+        TrackLog(str(path))
+
+
+def test_logged_tracks_match_the_pipeline(logged):
+    pipeline, log = logged
+    assert log.frame_count == 60
+    assert tracks(log.shapes()) == tracks(pipeline.tracker.all_shapes())
+
+
+def test_replay_draws_the_trajectory_of_the_pipeline(logged):
+    pipeline, log = logged
+    player = TrackLogPlayer(log, keyframe_interval=16, background=False)
+    _, trajectory_image = player.render(59)
+    assert np.array_equal(trajectory_image, pipeline.trajectory_image)
+
+    # backward seek restarts from a keyframe (or the black image), forward seek draws the skipped frames
+    for frame_id in (37, 5, 40, 59):
+        assert np.array_equal(player.render(frame_id)[1], TrackLogPlayer(log, background=False).render(frame_id)[1])
+    assert np.array_equal(player.render(59)[1], pipeline.trajectory_image)
+
+
+def test_deep_seek_starts_from_the_prebuilt_keyframe(logged):
+    pipeline, log = logged
+    player = TrackLogPlayer(log, keyframe_interval=16, background=False)
+    player.build_keyframes()
+    player.render(0)
+    drawn = []
+    draw_paths = player._draw_paths
+    player._draw_paths = lambda renderer, records: drawn.append(records) or draw_paths(renderer, records)
+    player.render(59)
+    assert len(drawn) == 12 # from the keyframe of frame 48, not from frame 1
+    assert np.array_equal(player.trajectory_image, pipeline.trajectory_image)
+    assert np.array_equal(player.render(20)[1], TrackLogPlayer(log, background=False).render(20)[1])
+
+
+def test_background_keyframes(logged):
+    pipeline, log = logged
+    player = TrackLogPlayer(log, keyframe_interval=8)
+    player._thread.join()
+    assert sorted(player._keyframes) == list(range(0, 60, 8))
+    assert np.array_equal(player.render(59)[1], pipeline.trajectory_image)
+    player.close()
@@ -0,0 +1,123 @@
+import numpy as np
+from tracker import Tracker
+from track_store import DETECTION_DTYPE, CIRCLE, RECTANGLE
+
+
+def detections(*shapes) -> np.ndarray:
+    """ DETECTION_DTYPE records of (shape_type, center, color) tuples, 20 px boxes around the centers. """
+    records = np.zeros(len(shapes), dtype=DETECTION_DTYPE)
+    for record, (shape_type, (x, y), color) in zip(records, shapes):
+        record["shape_type"] = shape_type
+        record["center"] = (x, y)
+        record["bbox"] = (x - 10, y - 10, x + 10, y + 10)
+        record["color"] = color
+    return records
+
+
+def new_tracker(**kwargs) -> Tracker:
+    return Tracker(np.zeros((200, 300, 3), dtype=np.uint8), **kwargs)
+
+
+FRAME = np.zeros((200, 300, 3), dtype=np.uint8)
+RED, BLUE = (220, 30, 30), (30, 30, 220)
+
+
+def test_tracks_are_kept_by_default():
+    tracker = new_tracker()
+    tracker.new_frame(0, FRAME, detections((CIRCLE, (50, 50), RED)))
+    for frame_id in range(1, 200):
+        tracker.new_frame(frame_id, FRAME, detections())
+    assert [shape.id for shape in tracker.tracked_shapes] == [1]
+
+
+def test_lost_track_is_terminated_and_archived():
+    tracker = new_tracker(max_missed_frames=5)
+    tracker.new_frame(0, FRAME, detections((CIRCLE, (50, 50), RED), (RECTANGLE, (150, 100), BLUE)))
+    for frame_id in range(1, 6):
+        tracker.new_frame(frame_id, FRAME, detections((RECTANGLE, (150 + frame_id, 100), BLUE)))
+    assert [shape.id for shape in tracker.tracked_shapes] == [2]
+
+    shapes = tracker.all_shapes()
+    assert [shape.id for shape in shapes] == [1, 2]
+    assert list(shapes[0].history) == [(0, (50, 50))] + [(frame_id, None) for frame_id in range(1, 6)]
+    assert len(shapes[1].history) == 6
+
+
+def old_matching(frames: list, max_distance=100, max_color_distance=0.15) -> dict:
+    """ The original association (first track of the same type close enough in position and color), ID -> [(frame, center)]. """
+    tracks = [] # [id, type, color, last center]
+    histories = {}
+    for frame_id, shapes in enumerate(frames):
+        for shape_type, center, color in shapes:
+            match = next((track for track in tracks if track[1] == shape_type
+                          and np.linalg.norm((np.array(color) - track[2]) / 255.0) < max_color_distance
+                          and np.linalg.norm(np.array(center) - track[3]) < max_distance), None)
+            if match is None:
+                match = [len(tracks) + 1, shape_type, np.array(color), None]
+                tracks.append(match)
+                histories[match[0]] = []
+            match[3] = np.array(center)
+            histories[match[0]].append((frame_id, center))
+    return histories
+
+
+def random_walk(rng: np.random.Generator, starts: list, frames: int, step: int, missing: float) -> list:
+    """ Detections of each frame: shapes starting at starts with random colors, moving by up to step px, missing with the given chance. """
+    shapes = [(rng.choice([CIRCLE, RECTANGLE]), np.array(start), tuple(rng.integers(0, 256, 3).tolist())) for start in starts]
+    result = []
+    for _ in range(frames):
+        frame = []
+        for shape_type, center, color in shapes:
+            center += rng.integers(-step, step + 1, 2)
+            if rng.random() >= missing:
+                frame.append((shape_type, tuple(center.tolist()), color))
+        rng.shuffle(frame)
+        result.append(frame)
+    return result
+
+
+def run_tracker(frames: list, **kwargs) -> dict:
+    tracker = Tracker(np.zeros((2000, 2000, 3), dtype=np.uint8), **kwargs)
+    frame = np.zeros((2000, 2000, 3), dtype=np.uint8)
+    for frame_id, shapes in enumerate(frames):
+        tracker.new_frame(frame_id, frame, detections(*shapes))
+    return {shape.id: [(frame_id, center) for frame_id, center in shape.history if center is not None] for shape in tracker.all_shapes()}
+
+
+def test_association_matches_the_old_matching_on_separated_shapes():
+    rng = np.random.default_rng(0)
+    starts = [(300 + 400 * i, 300 + 400 * j) for i in range(4) for j in range(4)] # farther apart than 2 * max_distance
+    frames = random_walk(rng, starts, 50, 10, 0.1)
+    # IDs are given in the order of the first detection in both
+    assert run_tracker(frames) == old_matching(frames)
+
+
+def test_spatial_index_gives_the_same_tracks():
+    # dense scene, many shapes within max_distance of each other
+    rng = np.random.default_rng(1)
+    starts = rng.integers(100, 1900, size=(200, 2)).tolist()
+    frames = random_walk(rng, starts, 30, 15, 0.1)
+    assert run_tracker(frames, use_spatial_index=True) == run_tracker(frames)
+
+
+def test_skipped_frames_are_missed():
+    tracker = new_tracker(max_missed_frames=5)
+    tracker.new_frame(0, FRAME, detections((CIRCLE, (50, 50), RED)))
+    tracker.new_frame(1, FRAME, detections((CIRCLE, (52, 50), RED), (RECTANGLE, (150, 100), BLUE)))
+    # frames 2..6 were dropped, the circle was last seen 6 frames ago
+    tracker.new_frame(7, FRAME, detections((RECTANGLE, (152, 100), BLUE)))
+    assert [shape.id for shape in tracker.tracked_shapes] == [2]
+    assert tracker.all_shapes()[0].history.last_frame == 7
+
+
+def test_long_skip_starts_a_new_segment():
+    tracker = new_tracker()
+    for frame_id in range(3):
+        tracker.new_frame(frame_id, FRAME, detections((CIRCLE, (50 + frame_id, 50), RED)))
+    tracks = tracker.new_frame(15, FRAME, detections((CIRCLE, (80, 50), RED)))
+    assert not tracks["label_placed"][0]
+    assert tuple(tracks["segment_start"][0].tolist()) == (80, 50)
+
+    tracks = tracker.new_frame(16, FRAME, detections((CIRCLE, (82, 50), RED)))
+    assert tracks["label_placed"][0]
+    assert tuple(tracks["segment_start"][0].tolist()) == (80, 50)
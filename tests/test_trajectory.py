@@ -0,0 +1,100 @@
+import pickle
+import cv2
+import numpy as np
+import pytest
+from trajectory import TrajectoryRenderer
+
+HEIGHT, WIDTH = 200, 320
+
+
+class FullRedraw:
+    """ The original drawing: every matched shape redraws its whole path, the label and the lines of each segment. """
+    def __init__(self, image: np.ndarray) -> None:
+        self.image = image
+        self.paths = {} # ID -> (color, [[label position, points...] per segment])
+
+    def draw_path(self, shape_id: int, color: tuple, last_point=None, center=None, label_position=None) -> None:
+        path = self.paths.get(shape_id)
+        if last_point is not None:
+            if path is None:
+                path = self.paths[shape_id] = (color, [])
+            if label_position is not None or not path[1]:
+                path[1].append([label_position if label_position is not None else last_point, last_point])
+            path[1][-1].append(center)
+        if path is None:
+            return
+        r, g, b = path[0]
+        for label_position, *points in path[1]:
+            cv2.putText(self.image, str(shape_id), (label_position[0] + 5, label_position[1] - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.8,
+                        (b, g, r), 1, cv2.LINE_AA)
+            for start, end in zip(points, points[1:]):
+                cv2.line(self.image, start, end, (b, g, r), 2)
+
+
+def random_draws(seed: int, shapes=12, frames=150) -> list:
+    """ draw_path arguments of shapes walking randomly (also slightly out of the image), which sometimes start a new segment. """
+    rng = np.random.default_rng(seed)
+    positions = rng.integers(0, [WIDTH, HEIGHT], size=(shapes, 2))
+    colors = [tuple(int(c) for c in rng.integers(0, 256, 3)) for _ in range(shapes)]
+    last, lengths = [None] * shapes, [0] * shapes
+    draws = []
+    for _ in range(frames):
+        for s in rng.permutation(shapes):
+            if rng.random() < 0.3:
+                continue
+            positions[s] = np.clip(positions[s] + rng.integers(-25, 26, 2), -3, [WIDTH + 2, HEIGHT + 2])
+            center = (int(positions[s][0]), int(positions[s][1]))
+            if last[s] is None or rng.random() < 0.05:
+                if last[s] is not None:
+                    draws.append((s + 1, colors[s])) # the first point of a new segment only redraws
+                last[s], lengths[s] = center, 1
+                continue
+            draws.append((s + 1, colors[s], last[s], center, last[s] if lengths[s] == 1 else None))
+            last[s] = center
+            lengths[s] += 1
+    return draws
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_renderer_matches_the_full_redraw(seed):
+    expected, image = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8), np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    full_redraw, renderer = FullRedraw(expected), TrajectoryRenderer(image)
+    for draw in random_draws(seed):
+        full_redraw.draw_path(*draw)
+        renderer.draw_path(*draw)
+    assert expected.any()
+    assert np.array_equal(image, expected)
+
+
+def test_restored_state_continues_the_drawing():
+    draws = random_draws(3)
+    image = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    renderer = TrajectoryRenderer(image)
+    for draw in draws[:len(draws) // 2]:
+        renderer.draw_path(*draw)
+    keyframe, state = image.copy(), renderer.state()
+    for draw in draws[len(draws) // 2:]:
+        renderer.draw_path(*draw)
+    expected = image.copy()
+
+    image[:] = keyframe
+    renderer.restore(state)
+    for draw in draws[len(draws) // 2:]:
+        renderer.draw_path(*draw)
+    assert np.array_equal(image, expected)
+
+
+def test_state_does_not_grow_with_the_path():
+    renderer = TrajectoryRenderer(np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8))
+    renderer.draw_path(1, (220, 30, 30), (20, 20), (100, 100), (20, 20))
+    sizes = []
+    for _ in range(3):
+        for i in range(500):
+            renderer.draw_path(1, (220, 30, 30), (100 + i % 2 * 50, 100), (100 + (i + 1) % 2 * 50, 100))
+        sizes.append(len(pickle.dumps(renderer.state()[1])))
+    assert sizes[0] == sizes[1] == sizes[2]
+
+
+def test_image_must_be_contiguous():
+    with pytest.raises(ValueError):
+        TrajectoryRenderer(np.zeros((HEIGHT, WIDTH * 2, 3), dtype=np.uint8)[:, ::2])
@@ -0,0 +1,282 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from pipeline import VideoPipeline, open_capture
+from archive import TrackArchive
+from profiling import Profiler
+from config import TrackingConfig
+from exporter import ExportSettings
+
+_END = object() # end of the stream, passed through the queues after the last frame
+
+
+class StageStats:
+    """ Busy time and number of processed items of one pipeline stage, can be updated from multiple threads. """
+    def __init__(self, name: str, parallelism: int = 1) -> None:
+        self.name = name
+        self.parallelism = parallelism # number of threads running the stage
+        self.busy = 0.0
+        self.items = 0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float, items: int = 1) -> None:
+        """ Busy time of one task, processing the given number of items (0 for a part of an item counted by another task). """
+        with self._lock:
+            self.busy += seconds
+            self.items += items
+
+    def utilization(self, wall_time: float) -> float:
+        """ Fraction of the wall time the stage threads were busy (1.0 = all of its threads busy all the time). """
+        return self.busy / (wall_time * self.parallelism) if wall_time > 0 else 0.0
+
+
+class ThreadedVideoPipeline(VideoPipeline):
+    """
+        VideoPipeline split into stages running in parallel, connected by bounded queues:
+            decode (cv2.VideoCapture thread) -> detection (thread pool, circles and rectangles of a frame run concurrently,
+            OpenCV releases the GIL) -> tracking (one thread, frames in order) -> render (the thread consuming frames()).
+
+        Parameters
+        ----------
+        video_path : str
+            Path to the video file (anything cv2.VideoCapture can open), or index of a local camera (see open_capture).
+        archive : TrackArchive | None
+            Store for the terminated tracks, see Tracker.
+        queue_depth : int
+            Maximum number of frames waiting between two stages.
+        detection_workers : int
+            Number of threads of the detection pool.
+        pool : ThreadPoolExecutor | None
+            Detection pool shared with other pipelines (see MultiStreamManager) instead of an own pool (detection_workers is then its size).
+            At most queue_depth + 1 frames of the pipeline wait in the pool at a time, so pipelines sharing the pool take turns.
+        pyramid_levels : int | None
+            Multi-resolution detection (see Detector), the whole detection of a frame then runs as one task in the pool.
+        engine : str | None
+            Detection engine, see VideoPipeline. Single pass engines run the whole detection of a frame as one task in the pool.
+        track_log : str | None
+            Track log file for the replay, see VideoPipeline.
+        export : ExportSettings | None
+            Export of the annotated video and the trajectory image, see VideoPipeline. The frames are queued for the export in the tracking stage.
+        profiler : Profiler | None
+            Records the "decode", "detect_circles" / "detect_rectangles" (or "detect"), "filter", "track" and "snapshot" sections
+            (and the sections of the Tracker), disabled by default.
+        snapshot : bool
+            Copy the trajectory image and take immutable ShapeSnapshots of the tracks in the tracking stage for every frame,
+            so the render stage can read trajectory_image and shapes while the tracker already works on next frames (GUI).
+        snapshot_interval : float
+            Minimum time (seconds) between two copies of the trajectory image of snapshot, e.g. the display interval of the GUI:
+            the frames in between keep the previous copy (trajectory_frame tells the frame of the copy), 0 copies every frame.
+            After frames() the trajectory image is the final one of the tracker.
+        config : TrackingConfig | None
+            Detector and tracker parameters, see VideoPipeline.
+
+        Methods
+        -------
+        frames() -> generator
+            Same as VideoPipeline.frames(), the yielded tracks are copies.
+
+        report() -> str
+            Per-stage utilization of the last run.
+    """
+    def __init__(self, video_path: str, archive: TrackArchive | None = None, queue_depth: int = 4,
+                 detection_workers: int = 2, pyramid_levels: int | None = None, engine: str | None = None, profiler: Profiler | None = None,
+                 snapshot: bool = False, pool: ThreadPoolExecutor | None = None, track_log: str | None = None,
+                 config: TrackingConfig | None = None, export: ExportSettings | None = None, snapshot_interval: float = 0.0) -> None:
+        super().__init__(video_path, archive, pyramid_levels=pyramid_levels, engine=engine, track_log=track_log, profiler=profiler, config=config,
+                         export=export)
+        self.queue_depth = queue_depth
+        self.detection_workers = detection_workers
+        self.shared_pool = pool
+        self.snapshot = snapshot
+        self.snapshot_interval = snapshot_interval
+        self.trajectory_frame = None # frame of the trajectory image copy returned by trajectory_image
+        self.stats = {}
+        self.wall_time = 0.0
+        self._current = None # (trajectory image, shapes) snapshot of the last yielded frame
+
+    @property
+    def trajectory_image(self) -> np.ndarray | None:
+        if self._current is not None and self._current[0] is not None:
+            return self._current[0]
+        return super().trajectory_image
+
+    @property
+    def shapes(self) -> list:
+        if self._current is not None and self._current[1] is not None:
+            return self._current[1]
+        return super().shapes
+
+    def frames(self):
+        cap = open_capture(self.video_path)
+        self.tracker = self._new_tracker(cap)
+        self.frame_count = 0
+        self._current = None
+        self.trajectory_frame = None
+        self.stats = {
+            "decode": StageStats("decode"),
+            "detect": StageStats("detect", self.detection_workers),
+            "track": StageStats("track"),
+            "render": StageStats("render"),
+        }
+
+        stop = threading.Event()
+        decoded = queue.Queue(self.queue_depth)
+        detecting = queue.Queue(self.queue_depth)
+        tracked = queue.Queue(self.queue_depth)
+        pool = self.shared_pool or ThreadPoolExecutor(self.detection_workers, thread_name_prefix="detect")
+        threads = [
+            threading.Thread(target=self._decode_stage, args=(cap, decoded, stop), name="decode", daemon=True),
+            threading.Thread(target=self._detect_stage, args=(pool, decoded, detecting, stop), name="dispatch", daemon=True),
+            threading.Thread(target=self._track_stage, args=(detecting, tracked, stop), name="track", daemon=True),
+        ]
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = tracked.get()
+                if item is _END:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+
+                frame_id, frame, tracks, trajectory_image, shapes = item
+                if trajectory_image is not None:
+                    self.trajectory_frame = frame_id
+                elif self._current is not None:
+                    trajectory_image = self._current[0]
+                self._current = (trajectory_image, shapes)
+
+                render_start = time.perf_counter()
+                yield frame_id, frame, tracks
+                self.stats["render"].add(time.perf_counter() - render_start)
+                self.frame_count = frame_id + 1
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            self._current = None # the tracker is done, its own image and shapes are the final ones
+            if pool is not self.shared_pool:
+                pool.shutdown(wait=True, cancel_futures=True)
+            cap.release()
+            self._close_writers()
+            self.wall_time = time.perf_counter() - start
+
+    def report(self) -> str:
+        lines = [f"{'stage':<8} {'threads':>7} {'items':>7} {'busy [s]':>9} {'utilization':>11}"]
+        for stats in self.stats.values():
+            lines.append(f"{stats.name:<8} {stats.parallelism:>7} {stats.items:>7} {stats.busy:>9.2f} {stats.utilization(self.wall_time):>10.0%}")
+        return "\n".join(lines)
+
+    def _decode_stage(self, cap: cv2.VideoCapture, output: queue.Queue, stop: threading.Event) -> None:
+        stats = self.stats["decode"]
+        try:
+            frame_id = 0
+            while not stop.is_set():
+                start = time.perf_counter()
+                with self.profiler.section("decode"):
+                    ret, frame = cap.read()
+                if not ret:
+                    break
+                stats.add(time.perf_counter() - start)
+
+                if not _put(output, (frame_id, frame), stop):
+                    return
+                frame_id += 1
+            _put(output, _END, stop)
+        except Exception as error:
+            _put(output, error, stop)
+
+    def _detect_stage(self, pool: ThreadPoolExecutor, input: queue.Queue, output: queue.Queue, stop: threading.Event) -> None:
+        """ Submits both detections of each frame to the pool, the futures are queued in frame order. """
+        stats = self.stats["detect"]
+        while True:
+            item = _get(input, stop)
+            if item is None or item is _END or isinstance(item, BaseException):
+                _put(output, item if item is not None else _END, stop)
+                return
+
+            frame_id, frame = item
+            if self.detector.pyramid_levels > 0 or not self.detector.concurrent_shapes:
+                # the full resolution refinement depends on the downscaled detection of both shape types,
+                # single pass engines detect both types at once
+                circles = pool.submit(_timed, stats, 1, self.profiler.section("detect"), self.detector.detect, frame)
+                rectangles = None
+            else:
+                # both tasks add their busy time, the frame is counted once
+                circles = pool.submit(_timed, stats, 1, self.profiler.section("detect_circles"), self.detector.detect_circles, frame)
+                rectangles = pool.submit(_timed, stats, 0, self.profiler.section("detect_rectangles"), self.detector.detect_rectangles, frame)
+            if not _put(output, (frame_id, frame, circles, rectangles), stop):
+                return
+
+    def _track_stage(self, input: queue.Queue, output: queue.Queue, stop: threading.Event) -> None:
+        stats = self.stats["track"]
+        last_copy = None
+        try:
+            while True:
+                item = _get(input, stop)
+                if item is None or item is _END or isinstance(item, BaseException):
+                    _put(output, item if item is not None else _END, stop)
+                    return
+
+                frame_id, frame, circles, rectangles = item
+                if rectangles is None:
+                    detections = circles.result()
+                    start = time.perf_counter()
+                else:
+                    circles, rectangles = circles.result(), rectangles.result()
+                    start = time.perf_counter()
+                    with self.profiler.section("filter"):
+                        detections = self.detector.to_detections(frame, circles, rectangles)
+                with self.profiler.section("track"):
+                    tracks = self.tracker.new_frame(frame_id, frame, detections).copy()
+                if self.exporter is not None:
+                    self.exporter.write(frame_id, frame, self.tracker.trajectory_image)
+                if self.snapshot:
+                    with self.profiler.section("snapshot"):
+                        trajectory_image = None
+                        if last_copy is None or start - last_copy >= self.snapshot_interval:
+                            trajectory_image, last_copy = self.tracker.trajectory_image.copy(), start
+                        shapes = [shape.snapshot() for shape in self.tracker.tracked_shapes]
+                else:
+                    trajectory_image, shapes = None, None
+                stats.add(time.perf_counter() - start)
+
+                if not _put(output, (frame_id, frame, tracks, trajectory_image, shapes), stop):
+                    return
+        except Exception as error:
+            _put(output, error, stop)
+
+
+def _timed(stats: StageStats, items: int, section, function, *args):
+    start = time.perf_counter()
+    with section:
+        result = function(*args)
+    stats.add(time.perf_counter() - start, items)
+    return result
+
+
+def _put(output: queue.Queue, item, stop: threading.Event) -> bool:
+    """ Blocking put which gives up (returns False) when the pipeline is stopped. """
+    while not stop.is_set():
+        try:
+            output.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(input: queue.Queue, stop: threading.Event):
+    """ Blocking get which gives up (returns None) when the pipeline is stopped. """
+    while not stop.is_set():
+        try:
+            return input.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return None
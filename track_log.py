@@ -0,0 +1,294 @@
+import os
+import threading
+import cv2
+import numpy as np
+from history import TrackHistory
+from shape import Shape, SHAPE_TYPES, ShapeType
+from track_store import LOG_DTYPE, LOG_PATH, LOG_LABEL, LOG_PREDICTED
+from utils import draw_shape_on_frame, BOX_COLOR, PREDICTED_COLOR
+from trajectory import TrajectoryRenderer
+
+# file header: magic, format version, frame size, fps of the source and the number of frames of the full chunks
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"), ("width", "<u4"), ("height", "<u4"), ("chunk_frames", "<u4"), ("fps", "<f8")])
+# chunk header, followed by frames + 1 record offsets (uint32, relative to the chunk) and the LOG_DTYPE records of the frames
+CHUNK_DTYPE = np.dtype([("magic", "S4"), ("frames", "<u4"), ("first_frame", "<i8"), ("records", "<u8")])
+MAGIC = b"TRACKLOG"
+CHUNK_MAGIC = b"CHNK"
+VERSION = 1
+
+
+class TrackLogWriter:
+    """
+        Append-only binary log of the drawn shapes (LOG_DTYPE records, see Tracker) of every frame, written while processing.
+        The frames are buffered and written in chunks of chunk_frames frames, each chunk is a self-contained block
+        (header, per-frame record offsets, records), so the log of an interrupted run is readable up to its last complete chunk.
+
+        Parameters
+        ----------
+        path : str
+            The log file, overwritten.
+        width, height : int
+            Frame size of the video.
+        fps : float
+            Frame rate of the source (replay speed), 0 if unknown.
+        chunk_frames : int
+            Number of frames per chunk.
+
+        Methods
+        -------
+        add(frame_id: int, records: np.ndarray) -> None
+            Records of the next frame, the frames skipped since the previous add() are logged as empty.
+
+        close() -> None
+            Write the last (partial) chunk.
+    """
+    def __init__(self, path: str, width: int, height: int, fps: float = 0.0, chunk_frames: int = 128) -> None:
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self._file = open(path, "wb")
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header[0] = (MAGIC, VERSION, width, height, chunk_frames, fps if np.isfinite(fps) else 0.0)
+        self._file.write(header.tobytes())
+        self._first_frame = 0
+        self._frames = [] # records of the buffered frames of the current chunk
+        self.frame_count = 0 # frames added so far (including the empty skipped ones)
+
+    def add(self, frame_id: int, records: np.ndarray) -> None:
+        if frame_id < self.frame_count:
+            raise ValueError(f"frame {frame_id} was already logged")
+        empty = np.zeros(0, dtype=LOG_DTYPE)
+        while self.frame_count < frame_id:
+            self._append(empty)
+        self._append(np.asarray(records, dtype=LOG_DTYPE))
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._write_chunk()
+        self._file.close()
+
+    def _append(self, records: np.ndarray) -> None:
+        if not self._frames:
+            self._first_frame = self.frame_count
+        self._frames.append(records)
+        self.frame_count += 1
+        if len(self._frames) == self.chunk_frames:
+            self._write_chunk()
+
+    def _write_chunk(self) -> None:
+        if not self._frames:
+            return
+        counts = [len(records) for records in self._frames]
+        offsets = np.zeros(len(counts) + 1, dtype="<u4")
+        np.cumsum(counts, out=offsets[1:])
+        header = np.zeros(1, dtype=CHUNK_DTYPE)
+        header[0] = (CHUNK_MAGIC, len(counts), self._first_frame, offsets[-1])
+
+        self._file.write(header.tobytes())
+        self._file.write(offsets.tobytes())
+        self._file.write(np.concatenate(self._frames).tobytes())
+        self._file.flush()
+        self._frames = []
+
+
+class TrackLog:
+    """
+        Reader of the track log (TrackLogWriter), memory-mapped, the chunks are indexed by their first frame when opened,
+        so any frame is read without reading the frames before it.
+
+        Methods
+        -------
+        frame(frame_id: int) -> np.ndarray
+            LOG_DTYPE records of the frame (empty for frames without shapes or outside of the log).
+
+        shapes() -> list
+            Shape objects of all the logged tracks, with the histories of their detected centers.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._data = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, dtype=np.uint8)
+        if len(self._data) < HEADER_DTYPE.itemsize:
+            raise ValueError(f"{path} is not a track log")
+        header = np.frombuffer(self._data, HEADER_DTYPE, count=1)[0]
+        if header["magic"] != MAGIC or header["version"] != VERSION:
+            raise ValueError(f"{path} is not a track log (version {VERSION})")
+        self.width, self.height = int(header["width"]), int(header["height"])
+        self.fps = float(header["fps"])
+
+        # index of the complete chunks: first frame, number of frames, position of the offsets and of the records
+        first_frames, frame_counts, positions = [], [], []
+        position = HEADER_DTYPE.itemsize
+        while position + CHUNK_DTYPE.itemsize <= len(self._data):
+            chunk = np.frombuffer(self._data, CHUNK_DTYPE, count=1, offset=position)[0]
+            frames, records = int(chunk["frames"]), int(chunk["records"])
+            end = position + CHUNK_DTYPE.itemsize + 4 * (frames + 1) + records * LOG_DTYPE.itemsize
+            if chunk["magic"] != CHUNK_MAGIC or end > len(self._data):
+                break
+            first_frames.append(int(chunk["first_frame"]))
+            frame_counts.append(frames)
+            positions.append(position + CHUNK_DTYPE.itemsize)
+            position = end
+        self._first_frames = np.array(first_frames, dtype=np.int64)
+        self._frame_counts = frame_counts
+        self._positions = positions
+
+    @property
+    def frame_count(self) -> int:
+        return int(self._first_frames[-1]) + self._frame_counts[-1] if self._positions else 0
+
+    def frame(self, frame_id: int) -> np.ndarray:
+        chunk = int(np.searchsorted(self._first_frames, frame_id, side="right")) - 1
+        if chunk < 0 or frame_id >= self._first_frames[chunk] + self._frame_counts[chunk]:
+            return np.zeros(0, dtype=LOG_DTYPE)
+        offsets, records = self._chunk(chunk)
+        index = frame_id - int(self._first_frames[chunk])
+        return records[offsets[index]:offsets[index + 1]]
+
+    def shapes(self) -> list:
+        frames, records = [], []
+        for chunk in range(len(self._positions)):
+            offsets, chunk_records = self._chunk(chunk)
+            first = int(self._first_frames[chunk])
+            frames.append(np.repeat(np.arange(first, first + len(offsets) - 1), np.diff(offsets)))
+            records.append(chunk_records)
+        if not records:
+            return []
+        frames, records = np.concatenate(frames), np.concatenate(records)
+        detected = (records["flags"] & LOG_PREDICTED) == 0
+        frames, records = frames[detected], records[detected]
+
+        # records of each track in frame order
+        order = np.lexsort((frames, records["id"]))
+        frames, records = frames[order], records[order]
+        ids, starts = np.unique(records["id"], return_index=True)
+        ends = np.append(starts[1:], len(records))
+
+        shapes = []
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            history = TrackHistory.from_arrays(frames[start:end], records["center"][start:end], int(frames[end - 1]))
+            shapes.append(Shape.from_record(records[end - 1], history))
+        return shapes
+
+    def _chunk(self, chunk: int) -> tuple:
+        position = self._positions[chunk]
+        frames = self._frame_counts[chunk]
+        offsets = np.frombuffer(self._data, "<u4", count=frames + 1, offset=position)
+        records = np.frombuffer(self._data, LOG_DTYPE, count=int(offsets[-1]), offset=position + 4 * (frames + 1))
+        return offsets, records
+
+
+class TrackLogPlayer:
+    """
+        Renders the frames of the track log without the video: the annotated frame (shapes filled with their colors on black
+        background, boxes and IDs like the Tracker draws them) and the trajectory image up to the frame, drawn by the same functions
+        as in the Tracker. A seek restarts from the closest keyframe before the frame (PNG encoded trajectory image and the
+        TrajectoryRenderer state, every keyframe_interval frames) unless the current frame is closer, and draws only the paths
+        of the frames after it. The keyframes of the whole log are built by one background pass when the player is created,
+        so a seek anywhere draws at most keyframe_interval frames once the pass is done.
+
+        Parameters
+        ----------
+        log : TrackLog
+        keyframe_interval : int
+        background : bool
+            Build the keyframes in a background thread, otherwise only while rendering (or by build_keyframes()).
+
+        Methods
+        -------
+        render(frame_id: int) -> tuple
+            (frame, trajectory image) BGR images of the frame, the trajectory image is reused by the next render() calls.
+
+        build_keyframes() -> None
+            Draw the paths of the whole log into its own image and keep the keyframes, run by the background thread.
+
+        close() -> None
+            Stop the background pass.
+    """
+    def __init__(self, log: TrackLog, keyframe_interval: int = 256, background: bool = True) -> None:
+        self.log = log
+        self.keyframe_interval = keyframe_interval
+        self.trajectory_image = np.zeros((log.height, log.width, 3), dtype=np.uint8)
+        self.renderer = TrajectoryRenderer(self.trajectory_image)
+        self.position = 0 # next frame to be drawn into the trajectory image
+        self._keyframes = {0: None} # frame -> (PNG of the trajectory image, renderer state) before the frame, None is black
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self.build_keyframes, name="keyframes", daemon=True)
+            self._thread.start()
+
+    def render(self, frame_id: int) -> tuple:
+        frame_id = max(0, min(frame_id, self.log.frame_count - 1))
+        if frame_id < self.position or self._keyframe_before(frame_id) > self.position:
+            self._restore(frame_id)
+        while self.position <= frame_id:
+            self._draw_paths(self.renderer, self.log.frame(self.position))
+            self.position += 1
+            if self.position % self.keyframe_interval == 0:
+                self._add_keyframe(self.position, self.trajectory_image, self.renderer)
+
+        frame = np.zeros_like(self.trajectory_image)
+        records = self.log.frame(frame_id)
+        for record in records:
+            # the shape itself, the video isn't decoded
+            b, g, r = record["color"].tolist()[::-1]
+            x1, y1, x2, y2 = record["bbox"].tolist()
+            if SHAPE_TYPES[record["shape_type"]] == ShapeType.CIRCLE:
+                cv2.circle(frame, tuple(record["center"].tolist()), (x2 - x1) // 2, (b, g, r), -1)
+            else:
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (b, g, r), -1)
+        for record in records:
+            draw_shape_on_frame(frame, int(record["id"]), record, PREDICTED_COLOR if record["flags"] & LOG_PREDICTED else BOX_COLOR)
+        return frame, self.trajectory_image
+
+    def build_keyframes(self) -> None:
+        trajectory_image = np.zeros_like(self.trajectory_image)
+        renderer = TrajectoryRenderer(trajectory_image)
+        for frame_id in range(self.log.frame_count):
+            if self._stop.is_set():
+                return
+            self._draw_paths(renderer, self.log.frame(frame_id))
+            if (frame_id + 1) % self.keyframe_interval == 0:
+                self._add_keyframe(frame_id + 1, trajectory_image, renderer)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _add_keyframe(self, frame_id: int, trajectory_image: np.ndarray, renderer: TrajectoryRenderer) -> None:
+        with self._lock:
+            if frame_id in self._keyframes:
+                return
+        keyframe = (cv2.imencode(".png", trajectory_image)[1], renderer.state())
+        with self._lock:
+            self._keyframes.setdefault(frame_id, keyframe)
+
+    def _keyframe_before(self, frame_id: int) -> int:
+        with self._lock:
+            return max(frame for frame in self._keyframes if frame <= frame_id)
+
+    def _restore(self, frame_id: int) -> None:
+        keyframe = self._keyframe_before(frame_id)
+        with self._lock:
+            state = self._keyframes[keyframe]
+        if state is None:
+            self.trajectory_image[:] = 0
+            self.renderer = TrajectoryRenderer(self.trajectory_image)
+        else:
+            png, state = state
+            self.trajectory_image[:] = cv2.imdecode(png, cv2.IMREAD_COLOR)
+            self.renderer.restore(state)
+        self.position = keyframe
+
+    def _draw_paths(self, renderer: TrajectoryRenderer, records: np.ndarray) -> None:
+        # every detected shape is redrawn like by the Tracker, the new shapes have no path yet
+        for record in records[(records["flags"] & LOG_PREDICTED) == 0]:
+            color = tuple(record["color"].tolist())
+            if record["flags"] & LOG_PATH:
+                label_position = tuple(record["segment_start"].tolist()) if record["flags"] & LOG_LABEL else None
+                renderer.draw_path(int(record["id"]), color, tuple(record["previous"].tolist()), tuple(record["center"].tolist()),
+                                   label_position)
+            else:
+                renderer.draw_path(int(record["id"]), color)
@@ -0,0 +1,135 @@
+import numpy as np
+from history import TrackHistory
+from shape import Shape, ShapeType, SHAPE_TYPES
+
+CIRCLE = SHAPE_TYPES.index(ShapeType.CIRCLE)
+RECTANGLE = SHAPE_TYPES.index(ShapeType.RECTANGLE)
+
+# one detected shape, bbox is (x1, y1, x2, y2) for both types (circle radius is half of the bbox width), color is RGB
+DETECTION_DTYPE = np.dtype([
+    ("shape_type", np.uint8),
+    ("bbox", np.int32, 4),
+    ("center", np.int32, 2),
+    ("color", np.uint8, 3),
+])
+
+# one tracked shape, center is always the last detected (valid) center, velocity is in pixels per frame (between the last two detections),
+# missed is the number of consecutive frames without detection, segment_start and label_placed is the trajectory drawing state
+TRACK_DTYPE = np.dtype([
+    ("id", np.int64),
+    ("shape_type", np.uint8),
+    ("bbox", np.int32, 4),
+    ("center", np.int32, 2),
+    ("color", np.uint8, 3),
+    ("velocity", np.float32, 2),
+    ("last_seen", np.int64),
+    ("missed", np.int32),
+    ("segment_start", np.int32, 2),
+    ("label_placed", np.bool_),
+])
+
+# one drawn shape of a frame in the track log (track_log.py): the box (bbox, center) is drawn on the frame, flags tell what is drawn
+# on the trajectory image: LOG_PATH - line from previous to center, LOG_LABEL - ID label at segment_start; LOG_PREDICTED - coasted track
+LOG_DTYPE = np.dtype([
+    ("id", np.int64),
+    ("shape_type", np.uint8),
+    ("bbox", np.int32, 4),
+    ("center", np.int32, 2),
+    ("color", np.uint8, 3),
+    ("previous", np.int32, 2),
+    ("segment_start", np.int32, 2),
+    ("flags", np.uint8),
+])
+LOG_PATH, LOG_LABEL, LOG_PREDICTED = 1, 2, 4
+
+
+def empty_detections(count: int = 0) -> np.ndarray:
+    return np.zeros(count, dtype=DETECTION_DTYPE)
+
+
+def circle_detections(circles: np.ndarray) -> np.ndarray:
+    """ Detection records of the (N, 3) array of (x, y, r) circles, without color. """
+    circles = np.asarray(circles, dtype=np.int32).reshape(-1, 3)
+    detections = empty_detections(len(circles))
+    x, y, r = circles[:, 0], circles[:, 1], circles[:, 2]
+    detections["shape_type"] = CIRCLE
+    detections["bbox"] = np.column_stack((x - r, y - r, x + r, y + r))
+    detections["center"] = circles[:, :2]
+    return detections
+
+
+def rectangle_detections(rectangles: np.ndarray) -> np.ndarray:
+    """ Detection records of the (N, 4) array of (x1, y1, x2, y2) rectangles, without color. """
+    rectangles = np.asarray(rectangles, dtype=np.int32).reshape(-1, 4)
+    detections = empty_detections(len(rectangles))
+    detections["shape_type"] = RECTANGLE
+    detections["bbox"] = rectangles
+    detections["center"] = np.column_stack(((rectangles[:, 0] + rectangles[:, 2]) // 2, (rectangles[:, 1] + rectangles[:, 3]) // 2))
+    return detections
+
+
+class TrackStore:
+    """ 
+        Struct-of-arrays storage of the active tracks (NumPy structured array with TRACK_DTYPE rows),
+        the histories are kept per track ID as they have different lengths.
+
+        Methods
+        -------
+        add(detections, first_id, frame_id) -> None
+            Append new tracks created from the detection records, with consecutive IDs from first_id.
+
+        remove(mask) -> list
+            Remove the tracks selected by the boolean mask, returns their Shape views.
+
+        view(index) -> Shape
+            Shape view of the index-th active track.
+    """
+    def __init__(self, capacity: int = 64) -> None:
+        self._tracks = np.zeros(capacity, dtype=TRACK_DTYPE)
+        self.size = 0
+        self.histories = {} # track ID -> TrackHistory
+        self.frame_id = 0 # current frame, set by the Tracker
+
+    @property
+    def tracks(self) -> np.ndarray:
+        """ The active tracks, a view, valid only until the next add() or remove(). """
+        return self._tracks[:self.size]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, detections: np.ndarray, first_id: int, frame_id: int) -> None:
+        count = len(detections)
+        if self.size + count > len(self._tracks):
+            self._tracks = np.resize(self._tracks, max(2 * len(self._tracks), self.size + count))
+
+        new_tracks = self._tracks[self.size:self.size + count]
+        new_tracks[:] = np.zeros(count, dtype=TRACK_DTYPE)
+        new_tracks["id"] = np.arange(first_id, first_id + count)
+        for field in DETECTION_DTYPE.names:
+            new_tracks[field] = detections[field]
+        new_tracks["last_seen"] = frame_id
+        new_tracks["segment_start"] = detections["center"]
+        self.size += count
+
+        for shape_id, center in zip(new_tracks["id"].tolist(), detections["center"].tolist()):
+            self.histories[shape_id] = TrackHistory(frame_id, center)
+
+    def remove(self, mask: np.ndarray) -> list:
+        removed = [self.view(index) for index in np.flatnonzero(mask)]
+        kept = self._tracks[:self.size][~mask]
+        self._tracks[:len(kept)] = kept
+        self.size = len(kept)
+        for shape in removed:
+            del self.histories[shape.id]
+        return removed
+
+    def view(self, index: int) -> Shape:
+        record = self._tracks[index]
+        history = self.histories[int(record["id"])]
+        # missing frames are not appended to the histories one by one, bring the history up to the current frame
+        history.last_frame = max(history.last_frame, self.frame_id)
+        return Shape.from_record(record, history)
+
+    def views(self) -> list:
+        return [self.view(index) for index in range(self.size)]
@@ -1,130 +1,267 @@
-import cv2
 import numpy as np
-from utils import match_shape, split_history
-from shape import Shape, ShapeType
+from utils import association_costs, pair_costs, greedy_assignment, draw_shape_on_frame, MAX_HISTORY_GAP, PREDICTED_COLOR
+from spatial_index import GridIndex
+from archive import TrackArchive
+from track_store import TrackStore, LOG_DTYPE, LOG_PATH, LOG_LABEL, LOG_PREDICTED
+from track_log import TrackLogWriter
+from trajectory import TrajectoryRenderer
+from profiling import Profiler
 
 
 class Tracker:
     """ 
         Class that manages all the tracking and drawing of shapes on the frame and trajectory image.
+        The active tracks are kept in the columnar TrackStore, Shape objects are created only as views for the GUI and export.
 
         Parameters
         ----------
         trajectory_image : np.array
             Image where the trajectory of the shapes will be drawn.
+        max_distance : float
+            Maximum distance (in pixels) between the last center of a tracked shape and a detection to be matched.
+        max_color_distance : float
+            Maximum distance of the normalized RGB colors of a tracked shape and a detection to be matched.
+        use_spatial_index : bool
+            Compare each detection only with the tracks in its neighbourhood (uniform grid with max_distance cells),
+            instead of with every track, useful for scenes with hundreds of shapes.
+        max_missed_frames : int | None
+            Number of consecutive frames without detection after which the track is terminated and moved to the archive,
+            None keeps all the tracks alive forever.
+        history_gap : int
+            A track missing for more frames (overlap, edge of the screen) continues in a new trajectory segment.
+        archive : TrackArchive | None
+            Store for the terminated tracks, in-memory SQLite database by default.
+        profiler : Profiler | None
+            Records the "match", "draw" and "archive" sections of new_frame(), disabled by default.
+        track_log : TrackLogWriter | None
+            Log of the drawn shapes of every frame (track_log.py), for the replay without processing the video again.
 
         Methods
         -------
-        new_frame(frame_id, frame, detected_shapes) -> list
-            Update the tracked shapes with new detections, return the updated list of tracked shapes.
+        new_frame(frame_id, frame, detections) -> np.array
+            Update the tracks with new detections (DETECTION_DTYPE records), return the active tracks (TRACK_DTYPE records).
+            The frames skipped since the previous new_frame() (dropped or coasted in the real-time mode) are missed frames of every track,
+            so the history gap and the termination count the frames of the source, not the processed ones.
 
-        draw_shape_on_frame(shape, frame) -> None
-            Draw the bounding box and ID of the shape on the frame.
+        tracked_shapes -> list
+            Shape views of the active tracks.
 
-        draw_shape_path(shape, trajectory_image) -> None
-            Draw the path of the shape on the trajectory image.
+        predict(frame_id) -> np.array
+            Constant-velocity prediction of the centers of the active tracks in the given frame.
+
+        coast(frame_id, frame) -> np.array
+            Frame without detections (real-time mode over its latency budget), draws the predicted boxes of the recently
+            detected tracks and keeps the tracks unchanged (no history, the frame is counted as missed by the next new_frame()),
+            returns the active tracks.
+
+        all_shapes() -> list
+            All the shapes tracked so far, the terminated ones loaded from the archive.
+
+        The drawing itself (draw_shape_on_frame in utils.py, TrajectoryRenderer in trajectory.py) is shared with the replay of the track log.
     """
-    def __init__(self, trajectory_image: np.ndarray) -> None:
+    def __init__(self, trajectory_image: np.ndarray, max_distance=100, max_color_distance=0.15, use_spatial_index=False,
+                 max_missed_frames: int | None = None, history_gap: int = MAX_HISTORY_GAP, archive: TrackArchive | None = None,
+                 profiler: Profiler | None = None, track_log: TrackLogWriter | None = None) -> None:
         self.trajectory_image = trajectory_image
-        self.tracked_shapes = []
+        self.renderer = TrajectoryRenderer(trajectory_image)
+        self.max_distance = max_distance
+        self.max_color_distance = max_color_distance
+        self.spatial_index = GridIndex(max_distance) if use_spatial_index else None
+        self.max_missed_frames = max_missed_frames
+        self.history_gap = history_gap
+        self.archive = archive if archive is not None else TrackArchive()
+        self.store = TrackStore() # active tracks only, terminated ones are moved to the archive
         self.id_counter = 1
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+        self.track_log = track_log
+
+    @property
+    def tracked_shapes(self) -> list:
+        return self.store.views()
+
+    def new_frame(self, frame_id: int, frame: np.ndarray, detections: np.ndarray) -> np.ndarray:
+        skipped = frame_id - self.store.frame_id - 1
+        self.store.frame_id = frame_id
+        tracks = self.store.tracks
+        if skipped > 0:
+            tracks["missed"] += skipped
+        with self.profiler.section("match"):
+            track_rows, detection_rows, duplicates = self._associate(detections)
+
+            # state of the matched tracks before the update, needed for drawing the path
+            previous_centers = tracks["center"][track_rows]
+            new_segment = tracks["missed"][track_rows] > self.history_gap
+            label_missing = ~new_segment & ~tracks["label_placed"][track_rows]
+
+            # update the matched tracks
+            matched = detections[detection_rows]
+            frame_gaps = (frame_id - tracks["last_seen"][track_rows])[:, None]
+            tracks["velocity"][track_rows] = (matched["center"] - previous_centers) / np.maximum(frame_gaps, 1)
+            tracks["center"][track_rows] = matched["center"]
+            tracks["bbox"][track_rows] = matched["bbox"]
+            tracks["last_seen"][track_rows] = frame_id
+            tracks["missed"][track_rows] = 0
+            tracks["segment_start"][track_rows[new_segment]] = matched["center"][new_segment]
+            tracks["label_placed"][track_rows] = ~new_segment
+
+            unmatched = np.ones(len(tracks), dtype=bool)
+            unmatched[track_rows] = False
+            tracks["missed"][unmatched] += 1
+
+            is_new = np.ones(len(detections), dtype=bool)
+            is_new[detection_rows] = False
+            is_new[list(duplicates)] = False
+            new_ids = np.cumsum(is_new) - 1 + self.id_counter
+
+        # drawing in the order of the detections
+        with self.profiler.section("draw"):
+            match_positions = dict(zip(detection_rows.tolist(), range(len(detection_rows))))
+            for detection_index in range(len(detections)):
+                position = match_positions.get(detection_index)
+                if position is not None:
+                    row = track_rows[position]
+                    shape_id = int(tracks["id"][row])
+                    self.store.histories[shape_id].append(frame_id, tuple(matched["center"][position].tolist()))
+                    draw_shape_on_frame(frame, shape_id, matched[position])
+                    if new_segment[position]:
+                        # the path is still redrawn, same as by the full redraw of every matched shape
+                        self.renderer.draw_path(shape_id, tuple(tracks["color"][row].tolist()))
+                    else:
+                        label_position = tuple(tracks["segment_start"][row].tolist()) if label_missing[position] else None
+                        self.renderer.draw_path(shape_id, tuple(tracks["color"][row].tolist()), tuple(previous_centers[position].tolist()),
+                                                tuple(tracks["center"][row].tolist()), label_position)
+                elif is_new[detection_index]:
+                    draw_shape_on_frame(frame, int(new_ids[detection_index]), detections[detection_index])
+
+        if self.track_log is not None:
+            self._log_frame(frame_id, detections, track_rows, detection_rows, previous_centers, new_segment, label_missing, is_new, new_ids)
+
+        new_count = int(is_new.sum())
+        self.store.add(detections[is_new], self.id_counter, frame_id)
+        self.id_counter += new_count
+
+        if self.max_missed_frames is not None:
+            terminated = self.store.tracks["missed"] >= self.max_missed_frames
+            if terminated.any():
+                with self.profiler.section("archive"):
+                    for shape in self.store.remove(terminated):
+                        self.archive.add(shape)
+                        self.renderer.forget(shape.id)
+
+        return self.store.tracks
+
+    def predict(self, frame_id: int) -> np.ndarray:
+        tracks = self.store.tracks
+        return tracks["center"] + tracks["velocity"] * (frame_id - tracks["last_seen"])[:, None]
+
+    def coast(self, frame_id: int, frame: np.ndarray) -> np.ndarray:
+        tracks = self.store.tracks
+        recent = tracks["missed"] <= self.history_gap
+        with self.profiler.section("draw"):
+            predicted = tracks[recent].copy()
+            shift = np.rint(self.predict(frame_id)[recent] - predicted["center"]).astype(np.int32)
+            predicted["center"] += shift
+            predicted["bbox"] += np.tile(shift, 2)
+            for record in predicted:
+                draw_shape_on_frame(frame, int(record["id"]), record, PREDICTED_COLOR)
+
+        if self.track_log is not None:
+            records = np.zeros(len(predicted), dtype=LOG_DTYPE)
+            for field in ("id", "shape_type", "bbox", "center", "color"):
+                records[field] = predicted[field]
+            records["previous"] = records["segment_start"] = predicted["center"]
+            records["flags"] = LOG_PREDICTED
+            self.track_log.add(frame_id, records)
+        return tracks
+
+    def all_shapes(self) -> list:
+        return sorted(self.archive.shapes() + self.tracked_shapes, key=lambda shape: shape.id)
+
+    def _associate(self, detections: np.ndarray) -> tuple:
+        """ 
+            Match the detections to the active tracks all at once (gated costs of utils.association_costs / pair_costs, utils.greedy_assignment).
+            Returns arrays of matched (track rows, detection indices) and set of indices of duplicate detections,
+            which would match an already claimed track or another new shape from the same frame.
+        """
+        empty = np.empty(0, dtype=np.int64)
+        if len(detections) == 0:
+            return empty, empty, set()
+
+        centers = detections["center"].astype(np.float64)
+        colors = detections["color"].astype(np.float64)
+        types = detections["shape_type"]
+
+        track_rows, detection_rows = empty, empty
+        duplicates = set()
+        tracks = self.store.tracks
+        if len(tracks):
+            # center of the track is always the last valid (non-None) center
+            track_indices, detection_indices, costs = self._candidate_pairs(
+                tracks["center"].astype(np.float64), tracks["color"].astype(np.float64), tracks["shape_type"],
+                centers, colors, types
+            )
+            pairs = greedy_assignment(track_indices, detection_indices, costs)
+            if pairs:
+                track_rows, detection_rows = (np.array(column, dtype=np.int64) for column in zip(*pairs))
+            duplicates = set(detection_indices.tolist()) - set(detection_rows.tolist())
+
+        # among the new shapes, keep only the first one of each group matching each other
+        matched = set(detection_rows.tolist())
+        new_indices = [i for i in range(len(detections)) if i not in matched and i not in duplicates]
+        if len(new_indices) > 1:
+            first_indices, second_indices, _ = self._candidate_pairs(centers[new_indices], colors[new_indices], types[new_indices],
+                                                                     centers[new_indices], colors[new_indices], types[new_indices])
+            matching = {}
+            for first, second in zip(first_indices.tolist(), second_indices.tolist()):
+                if first < second:
+                    matching.setdefault(second, []).append(first)
+
+            kept = set()
+            for position, detection_index in enumerate(new_indices):
+                if any(first in kept for first in matching.get(position, ())):
+                    duplicates.add(detection_index)
+                else:
+                    kept.add(position)
+
+        return track_rows, detection_rows, duplicates
+
+    def _candidate_pairs(self, track_centers: np.ndarray, track_colors: np.ndarray, track_types: np.ndarray,
+                         detection_centers: np.ndarray, detection_colors: np.ndarray, detection_types: np.ndarray) -> tuple:
+        """ (track indices, detection indices, costs) of all the track x detection pairs passing the matching criteria. """
+        if self.spatial_index is not None:
+            self.spatial_index.build(track_centers)
+            track_indices, detection_indices = self.spatial_index.query(detection_centers)
+            costs = pair_costs(
+                track_centers[track_indices], track_colors[track_indices], track_types[track_indices],
+                detection_centers[detection_indices], detection_colors[detection_indices], detection_types[detection_indices],
+                self.max_distance, self.max_color_distance
+            )
+        else:
+            all_costs = association_costs(track_centers, track_colors, track_types,
+                                          detection_centers, detection_colors, detection_types,
+                                          self.max_distance, self.max_color_distance)
+            track_indices, detection_indices = np.nonzero(np.isfinite(all_costs))
+            costs = all_costs[track_indices, detection_indices]
+
+        valid = np.isfinite(costs)
+        return track_indices[valid], detection_indices[valid], costs[valid]
 
-    def new_frame(self, frame_id: int, frame: np.ndarray, detected_shapes: list) -> list:
-        current_tracked_ids = set()
-
-        for shape in detected_shapes:
-            existing_shape = match_shape(shape, self.tracked_shapes)
-
-            if existing_shape:
-                existing_shape.center = shape["center"]
-                existing_shape.bounding = shape["bounding"]
-                existing_shape.history.append((frame_id, existing_shape.center))
-
-                self._draw_shape_on_frame(existing_shape, frame)
-                self._draw_shape_path(existing_shape, self.trajectory_image)
-                current_tracked_ids.add(existing_shape.id)
-            else:
-                new_shape = Shape(
-                    shape_id=self.id_counter,
-                    shape_type=shape["shape_type"],
-                    bounding=shape["bounding"],
-                    center=shape["center"],
-                    color=shape["color"],
-                    first_occurence=frame_id
-                    )
-                self.tracked_shapes.append(new_shape)
-                current_tracked_ids.add(self.id_counter)
-                self.id_counter += 1
-
-                self._draw_shape_on_frame(new_shape, frame)
-
-        for tracked_shape in self.tracked_shapes:
-            if tracked_shape.id not in current_tracked_ids:
-                tracked_shape.history.append((frame_id, None))
-            
-        return self.tracked_shapes
-    
-    def _draw_shape_on_frame(self, shape: Shape, frame: np.ndarray) -> None:
-        """ Draw the bounding box and ID on the frame. """
-        if shape.shape_type == ShapeType.CIRCLE:
-            x, y, r = shape.bounding
-            cv2.circle(frame, (x, y), r, (0, 255, 0), 2)  # green circle
-            cv2.circle(frame, shape.center, 3, (0, 0, 255), -1)  # ged center point
-            cv2.putText(frame, f'ID: {shape.id}', (x + r + 5, y), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-        elif shape.shape_type == ShapeType.RECTANGLE:
-            (x1, y1), (x2, y2) = shape.bounding
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)  # green rectangle
-            cv2.circle(frame, shape.center, 3, (0, 0, 255), -1)  # red center point
-            cv2.putText(frame, f'ID: {shape.id}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-
-
-    def _draw_shape_path(self, shape: Shape, trajectory_image: np.ndarray) -> None:
-        """ Draw the path of the shape on the trajectory image. """
-        # each segment is part of the history where the shape was detected, separated by more than xyz (10) None values (overlap or edge of screen)
-        history_segments = split_history(shape.history)
-        bgr_color = (int(shape.color[2]), int(shape.color[1]), int(shape.color[0]))
-
-        for segment in history_segments:
-            if len(segment) > 1:
-                # Determine the first valid point in the segment
-                first_point = None
-                for point in segment:
-                    if point[-1] is not None:
-                        first_point = point[-1]
-                        break
-
-                # add ID to the first point of the segment
-                if first_point is not None:
-                    text_position = (first_point[0] + 5, first_point[1] - 5)  # Slightly offset the text position
-                    cv2.putText(trajectory_image, str(shape.id), text_position, 
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, bgr_color, 1, cv2.LINE_AA)
-
-                for i in range(1, len(segment)):
-                    start_point = segment[i-1][-1]
-                    end_point = segment[i][-1]
-
-                    # prevent empty spaces in the line
-                    if start_point is None:
-                        start_point = self._find_previous_valid_point(segment, i-1)
-                    if end_point is None:
-                        end_point = self._find_next_valid_point(segment, i)
-
-                    # draw the line if both points are valid
-                    if start_point is not None and end_point is not None:
-                        cv2.line(trajectory_image, start_point, end_point, bgr_color, 2)
-
-    def _find_previous_valid_point(self, segment: list, index: int) -> tuple | None:
-        for i in range(index, -1, -1):
-            if segment[i][-1] is not None:
-                return segment[i][-1]
-        return None
-
-    def _find_next_valid_point(self, segment: list, index: int) -> tuple | None:
-        for i in range(index + 1, len(segment)):
-            if segment[i][-1] is not None:
-                return segment[i][-1]
-        return None
-
-   
+    def _log_frame(self, frame_id: int, detections: np.ndarray, track_rows: np.ndarray, detection_rows: np.ndarray, previous_centers: np.ndarray,
+                   new_segment: np.ndarray, label_missing: np.ndarray, is_new: np.ndarray, new_ids: np.ndarray) -> None:
+        """ Log records of the drawn (matched and new) detections, in the drawing order. """
+        tracks = self.store.tracks
+        records = np.zeros(len(detections), dtype=LOG_DTYPE)
+        for field in ("shape_type", "bbox", "center", "color"):
+            records[field] = detections[field]
+        records["id"] = new_ids
+        records["previous"] = records["segment_start"] = detections["center"]
 
+        records["id"][detection_rows] = tracks["id"][track_rows]
+        records["color"][detection_rows] = tracks["color"][track_rows]
+        records["previous"][detection_rows] = previous_centers
+        records["segment_start"][detection_rows] = tracks["segment_start"][track_rows]
+        records["flags"][detection_rows] = np.where(new_segment, 0, LOG_PATH) | np.where(label_missing, LOG_LABEL, 0)
 
+        drawn = is_new.copy()
+        drawn[detection_rows] = True
+        self.track_log.add(frame_id, records[drawn])
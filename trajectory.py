@@ -0,0 +1,170 @@
+import zlib
+import cv2
+import numpy as np
+
+# ID label at the first point of each trajectory segment, lines between the detected centers
+LABEL_FONT, LABEL_SCALE, LABEL_THICKNESS = cv2.FONT_HERSHEY_SIMPLEX, 0.8, 1
+LINE_THICKNESS = 2
+
+
+class _Path:
+    """ Drawing state of one shape: labels, label boxes, line pixels inside them and the pixels drawn over by the other shapes. """
+    def __init__(self, color: tuple) -> None:
+        self.color = color # BGR
+        self.labels = [] # per segment: (text, position) of its label
+        self.boxes = [] # (x0, y0, x1, y1) of the labels
+        self.box_pixels = np.empty(0, dtype=np.int64) # flat pixel indices of all the label boxes (sorted, unique)
+        self.boxed = np.empty(0, dtype=np.int64) # flat pixel indices of the lines inside the label boxes (sorted, unique)
+        self.stolen = [] # flat pixel indices (arrays) of the lines drawn over by the other shapes since the last redraw
+
+    def copy(self) -> "_Path":
+        # the index arrays are never changed in place, only the lists
+        path = _Path(self.color)
+        path.labels = list(self.labels)
+        path.boxes = list(self.boxes)
+        path.box_pixels = self.box_pixels
+        path.boxed = self.boxed
+        path.stolen = list(self.stolen)
+        return path
+
+
+class TrajectoryRenderer:
+    """
+        Draws the paths of the tracked shapes on the trajectory image, frame by frame, with exactly the same result as the original
+        drawing, which redrew the whole path of every matched shape (the label and the lines of each segment) in every frame.
+
+        The lines are opaque and a label blended in the color of the shape doesn't change the pixels of its lines, so after a full
+        redraw every line pixel has the color of the shape and the other pixels of the label boxes are blended by the labels again.
+        A redraw therefore draws the labels, the line pixels inside the label boxes, the new line and the line pixels other shapes
+        drew over since the last redraw of the shape (found through the owner map, the last shape which drew each pixel, +ID for
+        the lines, -ID for the rest of the label boxes). The cost depends on the size of the label boxes, not on the path length.
+
+        Parameters
+        ----------
+        trajectory_image : np.ndarray
+            C-contiguous BGR image, drawn into in place.
+
+        Methods
+        -------
+        draw_path(shape_id: int, color: tuple, last_point: tuple | None = None, center: tuple | None = None, label_position: tuple | None = None) -> None
+            The shape (RGB color) was matched in the frame: its path is extended by the line from last_point to center (no line if
+            last_point is None, e.g. the shape starts a new segment), a new segment with the ID label at label_position is started first,
+            then the whole path is redrawn. Shapes without any line are not drawn.
+
+        forget(shape_id: int) -> None
+            Drop the state of a shape which won't be drawn any more (terminated track), its pixels stay in the image.
+
+        state() -> tuple
+            Copy of the drawing state (without the image), restore(state) continues from it, e.g. after restoring the image of a keyframe.
+    """
+    def __init__(self, trajectory_image: np.ndarray) -> None:
+        if not trajectory_image.flags.c_contiguous:
+            raise ValueError("the trajectory image must be C-contiguous")
+        self.trajectory_image = trajectory_image
+        self.height, self.width = trajectory_image.shape[:2]
+        self._pixels = trajectory_image.reshape(-1, 3) # view of the image
+        self._owner = np.zeros(self.height * self.width, dtype=np.int32) # ID of the shape which drew each pixel last (see above), 0 none
+        self._scratch = np.zeros((self.height, self.width), dtype=np.uint8) # rasterization of single lines and labels, kept black
+        self._paths = {}
+
+    def draw_path(self, shape_id: int, color: tuple, last_point: tuple | None = None, center: tuple | None = None,
+                  label_position: tuple | None = None) -> None:
+        path = self._paths.get(shape_id)
+        new_pixels = np.empty(0, dtype=np.int64)
+        if last_point is not None:
+            if path is None:
+                r, g, b = color
+                path = self._paths[shape_id] = _Path((int(b), int(g), int(r)))
+            if label_position is not None or not path.labels:
+                self._add_segment(shape_id, path, label_position if label_position is not None else last_point)
+            new_pixels = self._add_line(path, last_point, center)
+        if path is not None:
+            self._redraw(shape_id, path, new_pixels)
+
+    def forget(self, shape_id: int) -> None:
+        self._paths.pop(shape_id, None)
+
+    def state(self) -> tuple:
+        return zlib.compress(self._owner.tobytes(), 1), {shape_id: path.copy() for shape_id, path in self._paths.items()}
+
+    def restore(self, state: tuple) -> None:
+        owner, paths = state
+        self._owner[:] = np.frombuffer(zlib.decompress(owner), dtype=np.int32)
+        self._paths = {shape_id: path.copy() for shape_id, path in paths.items()}
+
+    def _add_segment(self, shape_id: int, path: _Path, label_position: tuple) -> None:
+        text = str(shape_id)
+        position = (label_position[0] + 5, label_position[1] - 5)  # Slightly offset the text position
+        path.labels.append((text, position))
+
+        # box of the label: its rasterized pixels (with a margin) clipped to the image
+        (text_width, text_height), baseline = cv2.getTextSize(text, LABEL_FONT, LABEL_SCALE, LABEL_THICKNESS)
+        margin = 4
+        pixels = self._rasterize(position[0] - margin, position[1] - text_height - margin, position[0] + text_width + margin,
+                                 position[1] + baseline + margin,
+                                 lambda image: cv2.putText(image, text, position, LABEL_FONT, LABEL_SCALE, 255, LABEL_THICKNESS, cv2.LINE_AA))
+        if len(pixels) == 0:
+            return
+        ys, xs = np.divmod(pixels, self.width)
+        x0, y0 = max(int(xs.min()) - 1, 0), max(int(ys.min()) - 1, 0)
+        x1, y1 = min(int(xs.max()) + 2, self.width), min(int(ys.max()) + 2, self.height)
+        box_ys, box_xs = np.mgrid[y0:y1, x0:x1]
+        box = (box_ys * self.width + box_xs).ravel()
+        path.boxes.append((x0, y0, x1, y1))
+        path.box_pixels = np.union1d(path.box_pixels, box)
+
+        # the lines already drawn inside the new box: still owned by the shape, or drawn over by the others since its last redraw
+        lines = [box[self._owner[box] == shape_id]]
+        lines += [pixels[self._in_boxes(pixels, [(x0, y0, x1, y1)])] for pixels in path.stolen]
+        path.boxed = np.union1d(path.boxed, np.concatenate(lines))
+
+    def _add_line(self, path: _Path, last_point: tuple, center: tuple) -> np.ndarray:
+        margin = LINE_THICKNESS + 1
+        pixels = self._rasterize(min(last_point[0], center[0]) - margin, min(last_point[1], center[1]) - margin,
+                                 max(last_point[0], center[0]) + margin + 1, max(last_point[1], center[1]) + margin + 1,
+                                 lambda image: cv2.line(image, last_point, center, 255, LINE_THICKNESS))
+        boxed = pixels[self._in_boxes(pixels, path.boxes)]
+        if len(boxed):
+            path.boxed = np.union1d(path.boxed, boxed)
+        return pixels
+
+    def _rasterize(self, x0: int, y0: int, x1: int, y1: int, draw) -> np.ndarray:
+        """ Flat indices of the pixels draw(image) touches in the image, which must be within the (x0, y0, x1, y1) box. """
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, self.width), min(y1, self.height)
+        draw(self._scratch)
+        if x0 >= x1 or y0 >= y1:
+            return np.empty(0, dtype=np.int64)
+        region = self._scratch[y0:y1, x0:x1]
+        ys, xs = np.nonzero(region)
+        region[:] = 0
+        return (ys + y0) * self.width + xs + x0
+
+    def _in_boxes(self, pixels: np.ndarray, boxes: list) -> np.ndarray:
+        inside = np.zeros(len(pixels), dtype=bool)
+        if boxes and len(pixels):
+            ys, xs = np.divmod(pixels, self.width)
+            for x0, y0, x1, y1 in boxes:
+                inside |= (xs >= x0) & (xs < x1) & (ys >= y0) & (ys < y1)
+        return inside
+
+    def _redraw(self, shape_id: int, path: _Path, new_pixels: np.ndarray) -> None:
+        # the labels are blended again, then every line pixel they (or the other shapes) changed gets the color of the shape
+        for text, position in path.labels:
+            cv2.putText(self.trajectory_image, text, position, LABEL_FONT, LABEL_SCALE, path.color, LABEL_THICKNESS, cv2.LINE_AA)
+        pixels = np.concatenate([path.boxed, new_pixels] + path.stolen)
+        path.stolen = []
+        self._pixels[pixels] = path.color
+        self._claim(path.box_pixels, -shape_id)
+        self._claim(pixels, shape_id)
+
+    def _claim(self, pixels: np.ndarray, owner: int) -> None:
+        """ The shape drew the pixels, the lines of the other shapes drawn there are redrawn with their next redraw. """
+        owners = self._owner[pixels]
+        taken = (owners > 0) & (owners != abs(owner))
+        if taken.any():
+            taken_pixels, owners = pixels[taken], owners[taken]
+            for taken_owner in np.unique(owners).tolist():
+                path = self._paths.get(taken_owner)
+                if path is not None:
+                    path.stolen.append(taken_pixels[owners == taken_owner])
+        self._owner[pixels] = owner
@@ -1,8 +1,7 @@
 import cv2
 import random
 import numpy as np
-from shape import Shape
-from PyQt5.QtGui import QImage
+from track_store import CIRCLE, RECTANGLE
 
 # initial idea was to use some kind of random unique id, but it is overkill for this task, there are just few shapes
 def generate_unique_id(length=10) -> int:
@@ -10,28 +9,14 @@ def generate_unique_id(length=10) -> int:
     max_value = 10**length - 1
     return random.randint(min_value, max_value)
 
+# box colors (BGR) of the shapes on the frame: detected, and predicted (not detected, see Tracker.coast)
+BOX_COLOR = (0, 255, 0)
+PREDICTED_COLOR = (0, 255, 255)
+
 # from task_description.md: "Any detection or tracking mistakes should be easily identifiable.",
-# so split history is needed, so I dont just interpolate between the None values that are caused by detection mistakes such as overlapping shapes
-def split_history(history: list) -> list:
-    segments = []
-    segment = []
-
-    none_count = 0
-    for pt in history:
-        if pt[-1] is None:
-            none_count += 1
-        else:
-            if none_count > 10: # arbitrary number, if there are more than 10 None values, it is probably due to overlapping shapes, so we split the history
-                if segment:
-                    segments.append(segment)
-                segment = []
-            none_count = 0
-            segment.append(pt)
-
-    if segment:
-        segments.append(segment)
-
-    return segments
+# so the trajectory isn't interpolated over long gaps (overlapping shapes, edge of the screen): a track missing for more than
+# this number of frames continues in a new segment (default history_gap of the Tracker)
+MAX_HISTORY_GAP = 10
 
 def calculate_rectangle_area(rectangle: tuple) -> int:
     (x1, y1), (x2, y2) = rectangle
@@ -53,28 +38,92 @@ def color_distance(color1: tuple, color2: tuple) -> float:
     color2 = np.array(color2) / 255.0
     return np.linalg.norm(color1 - color2)
 
-def match_shape(new_shape: dict, existing_shapes: list, max_distance=100, max_color_distance=0.15) -> Shape | None:
-    for existing_shape in existing_shapes:
+def association_costs(track_centers: np.ndarray, track_colors: np.ndarray, track_types: np.ndarray,
+                      detection_centers: np.ndarray, detection_colors: np.ndarray, detection_types: np.ndarray,
+                      max_distance=100, max_color_distance=0.15) -> np.ndarray:
+    """ 
+        Matching criteria of all track x detection pairs at once: same type, position and color close enough.
+        Returns (tracks x detections) cost matrix, pairs with different type or too far in position/color have np.inf cost.
+    """
+    distances = np.linalg.norm(track_centers[:, None, :] - detection_centers[None, :, :], axis=2)
+    color_distances = np.linalg.norm((track_colors[:, None, :] - detection_colors[None, :, :]) / 255.0, axis=2)
+    same_type = track_types[:, None] == detection_types[None, :]
+    return _gated_costs(distances, color_distances, same_type, max_distance, max_color_distance)
+
+def pair_costs(track_centers: np.ndarray, track_colors: np.ndarray, track_types: np.ndarray,
+               detection_centers: np.ndarray, detection_colors: np.ndarray, detection_types: np.ndarray,
+               max_distance=100, max_color_distance=0.15) -> np.ndarray:
+    """ Same as association_costs, but only for the given pairs (i-th track with i-th detection), returns 1D array of costs. """
+    distances = np.linalg.norm(track_centers - detection_centers, axis=1)
+    color_distances = np.linalg.norm((track_colors - detection_colors) / 255.0, axis=1)
+    same_type = track_types == detection_types
+    return _gated_costs(distances, color_distances, same_type, max_distance, max_color_distance)
+
+def _gated_costs(distances: np.ndarray, color_distances: np.ndarray, same_type: np.ndarray, max_distance, max_color_distance) -> np.ndarray:
+    gate = same_type & (color_distances < max_color_distance) & (distances < max_distance)
+
+    # both distances normalized by their thresholds, so position and color have the same weight
+    costs = distances / max_distance + color_distances / max_color_distance
+    costs[~gate] = np.inf
+    return costs
 
-        # get the last valid (non-None) center from the shape's history
-        # the None values represent frames where the shape was not detected (on the edges of screen or overlapped, etc..)
-        last_valid_center = next((center for center in reversed(existing_shape.history) if center[-1] is not None), None)
+def greedy_assignment(track_indices: np.ndarray, detection_indices: np.ndarray, costs: np.ndarray) -> list:
+    """ 
+        Greedy-by-cost assignment of the sparse candidate pairs (track_indices[i], detection_indices[i]) with finite costs[i],
+        cheapest pairs first, so one track can be claimed by one detection only (and vice versa).
+        Returns list of (track index, detection index) pairs.
+    """
+    order = np.argsort(costs, kind="stable")
 
-        if last_valid_center is not None: # needed bcs next defaults to None if not found
-            if (
-                new_shape["shape_type"] == existing_shape.shape_type and
-                color_distance(new_shape["color"], existing_shape.color) < max_color_distance and
-                euclidean_distance(new_shape["center"], last_valid_center[-1]) < max_distance
-            ):
-                return existing_shape
-    return None
+    used_tracks = set()
+    used_detections = set()
+    pairs = []
+    for track_index, detection_index in zip(track_indices[order].tolist(), detection_indices[order].tolist()):
+        if track_index in used_tracks or detection_index in used_detections:
+            continue
+        used_tracks.add(track_index)
+        used_detections.add(detection_index)
+        pairs.append((track_index, detection_index))
+    return pairs
+
+def merge_boxes(boxes: np.ndarray) -> np.ndarray:
+    """ Merge overlapping (x1, y1, x2, y2) boxes into their bounding boxes, until no two boxes overlap. """
+    boxes = [list(box) for box in np.asarray(boxes).tolist()]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    boxes[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del boxes[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return np.array(boxes, dtype=np.int64).reshape(-1, 4)
 
 def get_object_color(frame: np.ndarray, center: tuple) -> tuple:
     b, g, r = frame[center[1], center[0]]
     return (r, g, b)  # returning color as RGB
 
-def convert_to_qimage(image: np.ndarray) -> QImage:
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    height, width, channel = image_rgb.shape
-    bytes_per_line = 3 * width # 3 for RGB
-    return QImage(image_rgb.data, width, height, bytes_per_line, QImage.Format_RGB888)
\ No newline at end of file
+def get_object_colors(frame: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """ get_object_color for (N, 2) array of centers at once, returns (N, 3) array of RGB colors. """
+    return frame[centers[:, 1], centers[:, 0]][:, ::-1]
+
+
+def draw_shape_on_frame(frame: np.ndarray, shape_id: int, record: np.void, box_color: tuple = BOX_COLOR) -> None:
+    """ Draw the bounding box and ID of the shape (detection / track record) on the frame. """
+    x1, y1, x2, y2 = record["bbox"].tolist()
+    center = tuple(record["center"].tolist())
+    if record["shape_type"] == CIRCLE:
+        x, y, r = center[0], center[1], (x2 - x1) // 2
+        cv2.circle(frame, (x, y), r, box_color, 2)  # green circle
+        cv2.circle(frame, center, 3, (0, 0, 255), -1)  # ged center point
+        cv2.putText(frame, f'ID: {shape_id}', (x + r + 5, y), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    elif record["shape_type"] == RECTANGLE:
+        cv2.rectangle(frame, (x1, y1), (x2, y2), box_color, 2)  # green rectangle
+        cv2.circle(frame, center, 3, (0, 0, 255), -1)  # red center point
+        cv2.putText(frame, f'ID: {shape_id}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+
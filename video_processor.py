@@ -1,87 +1,170 @@
+import threading
+import time
 import cv2
 import numpy as np
-from detector import Detector
-from tracker import Tracker
-from shape import ShapeType
-from utils import get_object_color, convert_to_qimage, calculate_rectangle_area, calculate_circle_area
+from threaded_pipeline import ThreadedVideoPipeline
+from realtime_pipeline import RealtimeVideoPipeline
+from shape_updates import ShapeListDiffer
+from profiling import Profiler
+from exporter import ExportSettings
+from config import TrackingConfig
 from PyQt5.QtCore import QThread, pyqtSignal
 from PyQt5.QtGui import QImage
 
+
+class FramePresenter:
+    """ 
+        Converts the BGR images of the pipeline to QImages of the display (QLabel) size. The image is downscaled first
+        (into a preallocated buffer) and then converted to RGB directly into the memory of a new QImage,
+        so the full resolution image is never converted and the QImage owns its data (no pointer into a reused NumPy buffer).
+
+        Parameters
+        ----------
+        size : tuple
+            (width, height) of the display.
+    """
+    def __init__(self, size: tuple = (640, 360)) -> None:
+        self.size = size
+        self._resized = None # preallocated BGR buffer of the display size
+
+    def present(self, image: np.ndarray) -> QImage:
+        width, height = self.size
+        if image.shape[:2] == (height, width):
+            resized = image
+        else:
+            if self._resized is None:
+                self._resized = np.empty((height, width, 3), dtype=np.uint8)
+            resized = cv2.resize(image, self.size, dst=self._resized, interpolation=cv2.INTER_AREA)
+
+        qimage = QImage(width, height, QImage.Format_RGB888)
+        bits = qimage.bits()
+        bits.setsize(qimage.sizeInBytes())
+        rgb = np.ndarray((height, width, 3), dtype=np.uint8, buffer=bits, strides=(qimage.bytesPerLine(), 3, 1))
+        cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=rgb)
+        return qimage
+
+
 class VideoProcessorWorker(QThread):
     """
-        Worker thread for processing the video, manages the Detector and Tracker classes.
+        Worker thread for processing the video, runs the shared (threaded) pipeline and signals the results to the GUI.
+        The worker thread itself is the render stage of the pipeline (QImage conversion and signals),
+        decoding, detection and tracking run in the pipeline threads.
+        The shape list is signaled as ShapeListDelta (added / removed / changed immutable snapshots), at most max_ui_rate times per second.
+
+        The frame and the trajectory image are presented at most max_display_fps times per second, downscaled to display_size.
+        The tracking stage copies the trajectory image only at that rate (snapshot_interval), only the frames with a copy are presented.
+        Only the latest presented images are kept (latest frame wins): display_ready is signaled when new images are waiting
+        and the GUI takes them with take_display(), so the processing never waits for the painting and the event queue
+        holds at most one display event.
+
+        The profiler (disabled by default) records the sections of the pipeline and the "diff", "present" and "emit" sections of the worker.
+
+        In the real-time mode (realtime=True) the video is processed by the RealtimeVideoPipeline (paced to the source fps,
+        frames over the latency budget are dropped or not detected), the worker is then the consumer within the budget.
+
+        With track_log the tracks of every frame are written to the log file for the replay (replay_ui.py).
+
+        Errors of the processing (e.g. the track log can't be written) are signaled by processing_failed,
+        processing_finished is emitted in any case.
+
+        config holds the detection and tracking parameters of the pipeline (e.g. the termination of the tracks, max_missed_frames).
+
+        With export the annotated frames and the trajectory image are written by the VideoExporter (exporter.py) of the pipeline,
+        in its own thread, the worker doesn't wait for the encoding.
     """
-    def __init__(self, video_path: str):
+    def __init__(self, video_path: str, queue_depth: int = 4, detection_workers: int = 2, max_ui_rate: float | None = 10.0,
+                 max_display_fps: float | None = 30.0, display_size: tuple = (640, 360), profiler: Profiler | None = None,
+                 realtime: bool = False, track_log: str | None = None, export: ExportSettings | None = None,
+                 config: TrackingConfig | None = None):
         super().__init__()
         self.video_path = video_path
+        self.realtime = realtime
+        self.track_log = track_log
+        self.export = export
+        self.config = config
+        self.queue_depth = queue_depth
+        self.detection_workers = detection_workers
+        self.max_ui_rate = max_ui_rate
+        self.min_display_interval = 1.0 / max_display_fps if max_display_fps else 0.0
+        self.frame_presenter = FramePresenter(display_size)
+        self.trajectory_presenter = FramePresenter(display_size)
+        self._display = None # (frame, trajectory) QImages waiting for the GUI
+        self._display_lock = threading.Lock()
+        self._last_display = None
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
 
     # signals as class attributes
-    shapes_updated = pyqtSignal(list)
-    image_updated = pyqtSignal(QImage)
-    frame_updated = pyqtSignal(QImage)
+    shapes_updated = pyqtSignal(object) # ShapeListDelta
+    display_ready = pyqtSignal()
+    processing_failed = pyqtSignal(str) # error message
+    report_ready = pyqtSignal(str) # stage utilization (or real-time latency) report of the finished run
     processing_finished = pyqtSignal()
 
     def run(self) -> None:
-        cap = cv2.VideoCapture(self.video_path)
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        trajectory_image = np.zeros((height, width, 3), dtype=np.uint8)
-
-        # minimum areas for preventing FP's detections, not good idea if we want to detect small shapes (not this case)
-        min_rectangle_area = 1200
-        min_circle_area = 1000
-
-        detector = Detector()
-        tracker = Tracker(trajectory_image)
-
-        frame_id = 0
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            frame_shapes = [] # store the detected shapes in the current frame
-
-            circles = detector.detect_circles(frame)
-            rectangles = detector.detect_rectangles(frame)
-
-            if circles is not None:
-                for (x, y, r) in circles:
-                    area = calculate_circle_area((x, y, r))
-                    detected_shape = {
-                        "shape_type": ShapeType.CIRCLE,
-                        "bounding": (x, y, r),
-                        "center": (x, y),
-                        "color": get_object_color(frame, (x, y))
-                    }
-                    if area >= min_circle_area:
-                        frame_shapes.append(detected_shape)
-
-            if rectangles is not None:
-                for (x1, y1, x2, y2) in rectangles:
-                    area = calculate_rectangle_area(((x1, y1), (x2, y2)))
-                    detected_shape = {
-                        "shape_type": ShapeType.RECTANGLE,
-                        "bounding": ((x1, y1), (x2, y2)),
-                        "center": ((x1 + x2) // 2, (y1 + y2) // 2),
-                        "color": get_object_color(frame, ((x1 + x2) // 2, (y1 + y2) // 2))
-                    }
-                    if area >= min_rectangle_area:
-                        frame_shapes.append(detected_shape)
-
-            # pass detected shapes to the tracker to handle the tracking and drawing
-            tracked_shapes = tracker.new_frame(frame_id, frame, frame_shapes)            
-
-            # signal the updated shapes to the main thread
-            self.shapes_updated.emit(tracked_shapes)
- 
-            # convert trajectory image and frame to QImage and signal them to the main thread
-            qimage_trajectory = convert_to_qimage(trajectory_image)
-            qimage_frame = convert_to_qimage(frame)
-            self.image_updated.emit(qimage_trajectory)
-            self.frame_updated.emit(qimage_frame)
-
-            frame_id += 1
-
-        cap.release()
-        self.processing_finished.emit()
\ No newline at end of file
+        try:
+            self.process()
+        except Exception as error:
+            self.processing_failed.emit(f"{type(error).__name__}: {error}")
+        finally:
+            self.processing_finished.emit()
+
+    def process(self) -> None:
+        if self.realtime:
+            pipeline = RealtimeVideoPipeline(self.video_path, track_log=self.track_log, profiler=self.profiler, config=self.config,
+                                             export=self.export)
+        else:
+            pipeline = ThreadedVideoPipeline(self.video_path, queue_depth=self.queue_depth, detection_workers=self.detection_workers,
+                                             track_log=self.track_log, profiler=self.profiler, snapshot=True, config=self.config,
+                                             export=self.export, snapshot_interval=self.min_display_interval)
+        differ = ShapeListDiffer(self.max_ui_rate)
+
+        frame = None
+        for frame_id, frame, tracks in pipeline.frames():
+            # signal the changes of the shape list to the main thread (throttled)
+            with self.profiler.section("diff"):
+                delta = differ.update(pipeline.shapes)
+            if delta is not None:
+                with self.profiler.section("emit"):
+                    self.shapes_updated.emit(delta)
+
+            if self.realtime:
+                self.present(frame, pipeline.trajectory_image)
+            elif pipeline.trajectory_frame == frame_id:
+                # the tracking stage copies the trajectory image only every display interval, only these frames are presented
+                self.present(frame, pipeline.trajectory_image, force=True)
+
+        # the last frame is always shown
+        if frame is not None:
+            self.present(frame, pipeline.trajectory_image, force=True)
+
+        # terminated tracks are not in the per-frame list anymore, show all of them (loaded from the archive) at the end
+        if pipeline.tracker is not None:
+            delta = differ.update(pipeline.tracker.all_shapes(), force=True)
+            if delta is not None:
+                self.shapes_updated.emit(delta)
+            report = pipeline.report()
+            if pipeline.exporter is not None:
+                report += "\n" + pipeline.exporter.report()
+            self.report_ready.emit(report)
+
+    def present(self, frame: np.ndarray, trajectory_image: np.ndarray, force: bool = False) -> None:
+        """ Convert the images for the display, unless the previous ones were presented too recently (unless force). """
+        now = time.monotonic()
+        if not force and self._last_display is not None and now - self._last_display < self.min_display_interval:
+            return
+        self._last_display = now
+
+        with self.profiler.section("present"):
+            images = (self.frame_presenter.present(frame), self.trajectory_presenter.present(trajectory_image))
+        with self._display_lock:
+            waiting = self._display is not None
+            self._display = images
+        if not waiting:
+            with self.profiler.section("emit"):
+                self.display_ready.emit()
+
+    def take_display(self) -> tuple | None:
+        """ (frame, trajectory) QImages of the latest presented frame, None if they were already taken. """
+        with self._display_lock:
+            images, self._display = self._display, None
+        return images